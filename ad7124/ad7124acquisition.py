@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+""" Background acquisition of samples from the AD7124.
+
+A reader thread takes samples from the driver as fast as the ADC produces
+them and stores them in a fixed size ring buffer.  Consumers drain the
+buffer in batches so that slow output, e.g. printing or writing files, does
+not cause conversions to be missed.
+"""
+
+import threading
+
+import numpy as np
+
+#: The record stored for each sample.  The timestamp is in nanoseconds
+#: from time.monotonic_ns().
+SAMPLE_DTYPE = np.dtype(
+    [("timestamp", np.int64), ("channel", np.int8), ("code", np.uint32)]
+)
+
+
+class AD7124RingBuffer:
+    """ A fixed size, thread safe buffer of sample records.
+    The storage is allocated once.  When the buffer is full, new records
+    are dropped and counted as overruns.
+    """
+
+    def __init__(self, capacity, condition=None):
+        """ Allocates the buffer.
+        Args:
+            capacity: The maximum number of records that can be stored.
+            condition: The threading.Condition that is notified when a
+                record is added.  Can be shared by several buffers so that
+                one consumer can wait for any of them.  None creates one.
+        """
+        self._data = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self._capacity = capacity
+        # Total number of records written and read.
+        self._head = 0
+        self._tail = 0
+        if condition is None:
+            condition = threading.Condition()
+        self._condition = condition
+        #: Number of records dropped because the buffer was full.
+        self.overruns = 0
+
+    def __len__(self):
+        """ Returns the number of records waiting to be read. """
+        return self._head - self._tail
+
+    @property
+    def capacity(self):
+        """ The maximum number of records that can be stored. """
+        return self._capacity
+
+    def push(self, timestamp, channel, code):
+        """ Adds a record to the buffer.
+        Args:
+            timestamp: The time the sample was read in nanoseconds.
+            channel: The channel number.
+            code: The raw value.
+        Returns:
+            False if the buffer was full and the record was dropped.
+        """
+        with self._condition:
+            if self._head - self._tail >= self._capacity:
+                self.overruns += 1
+                return False
+            self._data[self._head % self._capacity] = (
+                timestamp,
+                channel,
+                code,
+            )
+            self._head += 1
+            self._condition.notify()
+        return True
+
+    def drain(self, max_records=None, timeout=None):
+        """ Removes records from the buffer.
+        Args:
+            max_records: The most records to return.  None for all.
+            timeout: The time to wait in seconds for a record to arrive if
+                the buffer is empty.  None returns immediately.
+        Returns:
+            A NumPy array of SAMPLE_DTYPE records, oldest first.  The array
+            is empty if no records are available.
+        """
+        with self._condition:
+            if timeout is not None and self._head == self._tail:
+                self._condition.wait(timeout)
+            count = self._head - self._tail
+            if max_records is not None:
+                count = min(count, max_records)
+            start = self._tail % self._capacity
+            end = start + count
+            if end <= self._capacity:
+                records = self._data[start:end].copy()
+            else:
+                records = np.concatenate(
+                    (self._data[start:], self._data[: end - self._capacity])
+                )
+            self._tail += count
+        return records
+
+
+class AD7124Acquisition:
+    """ Reads samples from an AD7124Driver using a background thread.
+    The driver must be configured before `start()` is called and must not
+    be used by anything else until `stop()` returns.
+    ```
+    acquisition = AD7124Acquisition(driver)
+    acquisition.start()
+    records = acquisition.drain(timeout=0.1)
+    acquisition.stop()
+    ```
+    """
+
+    def __init__(
+        self, driver, capacity=65536, continuous=False, condition=None
+    ):
+        """ Creates the acquisition engine and its ring buffer.
+        Args:
+            driver: A configured AD7124Driver.
+            capacity: The number of records that the ring buffer can hold.
+            continuous: True to use continuous read mode, see
+                `AD7124Driver.start_continuous_read()`.
+            condition: See `AD7124RingBuffer`.
+        """
+        self._driver = driver
+        self._continuous = continuous
+        self._thread = None
+        self._stop = threading.Event()
+        #: The ring buffer that the samples are stored in.
+        self.buffer = AD7124RingBuffer(capacity, condition)
+        #: Number of samples read.
+        self.samples = 0
+        #: Number of reads that timed out waiting for data.
+        self.timeouts = 0
+        #: The exception that stopped the reader thread, if any.
+        self.exception = None
+
+    @property
+    def overruns(self):
+        """ Number of samples dropped because the ring buffer was full. """
+        return self.buffer.overruns
+
+    @property
+    def running(self):
+        """ True while the reader thread is running. """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ Starts the reader thread. """
+        if self.running:
+            return
+        self._stop.clear()
+        self.exception = None
+        if self._continuous:
+            self._driver.start_continuous_read()
+        self._thread = threading.Thread(
+            target=self._run, name="AD7124Acquisition", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the reader thread and waits for it to finish.
+        Records already in the buffer can still be drained.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._continuous:
+            self._driver.stop_continuous_read()
+
+    def _run(self):
+        """ The reader thread. """
+        read = self._driver.read_data_timed
+        push = self.buffer.push
+        try:
+            while not self._stop.is_set():
+                (channel_number, int_value, timestamp) = read()
+                if channel_number < 0:
+                    self.timeouts += 1
+                    continue
+                push(timestamp, channel_number, int_value)
+                self.samples += 1
+        except Exception as err:
+            # print("AD7124Acquisition: stopped by", err)
+            self.exception = err
+
+    def drain(self, max_records=None, timeout=None):
+        """ Removes records from the ring buffer.
+        See `AD7124RingBuffer.drain()`.
+        Raises:
+            The exception that stopped the reader thread once the buffer is
+            empty.
+        """
+        records = self.buffer.drain(max_records, timeout)
+        if len(records) == 0 and self.exception is not None:
+            raise self.exception
+        return records
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+""" asyncio interface to the AD7124Driver.
+
+All calls to the driver are made on a single worker thread so that the
+event loop is never blocked and the driver is never used by two threads at
+once.  Samples are read in batches on the worker thread and delivered as
+NumPy arrays of `ad7124.ad7124acquisition.SAMPLE_DTYPE` records.
+
+```
+adc = AD7124AsyncDriver(AD7124Driver(1))
+await adc.set_adc_control(data_status=True, power_mode=2)
+async for batch in adc.stream(channels=[1, 2], batch_size=64):
+    print(batch["channel"], batch["code"])
+```
+"""
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+
+try:
+    get_running_loop = asyncio.get_running_loop
+except AttributeError:
+    # Python 3.6
+    get_running_loop = asyncio.get_event_loop
+
+
+class AD7124AsyncDriver:
+    """ Wraps an AD7124Driver so that it can be used from coroutines.
+    Configuration calls can be made while a stream is running.  They are
+    run between batches.
+    """
+
+    def __init__(self, driver):
+        """ Creates the worker thread.
+        Args:
+            driver: The AD7124Driver to use.
+        """
+        self._driver = driver
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="AD7124"
+        )
+
+    @property
+    def driver(self):
+        """ The wrapped AD7124Driver.  Only use this from `run()`. """
+        return self._driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Stops the worker thread after any calls in progress finish. """
+        self._executor.shutdown(wait=True)
+
+    async def run(self, function, *args, **kwargs):
+        """ Calls function on the worker thread.
+        Args:
+            function: The function to call, normally an AD7124Driver method.
+            args: Arguments passed to function.
+            kwargs: Keyword arguments passed to function.
+        Returns:
+            The value returned by function.
+        """
+        loop = get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args, **kwargs)
+        )
+
+    async def reset(self):
+        """ See `AD7124Driver.reset()`. """
+        return await self.run(self._driver.reset)
+
+    async def read_id(self):
+        """ See `AD7124Driver.read_id()`. """
+        return await self.run(self._driver.read_id)
+
+    async def read_status(self):
+        """ See `AD7124Driver.read_status()`. """
+        return await self.run(self._driver.read_status)
+
+    async def read_register(self, register_enum):
+        """ See `AD7124Driver.read_register()`. """
+        return await self.run(self._driver.read_register, register_enum)
+
+    async def write_register(self, register_enum, value):
+        """ See `AD7124Driver.write_register()`. """
+        return await self.run(
+            self._driver.write_register, register_enum, value
+        )
+
+    async def read_data_wait(self):
+        """ See `AD7124Driver.read_data_wait()`. """
+        return await self.run(self._driver.read_data_wait)
+
+    async def set_channel(self, *args, **kwargs):
+        """ See `AD7124Driver.set_channel()`. """
+        return await self.run(self._driver.set_channel, *args, **kwargs)
+
+    async def enable_channel(self, channel, enable):
+        """ See `AD7124Driver.enable_channel()`. """
+        return await self.run(self._driver.enable_channel, channel, enable)
+
+    async def set_setup_config(self, *args, **kwargs):
+        """ See `AD7124Driver.set_setup_config()`. """
+        return await self.run(self._driver.set_setup_config, *args, **kwargs)
+
+    async def set_setup_filter(self, *args, **kwargs):
+        """ See `AD7124Driver.set_setup_filter()`. """
+        return await self.run(self._driver.set_setup_filter, *args, **kwargs)
+
+    async def set_setup_offset(self, setup, new_offset):
+        """ See `AD7124Driver.set_setup_offset()`. """
+        return await self.run(self._driver.set_setup_offset, setup, new_offset)
+
+    async def set_setup_gain(self, setup, new_gain):
+        """ See `AD7124Driver.set_setup_gain()`. """
+        return await self.run(self._driver.set_setup_gain, setup, new_gain)
+
+    async def set_adc_control(self, *args, **kwargs):
+        """ See `AD7124Driver.set_adc_control()`. """
+        return await self.run(self._driver.set_adc_control, *args, **kwargs)
+
+    def _read_batch(self, batch_size, channels, timeout):
+        """ Reads up to batch_size samples.  Runs on the worker thread.
+        `AD7124Driver.read_data_timed()` is used so that continuous read
+        mode, the wait strategy and the stats work as they do for the
+        other readers.
+        Args:
+            batch_size: The number of samples to read.
+            channels: Set of channel numbers to keep, or None for all.
+            timeout: The time in seconds after which a partial batch is
+                returned.
+        Returns:
+            An array of SAMPLE_DTYPE records.
+        """
+        read = self._driver.read_data_timed
+        records = np.zeros(batch_size, dtype=SAMPLE_DTYPE)
+        count = 0
+        end_time = time.monotonic() + timeout
+        while count < batch_size:
+            (channel_number, int_value, timestamp) = read()
+            if channel_number >= 0 and (
+                channels is None or channel_number in channels
+            ):
+                records[count] = (timestamp, channel_number, int_value)
+                count += 1
+            if time.monotonic() >= end_time:
+                break
+        return records[:count]
+
+    async def stream(self, channels=None, batch_size=64, timeout=1.0):
+        """ Reads samples until the caller stops iterating.
+        The next batch is read while the caller processes the current one.
+        Args:
+            channels: Channel numbers to return, or None for all enabled
+                channels.  The channels must already be set up.
+            batch_size: The number of samples in each batch.
+            timeout: The time in seconds after which a partial batch is
+                returned.  This sets the worst case latency.
+        Yields:
+            Arrays of SAMPLE_DTYPE records.  Batches are never empty.
+        """
+        if channels is not None:
+            channels = frozenset(channels)
+        loop = get_running_loop()
+        read = functools.partial(
+            self._read_batch, batch_size, channels, timeout
+        )
+        pending = loop.run_in_executor(self._executor, read)
+        try:
+            while True:
+                records = await pending
+                pending = loop.run_in_executor(self._executor, read)
+                if len(records):
+                    yield records
+        finally:
+            # Any read in progress finishes on the worker thread and is
+            # discarded.
+            pending.cancel()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+""" Collects register accesses so that they are sent in one SPI transfer.
+
+The AD7124 does not need the chip select to be toggled between commands so
+the frames of many register reads and writes can be joined together and
+clocked out in one bus operation.
+
+When checksums are enabled, see `AD7124Driver.enable_crc()`, a read of the
+error register is added after the writes.  If it shows that the AD7124
+ignored a write, the written registers are read back and only the ones
+that do not match are written again.
+"""
+
+from ad7124.ad7124crc import SPI_CRC_ERR
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class AD7124Batch:
+    """ A batch of register reads and writes.
+    Use `AD7124Driver.batch()` to create a batch.  While the batch is
+    active, all writes made by the driver, including those made by the
+    `set_...()` functions, are queued.  The queue is sent when the batch
+    ends, e.g.
+    ```
+    with driver.batch() as batch:
+        driver.set_setup_config(1, bipolar=False)
+        driver.set_channel(1, enable=True, setup=1, ainp=2, ainm=3)
+        batch.read_register(AD7124RegNames.ERR_REG)
+    error = batch.results[AD7124RegNames.ERR_REG]
+    ```
+    If an exception is raised in the with block, the queued frames are
+    not sent and the driver's shadow copies of the registers written are
+    put back.  A batch started inside another one sends the frames queued
+    by the outer batch first, so the order of the accesses is kept, and the
+    outer batch is active again when it ends.
+    """
+
+    def __init__(self, driver, spi):
+        """ Creates an empty batch.
+        Args:
+            driver: The AD7124Driver that the batch belongs to.
+            spi: The AD7124SPI used to send the frames.
+        """
+        self._driver = driver
+        self._spi = spi
+        # Frames waiting to be sent.
+        self._frames = []
+        # (frame index, register) of each queued read.
+        self._reads = []
+        # (register, value) of each queued write.
+        self._writes = []
+        # The shadow value of each register before its first queued write.
+        self._previous = {}
+        #: Values read by the batch, keyed by register.
+        self.results = {}
+        # The batch that was active when this one started.
+        self._outer = None
+
+    def __enter__(self):
+        driver = self._driver
+        self._outer = driver._batch
+        if self._outer is not None:
+            self._outer.flush()
+        driver._batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._driver._batch = self._outer
+        self._outer = None
+        if exc_type is None:
+            self.flush()
+        else:
+            self._discard()
+
+    def _discard(self):
+        """ Drops the queued frames and restores the shadow values of the
+        registers that were not written.
+        """
+        shadow = self._driver._shadow
+        for (register_enum, value) in self._previous.items():
+            if value is None:
+                shadow.pop(register_enum, None)
+            else:
+                shadow[register_enum] = value
+        self._frames = []
+        self._reads = []
+        self._writes = []
+        self._previous = {}
+
+    def __len__(self):
+        """ Returns the number of frames waiting to be sent. """
+        return len(self._frames)
+
+    def add_frame(self, to_send):
+        """ Queues a frame to be sent.  The data read is discarded.
+        Args:
+            to_send: The bytes to send, command byte first.
+        """
+        self._frames.append(bytes(to_send))
+
+    def add_write(self, register_enum, value, to_send):
+        """ Queues a register write.
+        Args:
+            register_enum: The register written.
+            value: The value written.
+            to_send: The bytes to send, command byte first.
+        """
+        self._previous.setdefault(
+            register_enum, self._driver._shadow.get(register_enum)
+        )
+        self._writes.append((register_enum, value))
+        self.add_frame(to_send)
+
+    def read_register(self, register_enum):
+        """ Queues a read of the given register.
+        The value is put in `results` when the batch is sent.
+        Args:
+            register_enum: The register to read,
+                e.g. AD7124RegNames.ERR_REG.
+        """
+        to_send = self._driver._read_frame(register_enum, False)
+        self._reads.append((len(self._frames), register_enum))
+        self.add_frame(to_send)
+
+    def flush(self):
+        """ Sends all queued frames and stores the values read.
+        Returns:
+            The results dictionary.
+        """
+        if self._frames:
+            driver = self._driver
+            crc = driver.crc
+            reads = [index for (index, _) in self._reads]
+            # Nothing can be read back once in continuous read mode.
+            check_writes = (
+                crc
+                and self._writes
+                and not driver.continuous_read
+                and not self._starts_continuous_read()
+            )
+            if check_writes:
+                reads.append(len(self._frames))
+                self._frames.append(
+                    driver._read_frame(AD7124RegNames.ERR_REG, False)
+                )
+            received = self._spi.xfer_many(self._frames)
+            if crc:
+                received = driver._check_reads(self._frames, received, reads)
+            for (index, register_enum) in self._reads:
+                value = driver._data_to_int(received[index])
+                self.results[register_enum] = value
+            if check_writes:
+                error = driver._data_to_int(received[-1])
+                if error & SPI_CRC_ERR:
+                    self._repeat_writes()
+            self._frames = []
+            self._reads = []
+            self._writes = []
+            self._previous = {}
+        return self.results
+
+    def _starts_continuous_read(self):
+        """ True if a queued write sets CONT_READ.  The AD7124 streams
+        conversions from the end of that write so no frame after it can be
+        read.
+        """
+        for (register_enum, value) in self._writes:
+            if register_enum == AD7124RegNames.ADC_CTRL_REG and (
+                value & 0x0800
+            ):
+                return True
+        return False
+
+    def _repeat_writes(self):
+        """ Writes again the registers that do not hold the values written.
+        Raises:
+            OSError: If a register is still wrong after crc_retries
+                attempts.
+        """
+        driver = self._driver
+        # The last value written to each register.
+        pending = dict(self._writes)
+        attempts = 0
+        while True:
+            registers = list(pending)
+            frames = [
+                driver._read_frame(register_enum, False)
+                for register_enum in registers
+            ]
+            received = driver._check_reads(
+                frames, self._spi.xfer_many(frames), range(len(frames))
+            )
+            failed = {}
+            for (register_enum, data) in zip(registers, received):
+                value = pending[register_enum]
+                mask = 0xFFFFFF
+                if register_enum == AD7124RegNames.ADC_CTRL_REG:
+                    # The ADC changes the mode bits.
+                    mask &= ~0x003C
+                if (driver._data_to_int(data) ^ value) & mask:
+                    failed[register_enum] = value
+            if not failed:
+                return
+            if attempts == driver.crc_retries:
+                raise OSError("ERROR: CRC error writing to the AD7124")
+            attempts += 1
+            pending = failed
+            frames = [
+                driver._write_frame(register_enum, value)
+                for (register_enum, value) in pending.items()
+            ]
+            self._spi.xfer_many(frames)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+""" Reads a burst of conversions started by the SYNC pin.
+
+Streaming all of the time is wasteful when the events of interest are
+short, e.g. the swing of a pendulum.  `AD7124Burst` holds the AD7124 in
+reset using SYNC, puts it into single or continuous conversion mode and
+then starts the conversions with the rising edge of SYNC.  The first
+conversion is always a fixed settling time after the edge so the start of
+the burst is known exactly.  The samples are returned as one array.
+
+```
+burst = AD7124Burst(driver)
+records = burst.run(100)
+offsets = records["timestamp"] - burst.trigger_time
+```
+
+`run_bursts()` starts the bursts of both Pi2 click shield positions with
+one GPIO write so that they start together.
+"""
+
+import threading
+
+import numpy as np
+
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+from ad7124.ad7124planner import plan_driver
+from ad7124.ad7124stats import monotonic_ns
+
+#: ADC control register operating modes.
+MODE_CONTINUOUS = 0
+MODE_SINGLE = 1
+MODE_IDLE = 4
+
+
+class AD7124Burst:
+    """ Arms, triggers and reads one burst of conversions.
+    The channels and setups must be configured before `arm()` is called.
+    The transport must be able to drive SYNC, e.g. `PigpioTransport`.
+    """
+
+    def __init__(self, driver, single=False):
+        """ Creates a burst that uses the driver.
+        Args:
+            driver: The AD7124Driver to use.
+            single: True to use single conversion mode.  Each conversion is
+                then started by the driver after the previous one is read so
+                every sample is fully settled.  Otherwise continuous
+                conversion mode is used, which is faster.
+        """
+        self.driver = driver
+        self.single = single
+        #: The time.monotonic_ns() of the last SYNC rising edge.
+        self.trigger_time = None
+        # Conversions made for each start in single conversion mode.
+        self._channels = 1
+
+    def arm(self):
+        """ Takes SYNC low and selects the conversion mode.  No conversions
+        are made until `trigger()` is called.
+        Raises:
+            ValueError: If no channels are enabled or the ADC is in
+                continuous read mode.
+            NotImplementedError: If the transport cannot drive SYNC.
+        """
+        driver = self.driver
+        if driver.continuous_read:
+            raise ValueError(
+                "ERROR: a burst cannot be used in continuous read mode"
+            )
+        # Every enabled channel is converted once for each single
+        # conversion.
+        self._channels = len(plan_driver(driver).channels)
+        driver.set_sync(False)
+        driver.set_mode(MODE_SINGLE if self.single else MODE_CONTINUOUS)
+
+    def trigger(self):
+        """ Takes SYNC high to start the conversions. """
+        self.driver.set_sync(True)
+        self.trigger_time = monotonic_ns()
+
+    def read(self, count):
+        """ Reads the conversions of the burst.  The ADC is left in idle
+        mode afterwards.
+        Args:
+            count: The number of samples to read.
+        Returns:
+            An array of SAMPLE_DTYPE records.  If a read times out, the
+            burst ends early and the array is shorter than count.
+        """
+        driver = self.driver
+        records = np.zeros(count, dtype=SAMPLE_DTYPE)
+        read = driver.read_data_timed
+        index = 0
+        try:
+            while index < count:
+                if self.single and index and index % self._channels == 0:
+                    # The ADC went idle after the last conversion.
+                    driver.set_mode(MODE_SINGLE)
+                (channel_number, int_value, timestamp) = read()
+                if channel_number < 0:
+                    break
+                records[index] = (timestamp, channel_number, int_value)
+                index += 1
+        finally:
+            driver.set_mode(MODE_IDLE)
+        return records[:index]
+
+    def run(self, count):
+        """ Arms, triggers and reads one burst.
+        Args:
+            count: The number of samples to read.
+        Returns:
+            An array of SAMPLE_DTYPE records, see `read()`.
+        """
+        self.arm()
+        self.trigger()
+        return self.read(count)
+
+
+def trigger_bursts(bursts):
+    """ Takes SYNC high on every board.  With PiGPIO the boards are
+    triggered by one GPIO write, otherwise one after the other.
+    Args:
+        bursts: A list of armed AD7124Burst instances.
+    """
+    transports = [burst.driver._spi.transport for burst in bursts]
+    if all(hasattr(transport, "sync_gpio") for transport in transports):
+        # Only import pigpio when it is being used.
+        from ad7124.ad7124pigpio import set_sync_many
+
+        set_sync_many(transports, True)
+        trigger_time = monotonic_ns()
+        for burst in bursts:
+            burst.trigger_time = trigger_time
+    else:
+        for burst in bursts:
+            burst.trigger()
+
+
+def run_bursts(bursts, count):
+    """ Arms every board, starts them together and reads the bursts at the
+    same time, one thread for each board.
+    Args:
+        bursts: A list of AD7124Burst instances, one for each board.
+        count: The number of samples to read from each board.
+    Returns:
+        A list with an array of SAMPLE_DTYPE records for each burst.
+    """
+    for burst in bursts:
+        burst.arm()
+    results = [None] * len(bursts)
+
+    def read(index):
+        results[index] = bursts[index].read(count)
+
+    threads = [
+        threading.Thread(target=read, args=(index,), daemon=True)
+        for index in range(len(bursts))
+    ]
+    trigger_bursts(bursts)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+""" Calibrates the setups and keeps the results on disk.
+
+The AD7124 can measure its own offset and gain errors, the internal
+zero-scale and full-scale calibrations, or the errors of the whole system
+when known inputs are applied, the system calibrations.  The results are
+put in the offset and gain registers of the setup.  Each calibration takes
+one or more settling times so calibrating every setup at every start can
+take seconds.
+
+`AD7124Calibrator` runs the calibrations and stores the offset and gain
+values in an `AD7124CalibrationCache`, a JSON file.  The values are keyed
+by the board, the setup, the configuration register, the power mode and
+the temperature.  On later starts `load()` writes the stored values back
+in one batch of register writes.
+
+```
+calibrator = AD7124Calibrator(driver, AD7124CalibrationCache("cal.json"))
+calibrator.load_or_calibrate(temperature=25.0)
+```
+"""
+
+import json
+import os
+import time
+
+from ad7124.ad7124registers import AD7124RegNames
+
+#: ADC control register calibration modes.
+MODE_INTERNAL_ZERO_SCALE = 5
+MODE_INTERNAL_FULL_SCALE = 6
+MODE_SYSTEM_ZERO_SCALE = 7
+MODE_SYSTEM_FULL_SCALE = 8
+#: The offset register value that means no offset.
+DEFAULT_OFFSET = 0x800000
+#: The power mode used for internal full-scale calibrations.  They cannot
+#: be made in full power mode.
+MID_POWER = 1
+
+
+class AD7124CalibrationCache:
+    """ Offset and gain values stored in a JSON file. """
+
+    def __init__(self, filename, temperature_tolerance=5.0):
+        """ Reads the file if it exists.
+        Args:
+            filename: The name of the JSON file.
+            temperature_tolerance: The largest difference in degrees C
+                between the temperature of a stored calibration and the
+                current temperature for the calibration to be used.
+        Raises:
+            ValueError: If the file is not a calibration file.
+        """
+        self.filename = filename
+        self.temperature_tolerance = temperature_tolerance
+        #: A list of dicts, one for each calibration.
+        self.entries = []
+        if os.path.exists(filename):
+            with open(filename) as cache_file:
+                contents = json.load(cache_file)
+            if not isinstance(contents, dict) or "entries" not in contents:
+                raise ValueError(
+                    "ERROR: " + filename + " is not a calibration file"
+                )
+            self.entries = contents["entries"]
+
+    def _matches(self, entry, key, temperature):
+        for (name, value) in key.items():
+            if entry[name] != value:
+                return False
+        if temperature is None or entry["temperature"] is None:
+            return temperature is None and entry["temperature"] is None
+        difference = abs(entry["temperature"] - temperature)
+        return difference <= self.temperature_tolerance
+
+    def find(self, board, setup, config, power_mode, temperature=None):
+        """ Returns the stored calibration closest to temperature.
+        Args:
+            board: The board identifier.
+            setup: The setup number, 0 to 7.
+            config: The value of the setup's configuration register.
+            power_mode: 0 low, 1 mid, 2 or 3 full power.
+            temperature: The temperature in degrees C or None if not
+                known.
+        Returns:
+            A dict with offset and gain keys or None if there is no
+            calibration within the temperature tolerance.
+        """
+        key = {
+            "board": board,
+            "setup": setup,
+            "config": config,
+            "power_mode": power_mode,
+        }
+        best = None
+        for entry in self.entries:
+            if not self._matches(entry, key, temperature):
+                continue
+            if best is None or (
+                temperature is not None
+                and abs(entry["temperature"] - temperature)
+                < abs(best["temperature"] - temperature)
+            ):
+                best = entry
+        return best
+
+    def store(
+        self, board, setup, config, power_mode, temperature, offset, gain
+    ):
+        """ Adds a calibration and writes the file.
+        A stored calibration with the same key and temperature is
+        replaced.
+        Args:
+            board: The board identifier.
+            setup: The setup number, 0 to 7.
+            config: The value of the setup's configuration register.
+            power_mode: 0 low, 1 mid, 2 or 3 full power.
+            temperature: The temperature in degrees C or None.
+            offset: The value of the offset register.
+            gain: The value of the gain register.
+        """
+        entry = {
+            "board": board,
+            "setup": setup,
+            "config": config,
+            "power_mode": power_mode,
+            "temperature": temperature,
+            "offset": offset,
+            "gain": gain,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self.entries = [
+            old
+            for old in self.entries
+            if not (
+                old["board"] == board
+                and old["setup"] == setup
+                and old["config"] == config
+                and old["power_mode"] == power_mode
+                and old["temperature"] == temperature
+            )
+        ]
+        self.entries.append(entry)
+        self.save()
+
+    def save(self):
+        """ Writes the file.  A temporary file is written and then renamed
+        so that the file is never left half written.
+        """
+        temporary = self.filename + ".tmp"
+        with open(temporary, "w") as cache_file:
+            json.dump({"entries": self.entries}, cache_file, indent=2)
+            cache_file.write("\n")
+        os.replace(temporary, self.filename)
+
+
+class AD7124Calibrator:
+    """ Calibrates setups and loads stored calibrations.
+    The channels and setups must be configured first.  The setups used by
+    the enabled channels are calibrated unless a list of setups is given.
+    """
+
+    def __init__(self, driver, cache=None, board=None):
+        """ Creates a calibrator for the driver.
+        Args:
+            driver: The AD7124Driver to use.
+            cache: The AD7124CalibrationCache used to store the results.  If
+                None, the results are not stored.
+            board: A string that identifies the board, e.g. a serial number.
+                If None, the position and the ID register are used.  These do
+                not tell two boards in the same position apart.
+        """
+        self._driver = driver
+        self.cache = cache
+        if board is None:
+            board = "position{}-id{:02x}".format(
+                driver.position, driver.read_id()
+            )
+        self.board = board
+
+    def _channel_maps(self):
+        return [
+            self._driver.cached_register(AD7124RegNames.CH0_MAP_REG + channel)
+            for channel in range(16)
+        ]
+
+    def used_setups(self):
+        """ Returns the setups used by the enabled channels, in order. """
+        setups = []
+        for value in self._channel_maps():
+            setup = (value >> 12) & 0x07
+            if value & 0x8000 and setup not in setups:
+                setups.append(setup)
+        return setups
+
+    def _config(self, setup):
+        return self._driver.cached_register(AD7124RegNames.CFG0_REG + setup)
+
+    def _calibrate_setup(self, setup, modes):
+        """ Runs the calibration modes with only one channel enabled.
+        The first enabled channel that uses the setup is used, or channel 0
+        if there is none.  The channels and the ADC control register are
+        restored afterwards.
+        """
+        driver = self._driver
+        maps = self._channel_maps()
+        adc_control = driver.read_register(AD7124RegNames.ADC_CTRL_REG)
+        power_mode = driver.power_mode
+        channel = 0
+        for (number, value) in enumerate(maps):
+            if value & 0x8000 and (value >> 12) & 0x07 == setup:
+                channel = number
+                break
+        try:
+            with driver.batch():
+                for (number, value) in enumerate(maps):
+                    if number == channel:
+                        # Enabled and using the setup.
+                        value = (value & ~0x7000) | 0x8000 | (setup << 12)
+                    else:
+                        value &= ~0x8000
+                    driver.write_register(
+                        AD7124RegNames.CH0_MAP_REG + number, value
+                    )
+            for mode in modes:
+                if mode == MODE_INTERNAL_FULL_SCALE and power_mode > MID_POWER:
+                    self._set_power_mode(MID_POWER)
+                    driver.calibrate(mode)
+                    self._set_power_mode(power_mode)
+                else:
+                    driver.calibrate(mode)
+        finally:
+            with driver.batch():
+                for (number, value) in enumerate(maps):
+                    driver.write_register(
+                        AD7124RegNames.CH0_MAP_REG + number, value
+                    )
+                driver.write_register(
+                    AD7124RegNames.ADC_CTRL_REG, adc_control
+                )
+
+    def _set_power_mode(self, power_mode):
+        self._driver.update_register(
+            AD7124RegNames.ADC_CTRL_REG, 0x00C0, power_mode << 6
+        )
+
+    def _store(self, setup, temperature):
+        driver = self._driver
+        offset = driver.cached_register(AD7124RegNames.OFFS0_REG + setup)
+        gain = driver.cached_register(AD7124RegNames.GAIN0_REG + setup)
+        if self.cache is not None:
+            self.cache.store(
+                self.board,
+                setup,
+                self._config(setup),
+                driver.power_mode,
+                temperature,
+                offset,
+                gain,
+            )
+        return (offset, gain)
+
+    def calibrate(self, setups=None, temperature=None):
+        """ Runs the internal calibrations and stores the results.
+        For each setup, the offset register is reset, a full-scale
+        calibration is made and then a zero-scale calibration, as the
+        datasheet recommends.  The full-scale calibration is made in mid
+        power mode if full power is set.  With a gain of 1 the gain is
+        factory calibrated so only the zero-scale calibration is made.
+        Args:
+            setups: The setups to calibrate.  If None, the setups used by
+                the enabled channels.
+            temperature: The temperature in degrees C, used as part of the
+                key of the stored results.
+        Returns:
+            A dict of setup -> (offset, gain).
+        Raises:
+            OSError: If a calibration does not finish.
+        """
+        if setups is None:
+            setups = self.used_setups()
+        results = {}
+        for setup in setups:
+            modes = [MODE_INTERNAL_ZERO_SCALE]
+            if self._config(setup) & 0x07:
+                # The PGA gain is more than 1.
+                self._driver.set_setup_offset(setup, DEFAULT_OFFSET)
+                modes.insert(0, MODE_INTERNAL_FULL_SCALE)
+            self._calibrate_setup(setup, modes)
+            results[setup] = self._store(setup, temperature)
+        return results
+
+    def system_zero_scale(self, setup, temperature=None):
+        """ Runs a system zero-scale calibration.  The zero-scale input
+        must be applied to the channel that uses the setup.
+        Args:
+            setup: The setup to calibrate.
+            temperature: The temperature in degrees C.
+        Returns:
+            Tuple containing the offset and gain register values.
+        """
+        self._calibrate_setup(setup, [MODE_SYSTEM_ZERO_SCALE])
+        return self._store(setup, temperature)
+
+    def system_full_scale(self, setup, temperature=None):
+        """ Runs a system full-scale calibration.  The full-scale input
+        must be applied to the channel that uses the setup.  Do the
+        zero-scale calibration first.
+        Args:
+            setup: The setup to calibrate.
+            temperature: The temperature in degrees C.
+        Returns:
+            Tuple containing the offset and gain register values.
+        """
+        self._calibrate_setup(setup, [MODE_SYSTEM_FULL_SCALE])
+        return self._store(setup, temperature)
+
+    def load(self, setups=None, temperature=None):
+        """ Writes the stored calibrations to the offset and gain registers
+        in one batch.
+        Args:
+            setups: The setups to load.  If None, the setups used by the
+                enabled channels.
+            temperature: The temperature in degrees C.
+        Returns:
+            A list of the setups that had no stored calibration.
+        """
+        if setups is None:
+            setups = self.used_setups()
+        driver = self._driver
+        missing = []
+        with driver.batch():
+            for setup in setups:
+                entry = None
+                if self.cache is not None:
+                    entry = self.cache.find(
+                        self.board,
+                        setup,
+                        self._config(setup),
+                        driver.power_mode,
+                        temperature,
+                    )
+                if entry is None:
+                    missing.append(setup)
+                    continue
+                driver.set_setup_offset(setup, entry["offset"])
+                driver.set_setup_gain(setup, entry["gain"])
+        return missing
+
+    def load_or_calibrate(self, setups=None, temperature=None):
+        """ Loads the stored calibrations and calibrates the setups that
+        have none.
+        Args:
+            setups: The setups to use.  If None, the setups used by the
+                enabled channels.
+            temperature: The temperature in degrees C.
+        Returns:
+            A list of the setups that were calibrated.
+        """
+        missing = self.load(setups, temperature)
+        if missing:
+            self.calibrate(missing, temperature)
+        return missing
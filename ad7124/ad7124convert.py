@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+""" Vectorised versions of the AD7124Driver conversion functions.
+
+These functions work on whole NumPy arrays of raw 24 bit values so that
+large amounts of recorded data can be converted in one pass.  The results
+are the same as `AD7124Driver.to_voltage()` and
+`AD7124Driver.to_temperature()`.
+"""
+
+import numpy as np
+
+
+def unpack_codes(buffer, status_byte=False):
+    """ Converts a buffer of packed 24 bit big endian values to an array.
+    Args:
+        buffer: The bytes read from the data register, 3 bytes per value,
+            or 4 bytes per value if each value has a status byte appended.
+            Any incomplete value at the end of the buffer is ignored.
+        status_byte: True if a status byte follows each value.
+    Returns:
+        An array of uint32 values.  If status_byte is True, a tuple of the
+        values and an array of the status bytes.
+    """
+    frame_size = 4 if status_byte else 3
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    data = data[: len(data) - (len(data) % frame_size)]
+    data = data.reshape(-1, frame_size)
+    codes = data[:, 0].astype(np.uint32) << 16
+    codes |= data[:, 1].astype(np.uint32) << 8
+    codes |= data[:, 2]
+    if status_byte:
+        return (codes, data[:, 3].copy())
+    return codes
+
+
+def _per_sample(value, channels):
+    """ Returns value as an array that can be used with each sample.
+    A scalar is used for all samples.  If channels is given, value is a
+    sequence indexed by channel number.  Otherwise it is a sequence with
+    one entry for each sample.
+    """
+    value = np.asarray(value)
+    if value.ndim == 0 or channels is None:
+        return value
+    return value[channels]
+
+
+def to_voltage(codes, gain, vref, bipolar, scale, channels=None):
+    """ Converts raw values to voltages.
+    See `AD7124Driver.to_voltage()` for details of the conversion.
+    Args:
+        codes: An array of raw values or a bytes buffer of packed values,
+            see `unpack_codes()`.
+        gain: The PGA gain value, 1 to 128.
+        vref: The reference voltage, normally +1.25V or +2.5V.
+        bipolar: True for bipolar, else unipolar.
+        scale: A scaling factor used for external potential division.
+        channels: Optional array of the channel number of each value.  When
+            given, gain, vref, bipolar and scale can be sequences indexed by
+            channel number, e.g. 16 entries, one per channel.
+    Returns:
+        An array of float64 voltages.
+    """
+    if isinstance(codes, (bytes, bytearray, memoryview)):
+        codes = unpack_codes(codes)
+    codes = np.asarray(codes, dtype=np.float64)
+    if channels is not None:
+        channels = np.asarray(channels, dtype=np.intp)
+    bipolar = _per_sample(bipolar, channels).astype(bool)
+    factor = _per_sample(vref, channels) / _per_sample(gain, channels)
+    factor = factor * _per_sample(scale, channels)
+    voltage = np.where(bipolar, codes / 0x7FFFFF - 1.0, codes / 0xFFFFFF)
+    voltage *= factor
+    return voltage
+
+
+def to_temperature(codes):
+    """ Converts raw values to temperatures in degrees Celcius.
+    See `AD7124Driver.to_temperature()` for details of the conversion.
+    Args:
+        codes: An array of raw values or a bytes buffer of packed values,
+            see `unpack_codes()`.
+    Returns:
+        An array of float64 temperatures.
+    """
+    if isinstance(codes, (bytes, bytearray, memoryview)):
+        codes = unpack_codes(codes)
+    codes = np.asarray(codes, dtype=np.float64)
+    return ((codes - 0x800000) / 13584) - 272.5
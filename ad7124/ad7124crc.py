@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" The CRC8 checksum used to protect SPI transfers.
+
+When the SPI_CRC_ERR_EN bit of the error enable register is set, the
+AD7124 appends a checksum to every read and expects one at the end of
+every write.  The checksum covers the command byte and the data bytes,
+including the status byte when DATA_STATUS is set.  The polynomial is
+x^8 + x^2 + x + 1, the same as `ad7124_compute_crc8()` in the C driver.
+
+In continuous read mode no command byte is sent but the checksum still
+includes the read data command, 0x42.
+
+A 256 entry table is worked out once so each byte costs one lookup.
+"""
+
+#: x^8 + x^2 + x + 1.
+CRC8_POLYNOMIAL = 0x07
+#: The SPI_CRC_ERR_EN bit of the error enable register.
+SPI_CRC_ERR_EN = 0x000004
+#: The SPI_CRC_ERR bit of the error register.
+SPI_CRC_ERR = 0x000004
+
+
+def _make_table(polynomial):
+    table = []
+    for byte_value in range(256):
+        crc = byte_value
+        for _ in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ polynomial) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+        table.append(crc)
+    return tuple(table)
+
+
+#: The CRC of each byte value.
+CRC8_TABLE = _make_table(CRC8_POLYNOMIAL)
+
+
+def crc8(data, crc=0):
+    """ Returns the checksum of data.
+    Args:
+        data: The bytes, command byte first.
+        crc: The checksum of any bytes before data.
+    Returns:
+        The checksum, 0 to 255.
+    """
+    table = CRC8_TABLE
+    for byte_value in data:
+        crc = table[crc ^ byte_value]
+    return crc
+
+
+def append_crc(frame):
+    """ Returns frame with its checksum appended, as sent for a write.
+    Args:
+        frame: The bytes to send, command byte first.
+    """
+    frame = bytes(frame)
+    return frame + bytes([crc8(frame)])
+
+
+def check_crc(command, data):
+    """ Checks the checksum of a read.
+    Args:
+        command: The command byte that was sent, 0x42 in continuous read
+            mode.
+        data: The bytes clocked out after the command byte.  The last byte
+            is the checksum.
+    Returns:
+        True if the checksum is correct.
+    """
+    # The checksum of data followed by its own checksum is 0.
+    return crc8(data, CRC8_TABLE[command]) == 0
@@ -5,8 +5,13 @@ the AD7124.
 """
 
 import time
+from ad7124 import ad7124convert
+from ad7124.ad7124batch import AD7124Batch
+from ad7124.ad7124crc import SPI_CRC_ERR_EN, append_crc, check_crc
+from ad7124.ad7124metrics import AD7124Metrics, MeteredTransport
 from ad7124.ad7124spi import AD7124SPI  # , bytes_to_string
 from ad7124.ad7124registers import AD7124RegNames, AD7124Registers
+from ad7124.ad7124stats import monotonic_ns
 
 
 class AD7124Driver:
@@ -14,10 +19,36 @@ class AD7124Driver:
     implementation.
     """
 
-    def __init__(self, position):
-        """ Initialise the AD7124 device. """
+    def __init__(self, position, transport=None):
+        """ Initialise the AD7124 device.
+        Args:
+            position: The Pi2 click shield position number, 1 or 2.
+            transport: The `ad7124.ad7124transport.AD7124Transport` used to
+                talk to the device.  If None, PiGPIO is used.
+        Raises:
+            OSError: If the device is not an AD7124.
+        """
         self._registers = AD7124Registers()
-        self._spi = AD7124SPI(position)
+        self._spi = AD7124SPI(position, transport)
+        #: The Pi2 click shield position number.
+        self.position = position
+        # The active AD7124Batch, if any.
+        self._batch = None
+        # Status polls made by the last read_data_wait/read_continuous.
+        self._last_polls = 0
+        #: Set to an `ad7124.ad7124stats.AD7124Stats` to record the timing
+        #: of every sample read by `read_data_timed()`.
+        self.stats = None
+        #: The `ad7124.ad7124metrics.AD7124Metrics` being updated or None.
+        #: See `enable_metrics()`.
+        self.metrics = None
+        # The AD7124WaitStrategy used by read_data_wait, if any.
+        self._wait = None
+        # True when transfers are protected by checksums.
+        self._crc = False
+        #: Number of times a frame with a bad checksum is sent again before
+        #: giving up.  See `enable_crc()`.
+        self.crc_retries = 3
         self.reset()
         # Check correct device is present.
         ad7124_id = self.read_id()
@@ -34,14 +65,12 @@ class AD7124Driver:
         command = 0
         if read:
             command += 1 << 6
-        command += register_enum.value & 0x3F
+        command += register_enum & 0x3F
         # print("_build_command", hex(command))
         return command
 
-    def _read_register(self, register_enum, status_byte):
-        """ Returns the value read from the register as a tuple of:
-        count and a list of bytes.
-        """
+    def _read_frame(self, register_enum, status_byte):
+        """ Returns the bytes to send to read the given register. """
         to_send = []
         command = self._build_command(register_enum, True)
         to_send.append(command)
@@ -49,13 +78,74 @@ class AD7124Driver:
         num_bytes = self._registers.size(register_enum)
         if status_byte:
             num_bytes += 1
+        if self._crc:
+            num_bytes += 1
         value = 0
         value_bytes = value.to_bytes(num_bytes, byteorder="big")
         to_send += value_bytes
+        return to_send
+
+    def _read_register(self, register_enum, status_byte):
+        """ Returns the value read from the register as a tuple of:
+        count and a list of bytes.
+        """
+        # Keep the order of any queued writes.
+        self._flush_batch()
+        to_send = self._read_frame(register_enum, status_byte)
         (count, result) = self._spi.read_register(to_send)
         # print("_read_register: count", count, "data", result)
+        if self._crc:
+            result = self._check_reads([to_send], [result], [0])[0]
         return result
 
+    def _write_frame(self, register_enum, value):
+        """ Returns the bytes to send to write the given register. """
+        to_send = [self._build_command(register_enum)]
+        # Convert value to bytes.
+        num_bytes = self._registers.size(register_enum)
+        to_send += value.to_bytes(num_bytes, byteorder="big")
+        if self._crc:
+            return append_crc(to_send)
+        return to_send
+
+    def _count_crc_error(self):
+        if self.metrics is not None:
+            self.metrics.crc_errors += 1
+
+    def _check_reads(self, frames, received, indexes):
+        """ Checks the checksums of read frames.  Only the frames that fail
+        are read again.
+        Args:
+            frames: The bytes sent for each frame.
+            received: The bytes read for each frame.
+            indexes: The indexes of the read frames to check.
+        Returns:
+            A copy of received with the checksums of the checked frames
+            removed.
+        Raises:
+            OSError: If a frame still fails after crc_retries attempts.
+        """
+        received = list(received)
+        attempts = 0
+        while True:
+            failed = []
+            for index in indexes:
+                data = received[index]
+                if check_crc(frames[index][0], data[1:]):
+                    received[index] = data[:-1]
+                else:
+                    self._count_crc_error()
+                    failed.append(index)
+            if not failed:
+                return received
+            if attempts == self.crc_retries:
+                raise OSError("ERROR: CRC error reading from the AD7124")
+            attempts += 1
+            again = self._spi.xfer_many([frames[index] for index in failed])
+            for (index, data) in zip(failed, again):
+                received[index] = data
+            indexes = failed
+
     def _data_to_int(_, data):
         int_value = 0
         # Remove first byte as always 0xFF
@@ -65,13 +155,188 @@ class AD7124Driver:
             int_value |= byte_value
         return int_value
 
+    def _flush_batch(self):
+        if self._batch is not None:
+            self._batch.flush()
+
+    def batch(self):
+        """ Returns a new `ad7124.ad7124batch.AD7124Batch`.
+        Use it in a with statement.  All register writes made inside the
+        with block are sent in as few SPI transfers as possible when the
+        block ends.
+        """
+        return AD7124Batch(self, self._spi)
+
+    def enable_metrics(self, metrics=None):
+        """ Starts counting the SPI traffic and the sample reads.
+        Args:
+            metrics: The `AD7124Metrics` to update.  If None, a new one is
+                created.
+        Returns:
+            The AD7124Metrics.  Use `AD7124Metrics.snapshot()` to read it.
+        """
+        self.disable_metrics()
+        if metrics is None:
+            metrics = AD7124Metrics()
+        self._spi.transport = MeteredTransport(self._spi.transport, metrics)
+        self.metrics = metrics
+        return metrics
+
+    def disable_metrics(self):
+        """ Stops counting.  The transport is unwrapped so that there is no
+        cost for each transfer.
+        """
+        if self.metrics is not None:
+            self._spi.transport = self._spi.transport.transport
+            self.metrics = None
+
+    def set_wait_strategy(self, strategy):
+        """ Sets how `read_data_wait()` and `read_continuous()` wait for the
+        next conversion.
+        Args:
+            strategy: An `ad7124.ad7124wait.AD7124WaitStrategy` or None to
+                poll as fast as possible.
+        """
+        if strategy is not None:
+            strategy.attach(self)
+        self._wait = strategy
+
+    def set_sync(self, level):
+        """ Drives the SYNC pin.  While SYNC is low the AD7124 is held in
+        reset and conversions start on the rising edge.  Any batched
+        register writes are sent first.
+        Args:
+            level: True for high, False for low.
+        Raises:
+            NotImplementedError: If the transport cannot drive SYNC.
+        """
+        self._flush_batch()
+        self._spi.set_sync(level)
+
+    def set_mode(self, mode):
+        """ Changes the operating mode bits of the ADC control register.
+        The other bits keep the values last written.  Writing single
+        conversion mode starts a conversion.
+        Args:
+            mode: 0 continuous, 1 single, 2 standby, 3 power down, 4 idle.
+        """
+        value = self._shadow[AD7124RegNames.ADC_CTRL_REG] & ~0x003C
+        value |= (mode & 0x0F) << 2
+        self.write_register(AD7124RegNames.ADC_CTRL_REG, value)
+
+    def calibrate(self, mode, timeout=5.0):
+        """ Runs a calibration using the enabled channel.
+        The AD7124 writes the result to the offset or gain register of the
+        setup used by the channel and then goes to idle mode.  The offset
+        and gain registers of every setup are then read in one batch so
+        that `cached_register()` returns the new values.  Only one channel
+        should be enabled, see `ad7124.ad7124calibration`.
+        Args:
+            mode: 5 internal zero-scale, 6 internal full-scale, 7 system
+                zero-scale or 8 system full-scale.
+            timeout: The maximum time to wait in seconds.
+        Raises:
+            ValueError: If mode is not a calibration mode.
+            OSError: If the calibration does not finish within timeout.
+        """
+        if not 5 <= mode <= 8:
+            raise ValueError("ERROR: calibration mode must be 5 to 8")
+        self.set_mode(mode)
+        end_time = time.time() + timeout
+        register_enum = AD7124RegNames.ADC_CTRL_REG
+        while (self.read_register(register_enum) >> 2) & 0x0F == mode:
+            if time.time() > end_time:
+                raise OSError("ERROR: calibration did not finish")
+            time.sleep(0.001)
+        # The ADC is now in idle mode.
+        value = self._shadow[register_enum] & ~0x003C
+        self._shadow[register_enum] = value | (4 << 2)
+        with self.batch() as batch:
+            for setup in range(8):
+                batch.read_register(AD7124RegNames.OFFS0_REG + setup)
+                batch.read_register(AD7124RegNames.GAIN0_REG + setup)
+        self._shadow.update(batch.results)
+
+    @property
+    def crc(self):
+        """ True if transfers are protected by checksums. """
+        return self._crc
+
+    def enable_crc(self):
+        """ Protects every transfer with a CRC8 checksum.
+        The SPI_CRC_ERR_EN bit of the error enable register is set.  From
+        then on the AD7124 appends a checksum to everything it sends and
+        ignores writes that do not end with the correct checksum.
+        Reads with a bad checksum are sent again, up to `crc_retries`
+        times.  Writes are checked using the SPI_CRC_ERR flag of the error
+        register and only the registers that were not written are sent
+        again.  In continuous read mode, conversions with a bad checksum
+        are dropped.  The reset clears the bit.
+        """
+        if self._crc:
+            return
+        self._flush_batch()
+        register_enum = AD7124RegNames.ERREN_REG
+        value = self._shadow[register_enum] | SPI_CRC_ERR_EN
+        # This write does not have a checksum, the ones after it do.
+        self._spi.write_register(self._write_frame(register_enum, value))
+        self._shadow[register_enum] = value
+        self._crc = True
+        self._set_stream_size()
+
+    def disable_crc(self):
+        """ Stops using checksums, see `enable_crc()`. """
+        if not self._crc:
+            return
+        self._flush_batch()
+        register_enum = AD7124RegNames.ERREN_REG
+        value = self._shadow[register_enum] & ~SPI_CRC_ERR_EN
+        self._spi.write_register(self._write_frame(register_enum, value))
+        self._shadow[register_enum] = value
+        self._crc = False
+        self._set_stream_size()
+
+    @property
+    def power_mode(self):
+        """ The power mode last set using `set_adc_control()`. """
+        return (self._shadow[AD7124RegNames.ADC_CTRL_REG] >> 6) & 0x03
+
+    @property
+    def continuous_read(self):
+        """ True if the ADC is in continuous read mode. """
+        return bool(self._shadow[AD7124RegNames.ADC_CTRL_REG] & 0x0800)
+
+    def _count_read(self, samples, timeouts):
+        """ Updates the metrics for a call to read_data_wait or
+        read_continuous.
+        Args:
+            samples: The number of samples read, 0 or 1.
+            timeouts: 1 if no data was read within 1 second, otherwise 0.
+        """
+        self.metrics.samples += samples
+        self.metrics.timeouts += timeouts
+        self.metrics.polls += self._last_polls
+
     def reset(self):
         """ Resets the AD7124 to power up conditions. """
+        self._flush_batch()
         to_send = b"\xff\xff\xff\xff\xff\xff\xff\xff"
         # print("reset command", to_send)
         self._spi.write_register(to_send)
         # TODO WAIT UNTIL PROPERLY READY
         time.sleep(0.001)
+        # The reset puts all registers back to their initial values and exits
+        # continuous read mode.
+        self._shadow = {}
+        for register_enum in AD7124RegNames:
+            self._shadow[register_enum] = self._registers.initial(
+                register_enum
+            )
+        self._stream_status = False
+        self._crc = False
+        self._set_stream_size()
+        if self._wait is not None:
+            self._wait.invalidate()
         # Disable Channel 0 (enabled by default after reset).
         # 0x0001 is default for the other channel registers.
         self.write_register(AD7124RegNames.CH0_MAP_REG, 0x0001)
@@ -85,25 +350,47 @@ class AD7124Driver:
         result = self.read_register(register_enum)
         return result
 
+    def _cacheable(self, register_enum):
+        """ Returns True if the register only changes when it is written.
+        The mode bits of the ADC control register are changed by the ADC so
+        it is not cacheable.
+        """
+        return (
+            self._registers.access(register_enum) == 1
+            and register_enum != AD7124RegNames.ADC_CTRL_REG
+        )
+
     def write_register(self, register_enum, value):
         """ Write the given value to the given register.
+        The value is stored in the shadow copy of the registers.  Writes
+        that would not change a cacheable register are skipped.
         Args:
             register_enum: The register to write to,
                 e.g. AD7124RegNames.ERREN_REG.
             value: The value as an integer.
         """
-        # Command value
-        to_send = []
-        command = self._build_command(register_enum)
-        to_send.append(command)
-        # Convert value to bytes.
-        num_bytes = self._registers.size(register_enum)
-        value_bytes = value.to_bytes(num_bytes, byteorder="big")
-        to_send += value_bytes
+        if (
+            self._cacheable(register_enum)
+            and self._shadow.get(register_enum) == value
+        ):
+            # print("write_register: unchanged", hex(register_enum))
+            return
+        to_send = self._write_frame(register_enum, value)
         # Print to_send as hex values for easier debugging.
         # print("write_register: to_send", bytes_to_string(to_send))
         # Write the data.
-        self._spi.write_register(to_send)
+        if self._batch is not None:
+            self._batch.add_write(register_enum, value, to_send)
+        elif self._crc:
+            # The batch checks that the write was not ignored.
+            with self.batch() as batch:
+                batch.add_write(register_enum, value, to_send)
+        else:
+            self._spi.write_register(to_send)
+        self._shadow[register_enum] = value
+        if self._wait is not None:
+            # The sample period may have changed.
+            self._wait.invalidate()
 
     def read_register(self, register_enum):
         """ Returns the value read from the register as an int value.
@@ -118,6 +405,45 @@ class AD7124Driver:
         # print("read_register: value", hex(value))
         return value
 
+    def cached_register(self, register_enum):
+        """ Returns the value of the register without using the SPI bus if
+        possible.
+        Registers that only change when written, e.g. the channel, config
+        and filter registers, are read from the shadow copy.  Other
+        registers are read from the device.
+        Args:
+            register_enum: The register to read,
+                e.g. AD7124RegNames.CH0_MAP_REG.
+        Returns:
+            An integer value of the register contents.
+        """
+        if self._cacheable(register_enum):
+            return self._shadow[register_enum]
+        return self.read_register(register_enum)
+
+    def update_register(self, register_enum, mask, value):
+        """ Changes some of the bits of a register.
+        The current value comes from `cached_register()` so this usually
+        costs no more than one write.  No write is made if nothing changes.
+        Args:
+            register_enum: The register to change.
+            mask: The bits to change.
+            value: The new values of the bits in mask.
+        """
+        current = self.cached_register(register_enum)
+        new_value = (current & ~mask) | (value & mask)
+        self.write_register(register_enum, new_value)
+
+    def sync_cache(self):
+        """ Reads all cacheable registers from the device into the shadow
+        copy.  Use this if the device may have been changed without using
+        this driver, e.g. after a power cycle.
+        """
+        for register_enum in AD7124RegNames:
+            if self._cacheable(register_enum):
+                value = self.read_register(register_enum)
+                self._shadow[register_enum] = value
+
     def read_status(self):
         """ Returns the value of the status register as a tuple.
         Returns:
@@ -142,7 +468,7 @@ class AD7124Driver:
         if value & 0x10:
             power_on_reset = True
             # print("read_status: power_on_reset", power_on_reset)
-        active_channel &= 0x0F
+        active_channel = value & 0x0F
         return (ready, error, power_on_reset, active_channel)
 
     def read_register_with_status(self, register_enum):
@@ -161,35 +487,270 @@ class AD7124Driver:
         # Status byte is the last byte.
         value = self._data_to_int(result[:-1])
         status = result[-1]
-        print(
-            "read_register_with_status: value:",
-            hex(value),
-            "status: ",
-            hex(status),
-        )
+        # print(
+        #     "read_register_with_status: value:",
+        #     hex(value),
+        #     "status: ",
+        #     hex(status),
+        # )
         return (value, status)
 
+    def _read_data_ready(self):
+        """ Reads the data register if a new conversion is available.
+        If the DATA_STATUS bit of the ADC control register is set, this is a
+        single SPI transfer that returns the data and the status register
+        together.  Otherwise, the status register is read and then, if
+        ready, the data register is read.
+        Returns:
+            Tuple containing channel_number and the raw value or None if no
+            new data is available.
+        """
+        if self._shadow[AD7124RegNames.ADC_CTRL_REG] & 0x0400:
+            (int_value, status) = self.read_register_with_status(
+                AD7124RegNames.DATA_REG
+            )
+            # RDY (bit 7) is low when ready, ERROR_FLAG is bit 6.
+            if not status & 0xC0:
+                return (status & 0x0F, int_value)
+            if status & 0x40 and self.metrics is not None:
+                self.metrics.errors += 1
+            return None
+        (ready, error, _, channel_number) = self.read_status()
+        if ready and not error:
+            int_value = self.read_register(AD7124RegNames.DATA_REG)
+            # print("rdw: int_value, channel", hex(int_value),
+            #       channel_number)
+            return (channel_number, int_value)
+        if error and self.metrics is not None:
+            self.metrics.errors += 1
+        return None
+
     def read_data_wait(self):
         """ Waits for the data register to contain new data and then reads it.
+        If the transport can detect the falling edge of DOUT/RDY, e.g.
+        `PigpioTransport(position, ready_edge=True)`, this sleeps until the
+        conversion is ready instead of polling the status register.
+        Otherwise the status is polled as fast as possible unless a wait
+        strategy is set, see `set_wait_strategy()`.
         Returns:
-            Tuple containing channel_number and the raw value.
+            Tuple containing channel_number and the raw value.  The
+            channel_number is -1 if no data was read within 1 second.
         """
-        channel_number = -1
-        int_value = 0
+        wait = self._wait
+        if wait is not None:
+            wait.before_read()
         start_time = time.time()
+        self._last_polls = 0
+        sample = None
+        while sample is None:
+            if self._spi.ready_edge:
+                timeout = start_time + 1 - time.time()
+                if timeout <= 0 or not self._spi.wait_ready(timeout):
+                    # print("rdw: no ready edge")
+                    sample = (-1, 0)
+                    break
+            self._last_polls += 1
+            sample = self._read_data_ready()
+            if sample is not None:
+                if wait is not None:
+                    wait.after_sample()
+            elif time.time() > (start_time + 1):
+                # Break out of loop if stuck.
+                # print("rdw: loop exit")
+                sample = (-1, 0)
+            elif wait is not None:
+                wait.between_polls()
+        if self.metrics is not None:
+            timed_out = sample[0] < 0
+            self._count_read(int(not timed_out), int(timed_out))
+        return sample
+
+    def read_data_timed(self):
+        """ Reads the next sample and the time that it was read.
+        Uses `read_continuous()` in continuous read mode, otherwise
+        `read_data_wait()`.  If `stats` is set, the sample is recorded.
+        Returns:
+            Tuple containing channel_number, the raw value and the
+            time.monotonic_ns() timestamp taken when the read completed.
+            The channel_number is -1 if no data was read within 1 second.
+        """
+        start = monotonic_ns()
+        if self._shadow[AD7124RegNames.ADC_CTRL_REG] & 0x0800:
+            (channel_number, int_value) = self.read_continuous()
+        else:
+            (channel_number, int_value) = self.read_data_wait()
+        timestamp = monotonic_ns()
+        if self.stats is not None and channel_number >= 0:
+            self.stats.record(
+                channel_number, timestamp, timestamp - start, self._last_polls
+            )
+        return (channel_number, int_value, timestamp)
+
+    def start_continuous_read(self, data_status=True):
+        """ Puts the ADC into continuous read mode.
+        The rest of the ADC control register keeps the values last set using
+        `set_adc_control()` except that the mode is set to continuous
+        conversion, which continuous read mode requires.
+        While in continuous read mode, the only functions that can be used
+        are `read_continuous()` and `stop_continuous_read()`.
+        Args:
+            data_status: True to append the status register to each
+                conversion.  This is needed to know which channel each
+                value came from and to detect when new data is ready.
+        """
+        value = self._shadow[AD7124RegNames.ADC_CTRL_REG]
+        # Continuous conversion mode, bits 5:2 = 0.
+        value &= ~0x003C
+        # CONT_READ bit 11.
+        value |= 0x0800
+        # DATA_STATUS bit 10.
+        if data_status:
+            value |= 0x0400
+        else:
+            value &= ~0x0400
+        self.write_register(AD7124RegNames.ADC_CTRL_REG, value)
+        self._stream_status = data_status
+        self._set_stream_size()
+
+    def _set_stream_size(self):
+        """ Works out the number of bytes clocked out for each conversion
+        in continuous read mode.
+        """
+        self._stream_size = self._registers.size(AD7124RegNames.DATA_REG)
+        if self._stream_status:
+            self._stream_size += 1
+        if self._crc:
+            self._stream_size += 1
+
+    def read_continuous(self):
+        """ Reads the next conversion in continuous read mode.
+        No command byte is sent, DIN is held low while the data is clocked
+        out.  When the status byte is enabled, this waits until a new
+        conversion is available.  Otherwise the caller must only read when
+        data is ready, e.g. by pacing reads at the output data rate.
+        If checksums are enabled, conversions with a bad checksum are
+        dropped.
+        Returns:
+            Tuple containing channel_number and the raw value.  The
+            channel_number is -1 if the status byte is not enabled or if
+            no data was read within 1 second.  Without the status byte, the
+            raw value is 0 if the checksum is bad.
+        """
+        to_send = bytes(self._stream_size)
+        wait = self._wait
+        if wait is not None:
+            wait.before_read()
+        start_time = time.time()
+        self._last_polls = 0
+        crc = self._crc
+        # The read data command is included in the checksum.
+        command = 0x40 | AD7124RegNames.DATA_REG
+        # (samples, timeouts) for the metrics.
+        counts = (1, 0)
         while True:
-            (ready, error, _, channel_number) = self.read_status()
-            if ready and error == 0:
-                int_value = self.read_register(AD7124RegNames.DATA_REG)
-                # print("rdw: int_value, channel", hex(int_value),
-                #       channel_number)
-                break
-            else:
-                if time.time() > (start_time + 1):
-                    # Break out of loop if stuck.
-                    # print("rdw: loop exit")
+            self._last_polls += 1
+            (_, result) = self._spi.read_register(to_send)
+            status = 0
+            if crc:
+                if check_crc(command, result):
+                    result = result[:-1]
+                elif not self._stream_status:
+                    self._count_crc_error()
+                    sample = (-1, 0)
+                    counts = (0, 0)
                     break
-        return (channel_number, int_value)
+                else:
+                    self._count_crc_error()
+                    # A status byte with RDY set so the frame is treated as
+                    # not ready.
+                    result = b"\x80"
+            if not self._stream_status:
+                # Without RDY every frame is taken as a conversion.
+                sample = (-1, int.from_bytes(result, byteorder="big"))
+                break
+            status = result[-1]
+            # RDY (bit 7) is low when the conversion has not been read.
+            if not status & 0x80:
+                value = int.from_bytes(result[:-1], byteorder="big")
+                sample = (status & 0x0F, value)
+                if wait is not None:
+                    wait.after_sample()
+                break
+            if time.time() > (start_time + 1):
+                # Break out of loop if stuck.
+                sample = (-1, 0)
+                counts = (0, 1)
+                break
+            if wait is not None:
+                wait.between_polls()
+        if self.metrics is not None:
+            if status & 0x40:
+                self.metrics.errors += 1
+            self._count_read(*counts)
+        return sample
+
+    def read_continuous_many(self, count):
+        """ Reads up to count conversions in continuous read mode using as
+        few bus operations as the transport allows, see
+        `AD7124Transport.xfer_many()`.
+        Frames read before a new conversion was ready are dropped so the
+        status byte must be enabled.  Frames with a bad checksum are also
+        dropped.
+        Args:
+            count: The number of frames to read.
+        Returns:
+            A list of (channel_number, raw value) tuples.  Can be empty.
+        Raises:
+            ValueError: If the status byte is not enabled.
+        """
+        if not self._stream_status:
+            raise ValueError("ERROR: data_status must be enabled")
+        frames = [bytes(self._stream_size)] * count
+        conversions = []
+        crc = self._crc
+        command = 0x40 | AD7124RegNames.DATA_REG
+        for result in self._spi.xfer_many(frames):
+            if crc:
+                if not check_crc(command, result):
+                    self._count_crc_error()
+                    continue
+                result = result[:-1]
+            status = result[-1]
+            # RDY (bit 7) is low when the conversion has not been read.
+            if not status & 0x80:
+                value = int.from_bytes(result[:-1], byteorder="big")
+                conversions.append((status & 0x0F, value))
+        if self.metrics is not None:
+            self.metrics.samples += len(conversions)
+            self.metrics.polls += count
+        return conversions
+
+    def stop_continuous_read(self):
+        """ Exits continuous read mode.
+        The exit sequence is a read data command (0x42) that has to be sent
+        while DOUT/RDY is low.  As the RDY line is not visible between
+        transfers, the command is repeated until the ID register can be
+        read.  If this fails within 1 second, the ADC is reset, the other
+        documented way of exiting continuous read mode.
+        """
+        to_send = bytes([self._build_command(AD7124RegNames.DATA_REG, True)])
+        to_send += bytes(self._stream_size)
+        start_time = time.time()
+        while True:
+            self._spi.read_register(to_send)
+            try:
+                ad7124_id = self.read_id()
+            except OSError:
+                # Still in continuous read mode so the checksum is wrong.
+                ad7124_id = None
+            if ad7124_id in (0x14, 0x16):
+                # The ADC clears CONT_READ when exiting.
+                self._shadow[AD7124RegNames.ADC_CTRL_REG] &= ~0x0800
+                break
+            if time.time() > (start_time + 1):
+                # print("stop_continuous_read: reset")
+                self.reset()
+                break
 
     def set_channel(self, channel, enable, setup, ainp, ainm):
         """ Sets the given channel using the given values.
@@ -223,9 +784,30 @@ class AD7124Driver:
         else:
             raise ValueError("Channel must be in range 0-15")
 
-    def _write_setup(self, setup, value):
+    def enable_channel(self, channel, enable):
+        """ Enables or disables a channel without changing its other
+        settings.
+        Args:
+            channel: The channel to change, 0 to 15.
+            enable: True to enable the channel.
+        """
+        if 0 <= channel <= 15:
+            register_enum = AD7124RegNames.CH0_MAP_REG + channel
+            value = 0x8000 if enable else 0
+            self.update_register(register_enum, 0x8000, value)
+        else:
+            raise ValueError("Channel must be in range 0-15")
+
+    def _write_setup(self, first_register, setup, value):
+        """ Writes to the register of the given setup.
+        Args:
+            first_register: The register used by setup 0,
+                e.g. AD7124RegNames.FILT0_REG.
+            setup: The setup number, 0 to 7.
+            value: The value to write.
+        """
         if 0 <= setup <= 7:
-            register_enum = AD7124RegNames.CFG0_REG + setup
+            register_enum = first_register + setup
             self.write_register(register_enum, value)
         else:
             raise ValueError("setup must be in range 0-7")
@@ -262,7 +844,7 @@ class AD7124Driver:
         value |= (ref_sel & 0x03) << 3
         value |= pga & 0x07
         # print("set_config_register value:", hex(value))
-        self._write_setup(setup, value)
+        self._write_setup(AD7124RegNames.CFG0_REG, setup, value)
 
     def set_setup_filter(
         self,
@@ -287,7 +869,7 @@ class AD7124Driver:
             value |= 0x010000
         value |= output_data_rate & 0x7FF
         # print("set_filter_register value:", hex(value))
-        self._write_setup(setup, value)
+        self._write_setup(AD7124RegNames.FILT0_REG, setup, value)
 
     def set_setup_offset(self, setup, new_offset):
         """ Sets the offset register for the setup.
@@ -297,7 +879,7 @@ class AD7124Driver:
         value = 0
         value |= new_offset & 0xFFFFFF
         # print("set_setup_offset value:", hex(value))
-        self._write_setup(setup, value)
+        self._write_setup(AD7124RegNames.OFFS0_REG, setup, value)
 
     def set_setup_gain(self, setup, new_gain):
         """ Sets the gain register for the setup.
@@ -307,7 +889,7 @@ class AD7124Driver:
         value = 0
         value |= new_gain & 0xFFFFFF
         # print("set_gain_register value:", hex(value))
-        self._write_setup(setup, value)
+        self._write_setup(AD7124RegNames.GAIN0_REG, setup, value)
 
     def set_adc_control(
         self,
@@ -368,10 +950,10 @@ class AD7124Driver:
         """
         voltage = float(int_value)
         if bipolar:
-            # Subtract 1
-            voltage -= float(1)
             # Divide by 2^23
             voltage /= float(0x7FFFFF)
+            # Subtract 1
+            voltage -= float(1)
         else:
             # Divide by 2^24
             voltage /= float(0xFFFFFF)
@@ -381,6 +963,28 @@ class AD7124Driver:
         voltage *= float(scale)
         return voltage
 
+    def to_voltage_array(
+        _, int_values, gain, vref, bipolar, scale, channels=None
+    ):
+        """ Converts an array of integer values to voltages in one pass.
+        Args:
+            int_values: A NumPy array of values or a bytes buffer of packed
+                24 bit values.
+            gain: The PGA gain value, 1 to 128.
+            vref: The reference voltage, normally +1.25V or +2.5V.
+            bipolar: True for bipolar, else unipolar.
+            scale: A scaling factor used for external potential division.
+            channels: Optional array of the channel number of each value.
+                When given, the other arguments can be sequences indexed by
+                channel number.
+        Returns:
+            A NumPy array of voltages.
+        See `ad7124.ad7124convert.to_voltage()` for more details.
+        """
+        return ad7124convert.to_voltage(
+            int_values, gain, vref, bipolar, scale, channels
+        )
+
     def to_temperature(_, int_value):
         """ Converts the given ADC value to temperature in degrees Celcius.
         """
@@ -391,6 +995,17 @@ class AD7124Driver:
         # temperature_c = float(int_value - 0x800000) / 13584
         return temperature_c
 
+    def to_temperature_array(_, int_values):
+        """ Converts an array of ADC values to temperatures in degrees
+        Celcius in one pass.
+        Args:
+            int_values: A NumPy array of values or a bytes buffer of packed
+                24 bit values.
+        Returns:
+            A NumPy array of temperatures.
+        """
+        return ad7124convert.to_temperature(int_values)
+
     # def set_error_register(self, value):
     #     """ Set the ERROR_EN register.
     #     :param value: The value to set (24 bits).
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+""" An AD7124 emulator with realistic conversion timing.
+
+`AD7124Emulator` extends `ad7124.ad7124memory.MemoryTransport`.  Instead of
+conversions always being ready, they complete at the times given by the
+filter and power mode settings, see `ad7124.ad7124timing`.  The sequencer
+converts each enabled channel in turn and every change to the channel,
+setup or ADC control registers restarts the conversions.  While the SYNC
+pin is low no conversions are made and they start again on the rising
+edge.  The value of each channel can be a fixed code or a waveform with
+noise.
+
+Time is read from a clock.  By default this is the real monotonic clock.
+A `SimulatedClock` can be used instead so that tests run as fast as
+possible and give the same results every time.  With a simulated clock,
+each transfer takes the time it would take on the SPI bus.
+"""
+
+import bisect
+import math
+import random
+import time
+
+from ad7124 import ad7124timing
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class SimulatedClock:
+    """ A clock that only moves when told to. """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        """ Returns the current time in seconds. """
+        return self.now
+
+    def sleep(self, seconds):
+        """ Moves the time forward. """
+        if seconds > 0:
+            self.now += seconds
+
+
+def sine_wave(amplitude, frequency, offset=0.0):
+    """ Returns a waveform for `AD7124Emulator.set_input()`.
+    Args:
+        amplitude: The peak voltage.
+        frequency: The frequency in Hz.
+        offset: The DC voltage added to the sine wave.
+    """
+
+    def waveform(seconds):
+        return offset + amplitude * math.sin(2 * math.pi * frequency * seconds)
+
+    return waveform
+
+
+class AD7124Emulator(MemoryTransport):
+    """ Emulates the AD7124 including when conversions are ready.
+    Use it in place of the PiGPIO transport:
+    ```
+    emulator = AD7124Emulator()
+    emulator.set_input(1, sine_wave(1.0, 50.0), noise=0.001)
+    driver = AD7124Driver(1, emulator)
+    ```
+    """
+
+    #: Registers that restart the conversions when written.
+    RESTART_REGISTERS = frozenset(
+        [AD7124RegNames.ADC_CTRL_REG.value]
+        + list(
+            range(AD7124RegNames.CH0_MAP_REG, AD7124RegNames.FILT7_REG + 1)
+        )
+    )
+    #: ADC control register operating modes.
+    MODE_CONTINUOUS = 0
+    MODE_SINGLE = 1
+    MODE_IDLE = 4
+
+    def __init__(
+        self, position=1, ready_edge=False, clock=None, vref=2.5, seed=None
+    ):
+        """ Creates the emulator in its power on state.
+        Args:
+            position: The Pi2 click shield position number, 1 or 2.
+            ready_edge: True to emulate waiting for the DOUT/RDY edge.
+            clock: An object with time() and sleep() methods, e.g. a
+                `SimulatedClock`.  If None, the real monotonic clock is
+                used.
+            vref: The reference voltage used to convert input voltages.
+            seed: Seed for the noise so that runs can be repeated.
+        Raises:
+            ValueError: If position is out of range.
+        """
+        if clock is None:
+            self._time = time.monotonic
+            self._sleep = time.sleep
+            # The real bus takes the time itself.
+            self._bus_delay = None
+        else:
+            self._time = clock.time
+            self._sleep = clock.sleep
+            self._bus_delay = clock.sleep
+        self.vref = vref
+        self.baud_rate = self.AD7124_SPI_BAUD_RATE
+        self._random = random.Random(seed)
+        # (waveform, noise) for each channel set using set_input().
+        self._inputs = {}
+        self._sequence = []
+        self._start = 0.0
+        self._read_count = 0
+        super().__init__(position, ready_edge)
+
+    def set_input(self, channel, waveform, noise=0.0):
+        """ Sets the voltage on the inputs of a channel.
+        This replaces any code set by `set_code()`.
+        Args:
+            channel: The channel, 0 to 15.
+            waveform: The differential input voltage.  Either a number or a
+                function that takes the time in seconds and returns the
+                voltage, e.g. `sine_wave()`.
+            noise: The standard deviation of Gaussian noise in volts.
+        """
+        if not callable(waveform):
+            voltage = float(waveform)
+
+            def waveform(_):
+                return voltage
+
+        self._inputs[channel] = (waveform, noise)
+
+    def set_code(self, channel, code):
+        self._inputs.pop(channel, None)
+        super().set_code(channel, code)
+
+    def reset(self):
+        super().reset()
+        self._restart()
+
+    def _setup_of(self, channel):
+        address = AD7124RegNames.CH0_MAP_REG.value + channel
+        return (self._values[address] >> 12) & 0x07
+
+    def _restart(self):
+        """ Starts converting from the first enabled channel.  The timing
+        of each channel in the sequence is worked out once here.
+        """
+        self._start = self._time()
+        self._read_count = 0
+        adc_control = self._values[AD7124RegNames.ADC_CTRL_REG.value]
+        mode = (adc_control >> 2) & 0x0F
+        power_mode = (adc_control >> 6) & 0x03
+        channels = self._enabled_channels()
+        if mode not in (self.MODE_CONTINUOUS, self.MODE_SINGLE):
+            channels = []
+        if not self.sync:
+            # The filter and sequencer are held in reset.
+            channels = []
+        self._sequence = channels
+        self._single = mode == self.MODE_SINGLE
+        # Completion time of each conversion in one pass of the sequence,
+        # relative to the start of the pass.
+        self._offsets = []
+        self._period = None
+        elapsed = 0.0
+        for channel in channels:
+            address = AD7124RegNames.FILT0_REG.value + self._setup_of(channel)
+            settings = ad7124timing.decode_filter(self._values[address])
+            elapsed += ad7124timing.settling_time(
+                settings["filter_type"],
+                settings["fs"],
+                power_mode,
+                settings["post_filter"],
+                sequencer=len(channels) > 1,
+            )
+            self._offsets.append(elapsed)
+            if len(channels) == 1:
+                # Once settled, a single channel converts at the output
+                # data rate.
+                self._period = ad7124timing.conversion_period(
+                    settings["filter_type"],
+                    settings["fs"],
+                    power_mode,
+                    settings["post_filter"],
+                    settings["single_cycle"],
+                )
+        self._cycle = elapsed
+
+    def _completed(self, now):
+        """ Returns the number of conversions completed since the
+        restart.
+        """
+        if not self._sequence:
+            return 0
+        elapsed = now - self._start
+        if elapsed < self._offsets[0]:
+            return 0
+        if self._single:
+            return bisect.bisect_right(self._offsets, elapsed)
+        if self._period is not None:
+            return int((elapsed - self._offsets[0]) / self._period) + 1
+        passes = int(elapsed / self._cycle)
+        remainder = elapsed - passes * self._cycle
+        count = bisect.bisect_right(self._offsets, remainder)
+        return passes * len(self._sequence) + count
+
+    def _completion_time(self, index):
+        """ Returns the time that conversion index completes. """
+        if self._single and index >= len(self._sequence):
+            return math.inf
+        if self._period is not None:
+            return self._start + self._offsets[0] + index * self._period
+        (passes, position) = divmod(index, len(self._sequence))
+        return self._start + passes * self._cycle + self._offsets[position]
+
+    def _code(self, index):
+        """ Returns the raw value of conversion index. """
+        channel = self._sequence[index % len(self._sequence)]
+        if channel not in self._inputs:
+            return self._codes.get(channel, 0)
+        (waveform, noise) = self._inputs[channel]
+        voltage = waveform(self._completion_time(index) - self._start)
+        if noise:
+            voltage += self._random.gauss(0.0, noise)
+        config = self._values[
+            AD7124RegNames.CFG0_REG.value + self._setup_of(channel)
+        ]
+        gain = 1 << (config & 0x07)
+        fraction = voltage * gain / self.vref
+        if config & 0x0800:
+            # Bipolar, offset binary.
+            code = (fraction + 1) * 0x800000
+        else:
+            code = fraction * 0x1000000
+        return min(max(int(round(code)), 0), 0xFFFFFF)
+
+    def _status(self):
+        return self._status_of(self._completed(self._time()))
+
+    def _status_of(self, completed):
+        """ Returns the status register when completed conversions have
+        been made.
+        """
+        # RDY (bit 7) is low when there is a conversion that has not been
+        # read.  The channel is that of the last conversion.
+        status = 0
+        if completed <= self._read_count:
+            status |= 0x80
+        if completed and self._sequence:
+            status |= self._sequence[(completed - 1) % len(self._sequence)]
+        elif self._sequence:
+            status |= self._sequence[0]
+        if self._power_on_reset:
+            status |= 0x10
+        return status
+
+    def _read_value(self, address):
+        if (
+            address == AD7124RegNames.ADC_CTRL_REG.value
+            and self._single
+            and self._sequence
+        ):
+            # The ADC goes idle after a single conversion of each channel.
+            if self._completed(self._time()) >= len(self._sequence):
+                value = self._values[address] & ~0x003C
+                self._values[address] = value | (self.MODE_IDLE << 2)
+        return super()._read_value(address)
+
+    def _read_frame(self, address):
+        if address != AD7124RegNames.DATA_REG.value:
+            return super()._read_frame(address)
+        completed = self._completed(self._time())
+        value = self._code(completed - 1) if completed else 0
+        frame = value.to_bytes(3, byteorder="big")
+        adc_control = self._values[AD7124RegNames.ADC_CTRL_REG.value]
+        if adc_control & 0x0400:
+            # DATA_STATUS appends the status register.
+            frame += bytes([self._status_of(completed)])
+        # Reading the data clears RDY.
+        self._read_count = completed
+        return frame
+
+    def _write_value(self, address, value):
+        super()._write_value(address, value)
+        if address in self.RESTART_REGISTERS:
+            self._restart()
+
+    def set_sync(self, level):
+        """ Sets the level of the SYNC pin.  Every change restarts the
+        conversions.
+        Args:
+            level: True for high, False for low.
+        """
+        changed = bool(level) != self.sync
+        super().set_sync(level)
+        if changed:
+            self._restart()
+
+    def wait_ready(self, timeout):
+        """ Waits until there is a conversion that has not been read.
+        Args:
+            timeout: The maximum time to wait in seconds.
+        Returns:
+            True if ready, False if timed out.
+        """
+        now = self._time()
+        if not self._sequence:
+            self._sleep(timeout)
+            return False
+        delay = self._completion_time(self._read_count) - now
+        if delay > timeout:
+            self._sleep(timeout)
+            return False
+        self._sleep(delay)
+        return True
+
+    def xfer(self, to_send):
+        if self._bus_delay is not None:
+            self._bus_delay(len(to_send) * 8 / self.baud_rate)
+        return super().xfer(to_send)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+""" An in-memory AD7124 that is used in place of the SPI bus.
+
+The transport decodes the command bytes sent by the driver and keeps a
+copy of the register map so that the whole driver stack can be run
+without any hardware, e.g. for unit tests and benchmarks.
+Conversions complete instantly so the status register always reports that
+data is ready.  Continuous read mode and the DATA_STATUS option are
+supported.  The level of the SYNC pin is recorded but has no effect.
+When the SPI_CRC_ERR_EN bit of the error enable register is set, checksums
+are appended to reads and checked on writes, see `ad7124.ad7124crc`.
+"""
+
+from ad7124.ad7124crc import CRC8_TABLE, SPI_CRC_ERR, SPI_CRC_ERR_EN, crc8
+from ad7124.ad7124registers import AD7124RegNames, AD7124Registers
+from ad7124.ad7124transport import AD7124Transport
+
+
+class MemoryTransport(AD7124Transport):
+    """ Emulates the AD7124 register map.
+    The value returned for each channel is set using `set_code()`.
+    """
+
+    #: Value of the ID register.
+    DEVICE_ID = 0x14
+    #: Byte clocked out while the command byte is being written.
+    IDLE_BYTE = 0xFF
+
+    def __init__(self, position=1, ready_edge=False):
+        """ Creates the register map in its power on state.
+        Args:
+            position: The Pi2 click shield position number, 1 or 2.
+            ready_edge: True to emulate waiting for the DOUT/RDY edge.
+        Raises:
+            ValueError: If position is out of range.
+        """
+        self.spi_channel(position)
+        self.position = position
+        self.ready_edge = ready_edge
+        self._registers = AD7124Registers()
+        # Raw value returned by each channel.
+        self._codes = {}
+        #: The level of the SYNC pin.  High unless `set_sync()` is used.
+        self.sync = True
+        #: The number of rising edges on SYNC.
+        self.sync_edges = 0
+        #: The offset register value set by a zero-scale calibration.
+        self.calibration_offset = 0x800000
+        #: The gain register value set by a full-scale calibration.
+        self.calibration_gain = 0x500000
+        #: The number of calibrations made.
+        self.calibrations = 0
+        self.reset()
+
+    def reset(self):
+        """ Sets all registers back to their power on values. """
+        self._values = {}
+        for register_enum in AD7124RegNames:
+            self._values[register_enum.value] = self._registers.initial(
+                register_enum
+            )
+        self._values[AD7124RegNames.ID_REG.value] = self.DEVICE_ID
+        self._power_on_reset = True
+        self._active_channel = 0
+        self._active_channel = self._next_channel(-1)
+
+    def set_code(self, channel, code):
+        """ Sets the raw value returned when the given channel is read.
+        Args:
+            channel: The channel, 0 to 15.
+            code: The 24 bit raw value.
+        """
+        self._codes[channel] = code & 0xFFFFFF
+
+    def register(self, register_enum):
+        """ Returns the current value of the given register. """
+        return self._values[register_enum.value]
+
+    def _size(self, address):
+        try:
+            return self._registers.size(AD7124RegNames(address))
+        except ValueError:
+            # Registers that the driver does not know about, e.g. MCLK_COUNT.
+            return 1
+
+    def _enabled_channels(self):
+        channels = []
+        for channel in range(16):
+            address = AD7124RegNames.CH0_MAP_REG.value + channel
+            if self._values[address] & 0x8000:
+                channels.append(channel)
+        return channels
+
+    def _next_channel(self, channel):
+        """ Returns the enabled channel that is converted after channel. """
+        channels = self._enabled_channels()
+        for next_channel in channels:
+            if next_channel > channel:
+                return next_channel
+        if channels:
+            return channels[0]
+        return self._active_channel
+
+    def _status(self):
+        # RDY (bit 7) is low because a conversion is always ready.
+        status = self._active_channel & 0x0F
+        if self._power_on_reset:
+            status |= 0x10
+        return status
+
+    def _read_value(self, address):
+        """ Returns the value of a register as it is clocked out. """
+        if address == AD7124RegNames.STATUS_REG.value:
+            value = self._status()
+            self._power_on_reset = False
+        elif address == AD7124RegNames.ERR_REG.value:
+            # SPI_CRC_ERR is cleared by reading the error register.
+            value = self._values[address]
+            self._values[address] &= ~SPI_CRC_ERR
+        elif address == AD7124RegNames.DATA_REG.value:
+            value = self._codes.get(self._active_channel, 0)
+        else:
+            value = self._values.get(address, 0)
+        return value
+
+    def _write_value(self, address, value):
+        try:
+            register_enum = AD7124RegNames(address)
+        except ValueError:
+            return
+        # Only read/write registers can be written.
+        if self._registers.access(register_enum) == 1:
+            self._values[address] = value
+            if AD7124RegNames.CH0_MAP_REG <= address <= (
+                AD7124RegNames.CH15_MAP_REG
+            ):
+                self._active_channel = self._next_channel(-1)
+            elif address == AD7124RegNames.ADC_CTRL_REG:
+                mode = (value >> 2) & 0x0F
+                if 5 <= mode <= 8:
+                    self._calibrate(mode)
+
+    def _calibrate(self, mode):
+        """ Completes a calibration instantly.  The result is written to
+        the setup of the first enabled channel and the ADC goes idle.
+        """
+        self.calibrations += 1
+        channels = self._enabled_channels()
+        if channels:
+            address = AD7124RegNames.CH0_MAP_REG.value + channels[0]
+            setup = (self._values[address] >> 12) & 0x07
+            if mode in (5, 7):
+                address = AD7124RegNames.OFFS0_REG.value + setup
+                self._values[address] = self.calibration_offset
+            else:
+                address = AD7124RegNames.GAIN0_REG.value + setup
+                self._values[address] = self.calibration_gain
+        address = AD7124RegNames.ADC_CTRL_REG.value
+        # Idle mode.
+        self._values[address] = (self._values[address] & ~0x003C) | 0x0010
+
+    def _read_frame(self, address):
+        """ Returns the bytes clocked out after a read command. """
+        value = self._read_value(address)
+        num_bytes = self._size(address)
+        frame = value.to_bytes(num_bytes, byteorder="big")
+        if address == AD7124RegNames.DATA_REG.value:
+            adc_control = self._values[AD7124RegNames.ADC_CTRL_REG.value]
+            if adc_control & 0x0400:
+                # DATA_STATUS appends the status register.
+                frame += bytes([self._status()])
+            self._active_channel = self._next_channel(self._active_channel)
+        return frame
+
+    def wait_ready(self, timeout):
+        """ Conversions are always ready so this returns immediately.
+        Args:
+            timeout: The maximum time to wait in seconds.
+        Returns:
+            True.
+        """
+        return True
+
+    def set_sync(self, level):
+        """ Records the level of the SYNC pin.
+        Args:
+            level: True for high, False for low.
+        """
+        level = bool(level)
+        if level and not self.sync:
+            self.sync_edges += 1
+        self.sync = level
+
+    def _crc(self):
+        """ True if checksums are enabled. """
+        return self._values[AD7124RegNames.ERREN_REG.value] & SPI_CRC_ERR_EN
+
+    def _continuous_read(self):
+        adc_control = self._values[AD7124RegNames.ADC_CTRL_REG.value]
+        return adc_control & 0x0800
+
+    def _stream(self, count):
+        """ Returns count bytes of conversions in continuous read mode. """
+        result = bytearray()
+        command = 0x40 | AD7124RegNames.DATA_REG.value
+        while len(result) < count:
+            frame = self._read_frame(AD7124RegNames.DATA_REG.value)
+            if self._crc():
+                # The read data command is included in the checksum.
+                frame += bytes([crc8(frame, CRC8_TABLE[command])])
+            result += frame
+        return result[:count]
+
+    def xfer(self, to_send):
+        """ Decodes the bytes sent and returns the bytes the AD7124 would
+        have clocked out.
+        Args:
+            to_send: The bytes to send.
+        Returns:
+            Tuple containing (count of bytes read, data as bytes).
+        """
+        to_send = bytes(to_send)
+        count = len(to_send)
+        if count >= 8 and to_send[:8] == b"\xff" * 8:
+            # 64 consecutive 1s resets the device.
+            self.reset()
+            return (count, bytearray([self.IDLE_BYTE] * count))
+        if self._continuous_read():
+            read_data = 0x40 | AD7124RegNames.DATA_REG.value
+            if count == 0 or to_send[0] != read_data:
+                return (count, self._stream(count))
+            # A read data command exits continuous read mode.
+            self._values[AD7124RegNames.ADC_CTRL_REG.value] &= ~0x0800
+        result = bytearray()
+        index = 0
+        while index < count:
+            command = to_send[index]
+            index += 1
+            result.append(self.IDLE_BYTE)
+            if command & 0x80:
+                # Bit 7 must be 0 for a valid command so ignore it.
+                continue
+            address = command & 0x3F
+            crc = self._crc()
+            if command & 0x40:
+                frame = self._read_frame(address)
+                if crc:
+                    frame += bytes([crc8(frame, CRC8_TABLE[command])])
+                frame = frame[: count - index]
+                result += frame
+                index += len(frame)
+            else:
+                num_bytes = self._size(address)
+                if crc:
+                    num_bytes += 1
+                value_bytes = to_send[index : index + num_bytes]
+                result += bytes([self.IDLE_BYTE] * len(value_bytes))
+                index += len(value_bytes)
+                if len(value_bytes) != num_bytes:
+                    continue
+                if crc:
+                    if crc8(value_bytes, CRC8_TABLE[command]):
+                        # The write is ignored and the error flagged.
+                        error = AD7124RegNames.ERR_REG.value
+                        self._values[error] |= SPI_CRC_ERR
+                        continue
+                    value_bytes = value_bytes[:-1]
+                value = int.from_bytes(value_bytes, byteorder="big")
+                self._write_value(address, value)
+                if self._continuous_read():
+                    # The rest of the transfer clocks out conversions.
+                    result += self._stream(count - index)
+                    break
+        return (count, result)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+""" Counters for the SPI traffic and the sample reads.
+
+`MeteredTransport` wraps another transport and counts the transfers, the
+frames sent in them, the bytes moved and the time spent in the transport.
+The driver counts the status polls, timeouts and error flags.  Both write
+to an `AD7124Metrics`.  Metrics are enabled by
+`AD7124Driver.enable_metrics()`.  When they are not enabled the transport
+is not wrapped so there is no cost for each transfer.
+"""
+
+import time
+
+from ad7124.ad7124transport import AD7124Transport
+
+try:
+    perf_counter_ns = time.perf_counter_ns
+except AttributeError:
+    # Python 3.6
+
+    def perf_counter_ns():
+        return int(time.perf_counter() * 1e9)
+
+
+class AD7124Metrics:
+    """ The counters.  They are plain attributes so they can be read at
+    any time, e.g. while an acquisition thread is updating them.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ Sets all of the counters to zero. """
+        #: Number of bus operations.
+        self.transfers = 0
+        #: Number of frames sent.  `xfer_many()` joins several frames in
+        #: one bus operation.
+        self.frames = 0
+        #: Number of bytes sent, the same number are read.
+        self.bytes = 0
+        #: Time spent in the transport in ns.
+        self.transport_ns = 0
+        #: Number of samples read.
+        self.samples = 0
+        #: Number of status polls made while reading the samples.
+        self.polls = 0
+        #: Number of reads that returned no data within 1 second.
+        self.timeouts = 0
+        #: Number of status reads with the ERROR_FLAG bit set.
+        self.errors = 0
+        #: Number of frames with a bad checksum, see
+        #: `AD7124Driver.enable_crc()`.
+        self.crc_errors = 0
+        self._start_ns = perf_counter_ns()
+
+    def snapshot(self):
+        """ Returns the counters and some values derived from them.
+        Returns:
+            A dict of the counters plus:
+            * elapsed: Seconds since the counters were reset.
+            * polls_per_sample: The mean number of polls for each sample.
+            * bytes_per_second: The mean bus traffic.
+            * transport_fraction: The fraction of the elapsed time spent
+              in the transport.  Close to 1 means the bus is saturated.
+        """
+        elapsed = (perf_counter_ns() - self._start_ns) / 1e9
+        result = {
+            "transfers": self.transfers,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "transport_ns": self.transport_ns,
+            "samples": self.samples,
+            "polls": self.polls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "crc_errors": self.crc_errors,
+            "elapsed": elapsed,
+        }
+        if self.samples:
+            result["polls_per_sample"] = self.polls / self.samples
+        else:
+            result["polls_per_sample"] = None
+        if elapsed > 0:
+            result["bytes_per_second"] = self.bytes / elapsed
+            result["transport_fraction"] = self.transport_ns / 1e9 / elapsed
+        else:
+            result["bytes_per_second"] = None
+            result["transport_fraction"] = None
+        return result
+
+
+class MeteredTransport(AD7124Transport):
+    """ Counts the traffic through another transport.
+    Attributes that are not part of the transport interface, e.g.
+    `PigpioTransport.pi`, are passed through to the wrapped transport.
+    """
+
+    def __init__(self, transport, metrics):
+        """ Wraps the transport.
+        Args:
+            transport: The `AD7124Transport` to wrap.
+            metrics: The `AD7124Metrics` to update.
+        """
+        self.transport = transport
+        self.metrics = metrics
+        self.MAX_TRANSFER_SIZE = transport.MAX_TRANSFER_SIZE
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not found the normal way.
+        return getattr(self.__dict__["transport"], name)
+
+    @property
+    def ready_edge(self):
+        """ True if the wrapped transport can wait for DOUT/RDY. """
+        return self.transport.ready_edge
+
+    def xfer(self, to_send):
+        start = perf_counter_ns()
+        result = self.transport.xfer(to_send)
+        metrics = self.metrics
+        metrics.transport_ns += perf_counter_ns() - start
+        metrics.transfers += 1
+        metrics.frames += 1
+        metrics.bytes += len(to_send)
+        return result
+
+    def write(self, to_send):
+        start = perf_counter_ns()
+        self.transport.write(to_send)
+        metrics = self.metrics
+        metrics.transport_ns += perf_counter_ns() - start
+        metrics.transfers += 1
+        metrics.frames += 1
+        metrics.bytes += len(to_send)
+
+    def xfer_many(self, frames):
+        start = perf_counter_ns()
+        results = self.transport.xfer_many(frames)
+        metrics = self.metrics
+        metrics.transport_ns += perf_counter_ns() - start
+        metrics.transfers += len(self.transport.split_frames(frames))
+        metrics.frames += len(frames)
+        metrics.bytes += sum(len(frame) for frame in frames)
+        return results
+
+    def split_frames(self, frames):
+        return self.transport.split_frames(frames)
+
+    def wait_ready(self, timeout):
+        return self.transport.wait_ready(timeout)
+
+    def set_sync(self, level):
+        self.transport.set_sync(level)
+
+    def close(self):
+        self.transport.close()
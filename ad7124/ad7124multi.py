@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+""" Reads from both Pi2 click shield positions at the same time.
+
+Each board has its own reader thread, see `ad7124.ad7124acquisition`, so
+the time spent waiting for one board's conversions overlaps with reading
+the other.  The SPI transfers themselves still share the bus and, with
+PiGPIO, one connection to the daemon.
+
+```
+reader = AD7124MultiReader([AD7124Driver(1), AD7124Driver(2)])
+reader.start()
+(records_1, records_2) = reader.drain(timeout=0.1)
+reader.stop()
+```
+"""
+
+import threading
+
+from ad7124.ad7124acquisition import AD7124Acquisition
+
+
+class AD7124MultiReader:
+    """ Runs one AD7124Acquisition for each driver.
+    The drivers must be configured before `start()` is called.  Do not use
+    ready_edge transports with more than one board because the boards
+    share the MISO line.
+    """
+
+    def __init__(self, drivers, capacity=65536, continuous=False):
+        """ Creates the acquisitions.
+        Args:
+            drivers: A list of configured AD7124Driver instances.
+            capacity: The ring buffer capacity of each acquisition.
+            continuous: True to use continuous read mode.
+        """
+        # One condition for all buffers so drain() can wait for any board.
+        self._condition = threading.Condition()
+        #: The AD7124Acquisition for each driver, in the same order.
+        self.acquisitions = [
+            AD7124Acquisition(driver, capacity, continuous, self._condition)
+            for driver in drivers
+        ]
+
+    @property
+    def samples(self):
+        """ Total number of samples read from all boards. """
+        return sum(acquisition.samples for acquisition in self.acquisitions)
+
+    @property
+    def overruns(self):
+        """ Total number of samples dropped by all boards. """
+        return sum(acquisition.overruns for acquisition in self.acquisitions)
+
+    def start(self):
+        """ Starts all of the reader threads. """
+        for acquisition in self.acquisitions:
+            acquisition.start()
+
+    def stop(self):
+        """ Stops all of the reader threads. """
+        for acquisition in self.acquisitions:
+            acquisition.stop()
+
+    def drain(self, max_records=None, timeout=None):
+        """ Removes records from every board's ring buffer.
+        Args:
+            max_records: The most records to return for each board.  None
+                for all.
+            timeout: The time to wait in seconds for any board to have a
+                record.  None returns immediately.
+        Returns:
+            A list with an array of SAMPLE_DTYPE records for each driver.
+        Raises:
+            The exception that stopped a reader thread.
+        """
+        if timeout is not None:
+            with self._condition:
+                if not any(
+                    len(acquisition.buffer)
+                    for acquisition in self.acquisitions
+                ):
+                    self._condition.wait(timeout)
+        return [
+            acquisition.drain(max_records) for acquisition in self.acquisitions
+        ]
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+""" SPI transport that uses PiGPIO.
+
+For more details on PiGPIO see:
+<http://abyz.me.uk/rpi/pigpio/>
+
+The PiGPIO daemon must be running before using this script.  Start
+using: `sudo pigpiod`
+
+All transports share one connection to the daemon, see `acquire_pi()`.
+"""
+
+import threading
+import time
+
+import pigpio
+
+from ad7124.ad7124transport import AD7124Transport
+
+_connections_lock = threading.Lock()
+# Shared connections: (host, port) -> [pigpio.pi, reference count]
+_connections = {}
+
+
+def acquire_pi(host=None, port=None):
+    """ Returns a connection to pigpiod that is shared with every other
+    user of the same daemon.
+    Every call must be matched by a call to `release_pi()`.
+    Args:
+        host: The host name of the Pi running pigpiod.  None uses the
+            pigpio default, i.e. $PIGPIO_ADDR or localhost.
+        port: The pigpiod port.  None uses the pigpio default.
+    Returns:
+        The pigpio.pi instance.
+    Raises:
+        OSError: If the daemon cannot be reached.
+    """
+    key = (host, port)
+    with _connections_lock:
+        connection = _connections.get(key)
+        if connection is None:
+            kwargs = {}
+            if host is not None:
+                kwargs["host"] = host
+            if port is not None:
+                kwargs["port"] = port
+            pi = pigpio.pi(**kwargs)
+            if not pi.connected:
+                raise OSError("ERROR: cannot connect to pigpiod")
+            connection = [pi, 0]
+            _connections[key] = connection
+        connection[1] += 1
+        return connection[0]
+
+
+def release_pi(pi):
+    """ Releases a connection returned by `acquire_pi()`.
+    The connection is closed when the last user releases it.
+    Args:
+        pi: The pigpio.pi instance.
+    """
+    with _connections_lock:
+        for (key, connection) in _connections.items():
+            if connection[0] is pi:
+                connection[1] -= 1
+                if connection[1] == 0:
+                    del _connections[key]
+                    pi.stop()
+                return
+
+
+def set_sync_many(transports, level):
+    """ Drives the SYNC pins of several boards at the same time.
+    The SYNC GPIOs of the boards that share a pigpiod connection are
+    changed by one bank write so their conversions start together.
+    Args:
+        transports: A list of `PigpioTransport`.
+        level: True for high, False for low.
+    """
+    # pigpio.pi -> mask of the SYNC GPIOs.
+    masks = {}
+    for transport in transports:
+        transport.set_sync_output()
+        pi = transport.pi
+        masks[pi] = masks.get(pi, 0) | (1 << transport.sync_gpio)
+    for (pi, mask) in masks.items():
+        if level:
+            pi.set_bank_1(mask)
+        else:
+            pi.clear_bank_1(mask)
+
+
+class PigpioTransport(AD7124Transport):
+    """ Sends and receives SPI data through the PiGPIO daemon.
+    Every transfer is a request/response over the pigpiod socket.
+
+    When ready_edge is True, the chip select is held low so that the
+    DOUT/RDY pin of the AD7124 is visible on MISO between transfers and a
+    pigpio callback is used to wait for it to go low.  The CS_EN bit of the
+    ADC control register must be clear (`not_cs_en=False`) otherwise
+    DOUT/RDY never changes to its RDY function.  Both positions share the
+    MISO line so ready_edge can only be used when one board is fitted.
+    """
+
+    #: MISO GPIO.  The AD7124 DOUT/RDY pin is connected to this.
+    MISO_GPIO = 9
+    #: Chip select GPIO for each position.
+    CS_GPIOS = (8, 7)
+    #: SYNC GPIO for each position.
+    SYNC_GPIOS = (5, 19)
+
+    def __init__(
+        self, position, baud_rate=None, ready_edge=False, host=None, port=None
+    ):
+        """ Connects to pigpiod and opens the SPI device.
+        If the pigpio call fails, error messages are shown on the
+        terminal.
+        Args:
+            position: The Pi2 click shield position number, 1 or 2.
+            baud_rate: The SPI clock rate.  Defaults to
+                AD7124_SPI_BAUD_RATE.
+            ready_edge: True to enable `wait_ready()`.
+            host: The host running pigpiod, see `acquire_pi()`.
+            port: The pigpiod port, see `acquire_pi()`.
+        Raises:
+            ValueError: If position is out of range.
+            OSError: If the daemon cannot be reached.
+        """
+        spi_channel = self.spi_channel(position)
+        if baud_rate is None:
+            baud_rate = self.AD7124_SPI_BAUD_RATE
+        self.ready_edge = ready_edge
+        self._cs_gpio = self.CS_GPIOS[spi_channel]
+        self._sync_gpio = self.SYNC_GPIOS[spi_channel]
+        # True once the SYNC GPIO has been made an output.
+        self._sync_output = False
+        self._callback = None
+        self._ready = threading.Event()
+        self._pi = acquire_pi(host, port)
+        # The Pi2 click shield only supports main bus, bit 8 = 0.
+        spi_flags = 0
+        # Set to mode 3
+        spi_flags |= self.AD7124_SPI_MODE
+        if ready_edge:
+            # ux bit: the SPI driver does not use the CE GPIO so that it can
+            # be held low.
+            spi_flags |= 1 << (5 + spi_channel)
+        # print("init: flags", spi_flags, "channel", spi_channel)
+        # Open SPI device
+        try:
+            self._spi_handle = self._pi.spi_open(
+                spi_channel, baud_rate, spi_flags
+            )
+        except Exception:
+            release_pi(self._pi)
+            self._pi = None
+            raise
+        if ready_edge:
+            self._pi.set_mode(self._cs_gpio, pigpio.OUTPUT)
+            self._pi.write(self._cs_gpio, 0)
+            self._callback = self._pi.callback(
+                self.MISO_GPIO, pigpio.FALLING_EDGE, self._on_falling_edge
+            )
+
+    @property
+    def pi(self):
+        """ The shared pigpio.pi connection. """
+        return self._pi
+
+    @property
+    def cs_gpio(self):
+        """ The chip select GPIO used by this position. """
+        return self._cs_gpio
+
+    @property
+    def sync_gpio(self):
+        """ The SYNC GPIO used by this position. """
+        return self._sync_gpio
+
+    def set_sync_output(self):
+        """ Makes the SYNC GPIO an output.  It starts high so that the
+        conversions are not interrupted.
+        """
+        if not self._sync_output:
+            self._pi.write(self._sync_gpio, 1)
+            self._pi.set_mode(self._sync_gpio, pigpio.OUTPUT)
+            self._sync_output = True
+
+    def set_sync(self, level):
+        """ Drives the SYNC pin of the AD7124.
+        Args:
+            level: True for high, False for low.
+        """
+        self.set_sync_output()
+        self._pi.write(self._sync_gpio, 1 if level else 0)
+
+    def _on_falling_edge(self, gpio, level, tick):
+        """ Called by pigpio when MISO goes low. """
+        self._ready.set()
+
+    def xfer(self, to_send):
+        """ Performs a SPI transfer using the to_send data.
+        Args:
+            to_send: The bytes to send.
+        Returns:
+            Tuple containing (count of bytes read, data as bytes).
+        """
+        return self._pi.spi_xfer(self._spi_handle, to_send)
+
+    def write(self, to_send):
+        """ The bytes in to_send are written to the SPI bus.
+        Args:
+            to_send: The bytes to send.
+        """
+        self._pi.spi_write(self._spi_handle, to_send)
+
+    def wait_ready(self, timeout):
+        """ Waits for DOUT/RDY to go low.
+        Edges are also caused by the data clocked out during transfers so
+        the level of the pin is checked after every edge.
+        Args:
+            timeout: The maximum time to wait in seconds.
+        Returns:
+            True if ready, False if timed out.
+        Raises:
+            RuntimeError: If ready_edge was not enabled.
+        """
+        if not self.ready_edge:
+            raise RuntimeError("ready_edge is not enabled")
+        end_time = time.monotonic() + timeout
+        while True:
+            if self._pi.read(self.MISO_GPIO) == 0:
+                return True
+            self._ready.clear()
+            # Check again in case the edge happened before the clear.
+            if self._pi.read(self.MISO_GPIO) == 0:
+                return True
+            timeout = end_time - time.monotonic()
+            if timeout <= 0 or not self._ready.wait(timeout):
+                return False
+
+    def close(self):
+        """ Closes the SPI device and the connection to pigpiod. """
+        if self._pi is not None:
+            if self._callback is not None:
+                self._callback.cancel()
+                self._pi.write(self._cs_gpio, 1)
+            if self._sync_output:
+                # Leave SYNC high so that the AD7124 keeps converting.
+                self._pi.write(self._sync_gpio, 1)
+            self._pi.spi_close(self._spi_handle)
+            release_pi(self._pi)
+            self._pi = None
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+""" Filter stages that reduce the sample stream as it is read.
+
+Acquiring at a high output data rate and then averaging gives better
+anti-aliasing than a low output data rate but makes a lot of data.  The
+stages here average or decimate the samples so that a much smaller stream
+is stored or sent.  The stages work on blocks of samples, e.g. from
+`AD7124Acquisition.drain()`, using NumPy.  Each channel is filtered
+separately and the state of each channel is kept between blocks so the
+result does not depend on how the stream is split into blocks.
+
+* `AD7124Average`: The mean of each N samples.
+* `AD7124Decimate`: Every Nth sample.
+* `AD7124ExponentialAverage`: Exponential moving average, one output for
+  each input.
+* `AD7124CIC`: Cascaded integrator comb decimator.
+
+Stages are joined together using `AD7124Pipeline`:
+```
+pipeline = AD7124Pipeline([AD7124CIC(16), AD7124Average(4)])
+reduced = pipeline.process(acquisition.drain())
+```
+The output of every stage is an array of FILTERED_DTYPE records.  The
+value is in the units of the raw ADC code.  The timestamp is that of the
+last input sample used.
+"""
+
+import math
+
+import numpy as np
+
+#: A filtered sample.
+FILTERED_DTYPE = np.dtype(
+    [("timestamp", np.int64), ("channel", np.int8), ("value", np.float64)]
+)
+
+
+def to_filtered(records):
+    """ Returns records as FILTERED_DTYPE.
+    Args:
+        records: An array of SAMPLE_DTYPE or FILTERED_DTYPE records.
+    """
+    if records.dtype == FILTERED_DTYPE:
+        return records
+    result = np.empty(len(records), dtype=FILTERED_DTYPE)
+    result["timestamp"] = records["timestamp"]
+    result["channel"] = records["channel"]
+    result["value"] = records["code"]
+    return result
+
+
+def _records(timestamps, channel, values):
+    result = np.empty(len(values), dtype=FILTERED_DTYPE)
+    result["timestamp"] = timestamps
+    result["channel"] = channel
+    result["value"] = values
+    return result
+
+
+class AD7124Stage:
+    """ Base class for the stages.
+    Sub-classes implement `_process_channel()` and `reset()`.
+    """
+
+    def process(self, records):
+        """ Filters a block of samples.
+        Args:
+            records: An array of SAMPLE_DTYPE or FILTERED_DTYPE records.
+                Channels can be interleaved.
+        Returns:
+            An array of FILTERED_DTYPE records in time order.  Can be
+            empty.
+        """
+        records = to_filtered(records)
+        channels = records["channel"]
+        outputs = []
+        for channel in np.unique(channels):
+            selected = records[channels == channel]
+            outputs.append(self._process_channel(int(channel), selected))
+        if not outputs:
+            return np.empty(0, dtype=FILTERED_DTYPE)
+        if len(outputs) == 1:
+            return outputs[0]
+        result = np.concatenate(outputs)
+        order = np.argsort(result["timestamp"], kind="stable")
+        return result[order]
+
+    def _process_channel(self, channel, records):
+        """ Filters the samples of one channel.
+        Args:
+            channel: The channel number.
+            records: An array of FILTERED_DTYPE records for the channel.
+        Returns:
+            An array of FILTERED_DTYPE records.
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """ Forgets the state of every channel. """
+        raise NotImplementedError
+
+
+class AD7124Average(AD7124Stage):
+    """ Outputs the mean of each block of N samples of a channel. """
+
+    def __init__(self, n):
+        """ Creates an averaging stage.
+        Args:
+            n: The number of samples in each mean.
+        Raises:
+            ValueError: If n is less than 1.
+        """
+        if n < 1:
+            raise ValueError("ERROR: n must be at least 1")
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        # The samples of each channel that do not yet make a full block.
+        self._pending = {}
+
+    def _process_channel(self, channel, records):
+        pending = self._pending.get(channel)
+        if pending is not None:
+            records = np.concatenate((pending, records))
+        n = self.n
+        used = len(records) - len(records) % n
+        self._pending[channel] = records[used:].copy()
+        blocks = records[:used]
+        return _records(
+            blocks["timestamp"][n - 1 :: n],
+            channel,
+            blocks["value"].reshape(-1, n).mean(axis=1),
+        )
+
+
+class AD7124Decimate(AD7124Stage):
+    """ Outputs the last of each block of N samples of a channel.
+    There is no filtering so use this after an averaging stage or when the
+    ADC's own filter removes the frequencies that would alias.
+    """
+
+    def __init__(self, n):
+        """ Creates a decimating stage.
+        Args:
+            n: The decimation factor.
+        Raises:
+            ValueError: If n is less than 1.
+        """
+        if n < 1:
+            raise ValueError("ERROR: n must be at least 1")
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        # Number of samples of each channel since the last output.
+        self._phase = {}
+
+    def _process_channel(self, channel, records):
+        phase = self._phase.get(channel, 0)
+        n = self.n
+        first = n - 1 - phase
+        self._phase[channel] = (phase + len(records)) % n
+        return records[first::n].copy()
+
+
+class AD7124ExponentialAverage(AD7124Stage):
+    """ Exponential moving average of each channel:
+    y[k] = y[k - 1] + alpha * (x[k] - y[k - 1])
+    The first output of a channel is its first sample.
+    """
+
+    #: Largest growth of the weights before a block is split.
+    MAX_WEIGHT = 1e100
+
+    def __init__(self, alpha):
+        """ Creates the average with the given weight.
+        Args:
+            alpha: The weight of each new sample, 0 < alpha <= 1.  The time
+                constant is about 1 / alpha samples.
+        Raises:
+            ValueError: If alpha is out of range.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("ERROR: alpha must be greater than 0 and <= 1")
+        self.alpha = alpha
+        decay = 1.0 - alpha
+        if decay > 0:
+            # Longest run that can be done at once without overflow.
+            self._chunk = max(
+                1, int(math.log(self.MAX_WEIGHT) / -math.log(decay))
+            )
+        else:
+            self._chunk = None
+        self.reset()
+
+    def reset(self):
+        # The last output of each channel.
+        self._last = {}
+
+    def _process_channel(self, channel, records):
+        values = records["value"]
+        if not len(values):
+            return records.copy()
+        output = np.empty(len(values))
+        last = self._last.get(channel)
+        if last is None:
+            last = values[0]
+        if self._chunk is None:
+            output[:] = values
+        else:
+            alpha = self.alpha
+            decay = 1.0 - alpha
+            for start in range(0, len(values), self._chunk):
+                chunk = values[start : start + self._chunk]
+                # y[k] = decay^(k+1) * last
+                #        + alpha * sum(decay^(k-j) * x[j], j = 0..k)
+                powers = decay ** np.arange(1, len(chunk) + 1)
+                sums = np.cumsum(alpha * chunk / powers)
+                result = powers * (last + sums)
+                output[start : start + len(chunk)] = result
+                last = result[-1]
+        self._last[channel] = output[-1]
+        return _records(records["timestamp"], channel, output)
+
+
+class AD7124CIC(AD7124Stage):
+    """ Cascaded integrator comb decimator.
+    Gives a sinc^order response, the same type of filter as the AD7124's
+    own, using only additions.  The values are rounded to integers and the
+    integrators use 64 bit integers that are allowed to wrap so they can
+    run for ever.  The output is divided by the gain, n^order, so it is in
+    the units of the input.
+    """
+
+    def __init__(self, n, order=3):
+        """ Creates the decimator.
+        Args:
+            n: The decimation factor.
+            order: The number of integrator and comb stages.
+        Raises:
+            ValueError: If n or order is less than 1 or the gain is too
+                large for 64 bit integers with 32 bit inputs.
+        """
+        if n < 1 or order < 1:
+            raise ValueError("ERROR: n and order must be at least 1")
+        if order * math.log2(n) > 31:
+            raise ValueError("ERROR: n ** order must be less than 2 ** 31")
+        self.n = n
+        self.order = order
+        self._gain = float(n ** order)
+        self.reset()
+
+    def reset(self):
+        # (integrator sums, comb delays, phase) of each channel.
+        self._state = {}
+
+    def _process_channel(self, channel, records):
+        (sums, delays, phase) = self._state.get(
+            channel,
+            (
+                np.zeros(self.order, dtype=np.int64),
+                np.zeros(self.order, dtype=np.int64),
+                0,
+            ),
+        )
+        data = np.rint(records["value"]).astype(np.int64)
+        with np.errstate(over="ignore"):
+            for stage in range(self.order):
+                data = np.cumsum(data, dtype=np.int64)
+                data += sums[stage]
+                if len(data):
+                    sums[stage] = data[-1]
+            first = self.n - 1 - phase
+            data = data[first :: self.n]
+            timestamps = records["timestamp"][first :: self.n]
+            for stage in range(self.order):
+                previous = np.concatenate(([delays[stage]], data[:-1]))
+                if len(data):
+                    delays[stage] = data[-1]
+                data = data - previous
+        phase = (phase + len(records)) % self.n
+        self._state[channel] = (sums, delays, phase)
+        return _records(timestamps, channel, data / self._gain)
+
+
+class AD7124Pipeline:
+    """ Runs stages one after the other. """
+
+    def __init__(self, stages):
+        """ Joins the stages.
+        Args:
+            stages: A list of AD7124Stage instances, first stage first.
+        """
+        self.stages = list(stages)
+
+    def process(self, records):
+        """ Filters a block of samples through every stage.
+        Args:
+            records: An array of SAMPLE_DTYPE or FILTERED_DTYPE records.
+        Returns:
+            An array of FILTERED_DTYPE records.
+        """
+        records = to_filtered(records)
+        for stage in self.stages:
+            records = stage.process(records)
+        return records
+
+    def reset(self):
+        """ Forgets the state of every stage. """
+        for stage in self.stages:
+            stage.reset()
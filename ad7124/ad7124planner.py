@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+""" Works out the sample rates that a channel scan will achieve.
+
+With one channel enabled, the AD7124 converts at the output data rate once
+the filter has settled.  With more than one channel enabled, the sequencer
+has to let the filter settle after every channel switch so each conversion
+takes the settling time and the rate is much lower.  See
+`ad7124.ad7124timing` for the formulas.
+
+`plan_scan()` and `plan_driver()` give the rates of a configuration and
+`choose_filter()` finds the filter settings for a target rate.
+"""
+
+from ad7124 import ad7124timing
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class AD7124Plan:
+    """ The expected timing of a channel scan.
+    All times are in seconds and rates in samples per second.
+    """
+
+    def __init__(self, power_mode, channels):
+        """ Works out the timing of the scan.
+        Args:
+            power_mode: 0 low, 1 mid, 2 or 3 full power.
+            channels: A list of (channel number, filter settings) for each
+                enabled channel, in sequencer order.  The filter settings are a
+                dict as returned by `ad7124timing.decode_filter()`.
+        Raises:
+            ValueError: If there are no channels or a setting is not
+                valid.
+        """
+        if not channels:
+            raise ValueError("ERROR: at least one channel must be enabled")
+        self.power_mode = power_mode
+        #: The channel numbers in sequencer order.
+        self.channels = [channel for (channel, _) in channels]
+        #: The filter settings of each channel.
+        self.settings = {channel: dict(s) for (channel, s) in channels}
+        sequencer = len(channels) > 1
+        #: Time from starting the scan to the first result of each channel.
+        self.settling_time = {}
+        elapsed = 0.0
+        for (channel, settings) in channels:
+            elapsed += ad7124timing.settling_time(
+                settings["filter_type"],
+                settings["fs"],
+                power_mode,
+                settings["post_filter"],
+                sequencer=sequencer,
+            )
+            self.settling_time[channel] = elapsed
+        if sequencer:
+            #: Time for one conversion of every channel.
+            self.scan_time = elapsed
+        else:
+            settings = channels[0][1]
+            self.scan_time = ad7124timing.conversion_period(
+                settings["filter_type"],
+                settings["fs"],
+                power_mode,
+                settings["post_filter"],
+                settings["single_cycle"],
+            )
+
+    @property
+    def channel_rate(self):
+        """ The rate of each channel once the scan is running. """
+        return 1.0 / self.scan_time
+
+    @property
+    def total_rate(self):
+        """ The rate of all channels together. """
+        return len(self.channels) / self.scan_time
+
+    def filter_settings(self, channel=None):
+        """ Returns the arguments for `AD7124Driver.set_setup_filter()`.
+        Args:
+            channel: The channel to return the settings of.  If None, the
+                first channel is used.
+        """
+        if channel is None:
+            channel = self.channels[0]
+        settings = self.settings[channel]
+        return {
+            "filter_type": settings["filter_type"],
+            "rej60": settings.get("rej60", False),
+            "post_filter": settings["post_filter"],
+            "single_cycle": settings["single_cycle"],
+            "output_data_rate": settings["fs"],
+        }
+
+    def __repr__(self):
+        return (
+            "AD7124Plan(channels={}, channel_rate={:.6g}, "
+            "total_rate={:.6g})".format(
+                self.channels, self.channel_rate, self.total_rate
+            )
+        )
+
+
+def plan_scan(
+    channels,
+    power_mode,
+    filter_type=ad7124timing.SINC4,
+    fs=384,
+    post_filter=6,
+    single_cycle=False,
+):
+    """ Returns the plan for channels that all use the same filter.
+    Args:
+        channels: The number of enabled channels or a list of the channel
+            numbers.
+        power_mode: 0 low, 1 mid, 2 or 3 full power.
+        filter_type: The filter type, e.g. ad7124timing.SINC4.
+        fs: The FS value, 1 to 2047.  This is the output_data_rate
+            argument of `AD7124Driver.set_setup_filter()`.
+        post_filter: The post filter, used when filter_type is POST_FILTER.
+        single_cycle: True if only settled conversions are output.
+    Returns:
+        An `AD7124Plan`.
+    Raises:
+        ValueError: If a setting is not valid.
+    """
+    if isinstance(channels, int):
+        channels = list(range(channels))
+    if not 1 <= fs <= 0x7FF:
+        raise ValueError("ERROR: fs must be 1 to 2047")
+    settings = {
+        "filter_type": filter_type,
+        "rej60": False,
+        "post_filter": post_filter,
+        "single_cycle": single_cycle,
+        "fs": fs,
+    }
+    return AD7124Plan(
+        power_mode, [(channel, settings) for channel in channels]
+    )
+
+
+def plan_driver(driver):
+    """ Returns the plan for the channels and setups configured in the
+    driver.  Channels can use different setups.
+    Args:
+        driver: An `AD7124Driver`.
+    Returns:
+        An `AD7124Plan`.
+    Raises:
+        ValueError: If no channels are enabled.
+    """
+    channels = []
+    for channel in range(16):
+        value = driver.cached_register(AD7124RegNames.CH0_MAP_REG + channel)
+        if value & 0x8000:
+            setup = (value >> 12) & 0x07
+            filter_value = driver.cached_register(
+                AD7124RegNames.FILT0_REG + setup
+            )
+            settings = ad7124timing.decode_filter(filter_value)
+            channels.append((channel, settings))
+    return AD7124Plan(driver.power_mode, channels)
+
+
+def _max_fs(target_rate, channels, power_mode, filter_type):
+    """ Returns the largest FS that meets the target rate or None. """
+    (low, high) = (1, 0x7FF)
+    fastest = plan_scan(channels, power_mode, filter_type, low)
+    if fastest.channel_rate < target_rate:
+        return None
+    # The rate falls as FS rises.
+    while low < high:
+        middle = (low + high + 1) // 2
+        plan = plan_scan(channels, power_mode, filter_type, middle)
+        if plan.channel_rate >= target_rate:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def choose_filter(
+    target_rate,
+    channels=1,
+    power_modes=(2,),
+    filter_types=(
+        ad7124timing.SINC4,
+        ad7124timing.SINC3,
+        ad7124timing.FAST_SINC4,
+        ad7124timing.FAST_SINC3,
+    ),
+):
+    """ Finds the filter settings that give at least the target rate for
+    each channel with as much filtering as possible, i.e. the lowest rate
+    that is not below the target.  Lower rates have less noise.
+    Args:
+        target_rate: The rate needed for each channel.
+        channels: The number of enabled channels or a list of the channel
+            numbers.
+        power_modes: The power modes that can be used.
+        filter_types: The filter types that can be used, in order of
+            preference when they give the same rate.  Include
+            ad7124timing.POST_FILTER to try the post filters.
+    Returns:
+        An `AD7124Plan`.  Use `AD7124Plan.filter_settings()` to set the
+        filter.
+    Raises:
+        ValueError: If no setting can meet the target rate.
+    """
+    best = None
+    for power_mode in power_modes:
+        for filter_type in filter_types:
+            if filter_type == ad7124timing.POST_FILTER:
+                candidates = [
+                    plan_scan(
+                        channels, power_mode, filter_type, post_filter=post
+                    )
+                    for post in sorted(ad7124timing.POST_FILTER_RATES)
+                ]
+            else:
+                fs = _max_fs(target_rate, channels, power_mode, filter_type)
+                if fs is None:
+                    continue
+                candidates = [
+                    plan_scan(channels, power_mode, filter_type, fs)
+                ]
+            for plan in candidates:
+                if plan.channel_rate < target_rate:
+                    continue
+                if best is None or plan.channel_rate < best.channel_rate:
+                    best = plan
+    if best is None:
+        raise ValueError(
+            "ERROR: no filter setting can give {} samples per second".format(
+                target_rate
+            )
+        )
+    return best
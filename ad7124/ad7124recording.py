@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+""" Compact binary recording of AD7124 samples.
+
+A recording file is:
+
+* `MAGIC`, 8 bytes.
+* The header length, 4 byte little endian unsigned integer.
+* The header, UTF-8 JSON.  It describes how each channel was set up so
+  that the raw values can be converted to voltages later.
+* The records, `RECORD_DTYPE`, 12 bytes each.  The raw 24 bit value is
+  stored big endian as it is read from the AD7124.
+
+Records are written in large blocks.  The reader memory maps the file so
+even very long recordings load instantly.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from ad7124 import ad7124convert
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+
+#: The first bytes of every recording.
+MAGIC = b"AD7124\x00\x01"
+#: The record stored in the file for each sample.
+RECORD_DTYPE = np.dtype(
+    [("timestamp", "<i8"), ("channel", "u1"), ("code", "u1", (3,))]
+)
+
+_LENGTH = struct.Struct("<I")
+
+
+def pack_records(records):
+    """ Converts sample records to the file format.
+    Args:
+        records: A NumPy array with timestamp, channel and code fields, e.g.
+            `ad7124.ad7124acquisition.SAMPLE_DTYPE` records.
+    Returns:
+        An array of RECORD_DTYPE records.
+    """
+    packed = np.empty(len(records), dtype=RECORD_DTYPE)
+    packed["timestamp"] = records["timestamp"]
+    packed["channel"] = records["channel"]
+    codes = np.asarray(records["code"], dtype=np.uint32)
+    packed["code"][:, 0] = codes >> 16
+    packed["code"][:, 1] = codes >> 8
+    packed["code"][:, 2] = codes
+    return packed
+
+
+class AD7124RecordingWriter:
+    """ Writes samples to a recording file in blocks.
+    ```
+    with AD7124RecordingWriter("run.bin", header) as writer:
+        writer.write_records(acquisition.drain())
+    ```
+    """
+
+    def __init__(self, filename, header, block_size=8192):
+        """ Creates the file and writes the header.
+        Args:
+            filename: The file to write.
+            header: A dict that can be converted to JSON.  See
+                `AD7124Recording.header` for the keys that are used.
+            block_size: The number of records buffered before they are
+                written to the file.
+        Raises:
+            OSError: If the file cannot be created.
+        """
+        self._block_size = block_size
+        self._pending = []
+        self._pending_count = 0
+        #: Number of records written.
+        self.count = 0
+        header_bytes = json.dumps(header).encode("utf-8")
+        self._file = open(filename, "wb")
+        self._file.write(MAGIC)
+        self._file.write(_LENGTH.pack(len(header_bytes)))
+        self._file.write(header_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_records(self, records):
+        """ Adds records to the file.
+        Args:
+            records: A NumPy array with timestamp, channel and code fields.
+        """
+        if len(records) == 0:
+            return
+        self._pending.append(pack_records(records))
+        self._pending_count += len(records)
+        self.count += len(records)
+        if self._pending_count >= self._block_size:
+            self.flush()
+
+    def write(self, timestamp, channel, code):
+        """ Adds one sample to the file.  `write_records()` is faster.
+        Args:
+            timestamp: The time the sample was read in nanoseconds.
+            channel: The channel number.
+            code: The raw value.
+        """
+        record = np.array([(timestamp, channel, code)], dtype=SAMPLE_DTYPE)
+        self.write_records(record)
+
+    def flush(self):
+        """ Writes the buffered records to the file. """
+        if self._pending:
+            self._file.write(
+                b"".join(block.tobytes() for block in self._pending)
+            )
+            self._pending = []
+            self._pending_count = 0
+        self._file.flush()
+
+    def close(self):
+        """ Writes any buffered records and closes the file. """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class AD7124Recording:
+    """ Reads a recording file.
+    The records are memory mapped so they are only read from the file when
+    they are used.
+    """
+
+    def __init__(self, filename):
+        """ Reads the header and maps the records.
+        Args:
+            filename: The file to read.
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If the file is not a recording.
+        """
+        with open(filename, "rb") as recording_file:
+            magic = recording_file.read(len(MAGIC))
+            length = recording_file.read(_LENGTH.size)
+            if magic != MAGIC or len(length) != _LENGTH.size:
+                raise ValueError("ERROR: not an AD7124 recording")
+            (header_size,) = _LENGTH.unpack(length)
+            #: The header as a dict.  Voltmeter writes a "channels" list,
+            #: each entry has "channel", "gain", "vref", "bipolar" and
+            #: "scale" keys.
+            self.header = json.loads(
+                recording_file.read(header_size).decode("utf-8")
+            )
+            offset = recording_file.tell()
+            recording_file.seek(0, 2)
+            # A partial record at the end, e.g. after a crash, is ignored.
+            count = (recording_file.tell() - offset) // RECORD_DTYPE.itemsize
+        if count:
+            #: The RECORD_DTYPE records.
+            self.records = np.memmap(
+                filename,
+                dtype=RECORD_DTYPE,
+                mode="r",
+                offset=offset,
+                shape=(count,),
+            )
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        """ An array of the timestamps in nanoseconds. """
+        return self.records["timestamp"]
+
+    @property
+    def channels(self):
+        """ An array of the channel numbers. """
+        return self.records["channel"]
+
+    @property
+    def codes(self):
+        """ An array of the raw values as uint32. """
+        code = self.records["code"]
+        codes = code[:, 0].astype(np.uint32) << 16
+        codes |= code[:, 1].astype(np.uint32) << 8
+        codes |= code[:, 2]
+        return codes
+
+    def voltages(self):
+        """ Converts all of the raw values to voltages.
+        Uses the gain, vref, bipolar and scale of each channel in the
+        header.
+        Returns:
+            An array of float64 voltages.
+        """
+        gain = np.ones(16)
+        vref = np.ones(16)
+        bipolar = np.zeros(16, dtype=bool)
+        scale = np.ones(16)
+        for channel in self.header.get("channels", []):
+            number = channel["channel"]
+            gain[number] = channel["gain"]
+            vref[number] = channel["vref"]
+            bipolar[number] = channel["bipolar"]
+            scale[number] = channel["scale"]
+        return ad7124convert.to_voltage(
+            self.codes, gain, vref, bipolar, scale, self.channels
+        )
@@ -141,7 +141,7 @@ class AD7124Registers:
             1 is write, 2 is read.
         """
         # print("registers.access:", register_enum)
-        return self._registers[register_enum.value][2]
+        return self._registers[register_enum][2]
 
     def initial(self, register_enum):
         """ Returns initial value of the given register.
@@ -151,7 +151,7 @@ class AD7124Registers:
             The initial value of the register.
         """
         # print("registers.initial:", register_enum)
-        return self._registers[register_enum.value][0]
+        return self._registers[register_enum][0]
 
     def size(self, register_enum):
         """ Returns the size of the given register.
@@ -161,4 +161,4 @@ class AD7124Registers:
             The number of bytes in the register.
         """
         # print("registers.size:", register_enum)
-        return self._registers[register_enum.value][1]
+        return self._registers[register_enum][1]
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+""" Acquisition loop that runs inside the PiGPIO daemon.
+
+A pigpio script is uploaded that waits for DOUT/RDY and clocks out each
+conversion in continuous read mode.  The client fetches the conversions in
+bulk using `script_status()` so there is one socket request for many
+samples instead of several requests per sample.
+
+pigpio scripts cannot use the SPI commands so the script bit bangs the SPI
+GPIOs.  While the script runs, the hardware SPI is not used and the GPIO
+modes are changed.  They are restored by `stop()`.
+
+The script parameters are used as follows:
+
+* p0: Set to 1 by the client to stop the script.
+* p1: The number of conversions read.
+* p2 to p9: A ring of the last `SLOTS` conversions.  Conversion n is stored
+  in p(2 + n % SLOTS).  Each one is the 24 bit value followed by the
+  status byte.
+
+There is no parameter left for the time of each conversion.  The newest
+conversion of a fetch is given the time of the fetch and the older ones
+are spaced back from it by the sample period expected from the
+configuration, see `ad7124.ad7124planner`.
+
+See <http://abyz.me.uk/rpi/pigpio/pigs.html#Scripts>.
+"""
+
+import time
+
+import numpy as np
+import pigpio
+
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+from ad7124.ad7124planner import plan_driver
+from ad7124.ad7124stats import monotonic_ns
+
+
+def build_script(cs_gpio, poll_delay):
+    """ Returns the text of the acquisition script.
+    Args:
+        cs_gpio: The chip select GPIO of the AD7124.
+        poll_delay: Microseconds to wait between checks of DOUT/RDY.
+    Returns:
+        The script as bytes.
+    """
+    sclk = AD7124ScriptReader.SCLK_GPIO
+    mosi = AD7124ScriptReader.MOSI_GPIO
+    miso = AD7124ScriptReader.MISO_GPIO
+    lines = [
+        # CS low so that DOUT/RDY is visible, SCLK idles high (mode 3),
+        # DIN held low while reading in continuous read mode.
+        "w {} 0".format(cs_gpio),
+        "w {} 1".format(sclk),
+        "w {} 0".format(mosi),
+        "tag 1",
+    ]
+    # pigpio scripts cannot index the parameters so the loop is unrolled,
+    # one copy for each slot.
+    for slot in range(AD7124ScriptReader.SLOTS):
+        wait_tag = 10 + 2 * slot
+        read_tag = wait_tag + 1
+        lines += [
+            "tag {}".format(wait_tag),
+            "lda p0",
+            "jnz 99",
+            "r {}".format(miso),
+            "jz {}".format(read_tag),
+            "mics {}".format(poll_delay),
+            "jmp {}".format(wait_tag),
+            "tag {}".format(read_tag),
+            "call 100",
+            "sta p{}".format(2 + slot),
+            "inr p1",
+        ]
+    lines += [
+        "jmp 1",
+        "tag 99",
+        "halt",
+        # Subroutine: clocks in 32 bits, MSB first, result in A.  The result
+        # of every command, including w, is put in A.
+        "tag 100",
+        "ld v0 0",
+        "ld v1 32",
+        "tag 101",
+        # The AD7124 changes DOUT on the falling edge so it is read while
+        # SCLK is low.  DOUT/RDY goes high after the last rising edge.
+        "w {} 0".format(sclk),
+        "r {}".format(miso),
+        "sta v2",
+        "w {} 1".format(sclk),
+        "lda v0",
+        "add v0",
+        "or v2",
+        "sta v0",
+        "dcr v1",
+        "lda v1",
+        "jnz 101",
+        "lda v0",
+        "ret",
+    ]
+    return " ".join(lines).encode("ascii")
+
+
+class AD7124ScriptReader:
+    """ Reads conversions using a pigpio script.
+    The driver must use a `PigpioTransport` and be configured before
+    `start()` is called.  The CS_EN bit of the ADC control register must be
+    clear otherwise DOUT/RDY never changes to its RDY function.  Only one
+    board can be fitted as both positions share the MISO line.
+    ```
+    reader = AD7124ScriptReader(driver)
+    reader.start()
+    records = reader.read()
+    reader.stop()
+    ```
+    """
+
+    #: SPI GPIOs.
+    SCLK_GPIO = 11
+    MOSI_GPIO = 10
+    MISO_GPIO = 9
+    #: Number of conversions the script can hold.  One slot is always
+    #: being written so up to SLOTS - 1 conversions are fetched at a time.
+    SLOTS = 8
+
+    def __init__(self, driver, poll_delay=20):
+        """ Checks that the driver uses PiGPIO.
+        Args:
+            driver: A configured AD7124Driver that uses a PigpioTransport.
+            poll_delay: Microseconds the script waits between checks of
+                DOUT/RDY.
+        Raises:
+            ValueError: If the driver does not use PiGPIO or checksums
+                are enabled.
+        """
+        transport = driver._spi.transport
+        if not hasattr(transport, "pi"):
+            raise ValueError("ERROR: a PigpioTransport is required")
+        if driver.crc:
+            raise ValueError("ERROR: the script does not check checksums")
+        self._driver = driver
+        self._pi = transport.pi
+        self._cs_gpio = transport.cs_gpio
+        self._poll_delay = poll_delay
+        self._script_id = None
+        self._gpio_modes = {}
+        self._count = 0
+        self._last_timestamp = 0
+        #: Number of conversions overwritten before they were fetched.
+        self.overruns = 0
+        #: The expected time between conversions in ns, set by `start()`.
+        self.sample_period_ns = 0
+
+    @property
+    def running(self):
+        """ True while the script is running. """
+        return self._script_id is not None
+
+    def _store_script(self):
+        script = build_script(self._cs_gpio, self._poll_delay)
+        script_id = self._pi.store_script(script)
+        if script_id < 0:
+            raise OSError("ERROR: store_script failed " + str(script_id))
+        # The daemon checks the script before it can be run.
+        while self._pi.script_status(script_id)[0] == pigpio.PI_SCRIPT_INITING:
+            time.sleep(0.001)
+        return script_id
+
+    def start(self):
+        """ Starts continuous read mode and the script. """
+        if self.running:
+            return
+        try:
+            rate = plan_driver(self._driver).total_rate
+            self.sample_period_ns = int(round(1e9 / rate))
+        except ValueError:
+            # No channels enabled or an unknown filter.
+            self.sample_period_ns = 0
+        self._script_id = self._store_script()
+        self._driver.start_continuous_read(data_status=True)
+        # Take the GPIOs from the SPI peripheral.
+        outputs = (self.SCLK_GPIO, self.MOSI_GPIO, self._cs_gpio)
+        for gpio in outputs + (self.MISO_GPIO,):
+            self._gpio_modes[gpio] = self._pi.get_mode(gpio)
+        self._pi.write(self.SCLK_GPIO, 1)
+        for gpio in outputs:
+            self._pi.set_mode(gpio, pigpio.OUTPUT)
+        self._pi.set_mode(self.MISO_GPIO, pigpio.INPUT)
+        self._count = 0
+        self._last_timestamp = 0
+        self.overruns = 0
+        self._pi.run_script(self._script_id, [0, 0])
+
+    def read(self):
+        """ Fetches the conversions read since the last call.
+        Returns:
+            An array of SAMPLE_DTYPE records.  The script cannot record the
+            time of each conversion so the last record has the time of the
+            fetch and the others are sample_period_ns apart.  Timestamps
+            are never earlier than those of the previous fetch.
+        Raises:
+            OSError: If the script has failed.
+        """
+        (status, params) = self._pi.script_status(self._script_id)
+        if status < 0 or status == pigpio.PI_SCRIPT_FAILED:
+            raise OSError("ERROR: acquisition script failed " + str(status))
+        count = params[1] & 0xFFFFFFFF
+        new = (count - self._count) & 0xFFFFFFFF
+        if new > self.SLOTS - 1:
+            # The script has written over conversions that were not
+            # fetched.
+            self.overruns += new - (self.SLOTS - 1)
+            new = self.SLOTS - 1
+        slots = np.array(params[2:], dtype=np.int64) & 0xFFFFFFFF
+        frames = slots[np.arange(count - new, count) % self.SLOTS]
+        records = np.zeros(new, dtype=SAMPLE_DTYPE)
+        timestamps = monotonic_ns() - self.sample_period_ns * np.arange(
+            new - 1, -1, -1, dtype=np.int64
+        )
+        records["timestamp"] = np.maximum(timestamps, self._last_timestamp)
+        if new:
+            self._last_timestamp = int(records["timestamp"][-1])
+        records["channel"] = frames & 0x0F
+        records["code"] = frames >> 8
+        self._count = count
+        return records
+
+    def stop(self, timeout=1.0):
+        """ Stops the script, gives the GPIOs back to the SPI peripheral and
+        exits continuous read mode.
+        Args:
+            timeout: The time in seconds to wait for the script to finish
+                the current conversion.
+        """
+        if not self.running:
+            return
+        # Ask the script to stop between conversions so that the AD7124
+        # is not left part way through a read.
+        self._pi.update_script(self._script_id, [1])
+        end_time = time.monotonic() + timeout
+        while self._pi.script_status(self._script_id)[0] not in (
+            pigpio.PI_SCRIPT_HALTED,
+            pigpio.PI_SCRIPT_FAILED,
+        ):
+            if time.monotonic() > end_time:
+                self._pi.stop_script(self._script_id)
+                break
+            time.sleep(0.001)
+        self._pi.delete_script(self._script_id)
+        self._script_id = None
+        # The script leaves CS low, which is what a ready_edge transport
+        # expects.  Otherwise the SPI peripheral takes CS back.
+        for (gpio, mode) in self._gpio_modes.items():
+            self._pi.set_mode(gpio, mode)
+        self._driver.stop_continuous_read()
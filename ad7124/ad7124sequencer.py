@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+""" Scans many channels without managing setup numbers by hand.
+
+The AD7124 has 16 channels that share 8 setups.  Each setup is a
+configuration register and a filter register.  `AD7124Sequencer` takes a
+list of `AD7124ChannelSpec` instances, gives channels with the same
+configuration the same setup and writes all of the registers in one batch.
+Spec n uses ADC channel n.  The samples of a scan are returned split into
+one array for each channel.
+"""
+
+import numpy as np
+
+from ad7124 import ad7124convert
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+from ad7124.ad7124planner import plan_driver
+
+
+class AD7124ChannelSpec:
+    """ The inputs, range and filter of one channel. """
+
+    def __init__(
+        self,
+        ainp,
+        ainm,
+        bipolar=True,
+        gain=1,
+        ref_sel=0,
+        ref_buf=False,
+        ain_buf=True,
+        burnout=0,
+        filter_type=0,
+        rej60=False,
+        post_filter=6,
+        single_cycle=False,
+        fs=384,
+        vref=2.5,
+        scale=1.0,
+        name=None,
+    ):
+        """ Stores the settings of one channel.
+        Args:
+            ainp: The positive input, 0 to 31.
+            ainm: The negative input, 0 to 31.
+            bipolar: True for bipolar, else unipolar.
+            gain: The PGA gain, 1, 2, 4 ... 128.
+            ref_sel: The reference source, see `set_setup_config()`.
+            ref_buf: True to enable both reference buffers.  They are off
+                at power on.
+            ain_buf: True to enable both analog input buffers.
+            burnout: The burnout current setting.
+            filter_type: The filter type, see `set_setup_filter()`.
+            rej60: True to add a notch at 60Hz.
+            post_filter: The post filter, used when filter_type is 7.
+            single_cycle: True to only output settled conversions.
+            fs: The FS value, 1 to 2047, the output_data_rate argument of
+                `set_setup_filter()`.
+            vref: The reference voltage, used to convert to volts.
+            scale: A scaling factor used for external potential division.
+            name: A name for the channel, e.g. the sensor.  Not sent to the
+                ADC.
+        Raises:
+            ValueError: If gain is not a power of 2 up to 128.
+        """
+        if gain not in [1 << pga for pga in range(8)]:
+            raise ValueError("ERROR: gain must be 1, 2, 4 ... 128")
+        self.ainp = ainp
+        self.ainm = ainm
+        self.bipolar = bipolar
+        self.gain = gain
+        self.ref_sel = ref_sel
+        self.ref_buf = ref_buf
+        self.ain_buf = ain_buf
+        self.burnout = burnout
+        self.filter_type = filter_type
+        self.rej60 = rej60
+        self.post_filter = post_filter
+        self.single_cycle = single_cycle
+        self.fs = fs
+        self.vref = vref
+        self.scale = scale
+        self.name = name
+
+    def setup_key(self):
+        """ Returns the settings that go in the setup registers.  Channels
+        with equal keys can share a setup.
+        """
+        return (
+            bool(self.bipolar),
+            self.burnout,
+            bool(self.ref_buf),
+            bool(self.ain_buf),
+            self.ref_sel,
+            self.gain,
+            self.filter_type,
+            bool(self.rej60),
+            self.post_filter,
+            bool(self.single_cycle),
+            self.fs,
+        )
+
+
+class AD7124Sequencer:
+    """ Configures and reads a scan of up to 16 channels.
+    ```
+    specs = [AD7124ChannelSpec(2 * n, 2 * n + 1) for n in range(8)]
+    sequencer = AD7124Sequencer(driver, specs)
+    sequencer.configure()
+    samples = sequencer.read(800)
+    ```
+    """
+
+    #: Number of channels and setups in the AD7124.
+    MAX_CHANNELS = 16
+    MAX_SETUPS = 8
+
+    def __init__(self, driver, specs):
+        """ Gives each distinct configuration a setup.
+        Args:
+            driver: The AD7124Driver to use.
+            specs: A list of AD7124ChannelSpec, one for each channel.
+        Raises:
+            ValueError: If there are too many channels or too many
+                distinct configurations.
+        """
+        self._driver = driver
+        self.specs = list(specs)
+        if not 1 <= len(self.specs) <= self.MAX_CHANNELS:
+            raise ValueError("ERROR: 1 to 16 channels are supported")
+        # Setup number for each configuration, in order of first use.
+        self._setups = {}
+        #: The setup used by each channel.
+        self.channel_setups = []
+        for spec in self.specs:
+            key = spec.setup_key()
+            if key not in self._setups:
+                if len(self._setups) == self.MAX_SETUPS:
+                    raise ValueError(
+                        "ERROR: more than 8 different channel configurations"
+                    )
+                self._setups[key] = len(self._setups)
+            self.channel_setups.append(self._setups[key])
+        # Conversion values indexed by channel number.
+        channels = len(self.specs)
+        self._gain = np.ones(self.MAX_CHANNELS)
+        self._gain[:channels] = [spec.gain for spec in self.specs]
+        self._vref = np.ones(self.MAX_CHANNELS)
+        self._vref[:channels] = [spec.vref for spec in self.specs]
+        self._bipolar = np.zeros(self.MAX_CHANNELS, dtype=bool)
+        self._bipolar[:channels] = [spec.bipolar for spec in self.specs]
+        self._scale = np.ones(self.MAX_CHANNELS)
+        self._scale[:channels] = [spec.scale for spec in self.specs]
+
+    @property
+    def setup_count(self):
+        """ The number of setups used. """
+        return len(self._setups)
+
+    def configure(self, power_mode=2, data_status=True):
+        """ Writes all of the setup, channel and ADC control registers in
+        one batch.  The batch is sent in as few transfers as the transport
+        allows, see `AD7124Transport.split_frames()`.  Unused channels are
+        disabled.
+        Args:
+            power_mode: 0 low, 1 mid, 2 or 3 full power.
+            data_status: True to read the status with the data, which is
+                needed to know the channel of each sample.
+        """
+        driver = self._driver
+        with driver.batch():
+            written = set()
+            for (spec, setup) in zip(self.specs, self.channel_setups):
+                if setup in written:
+                    continue
+                written.add(setup)
+                driver.set_setup_config(
+                    setup,
+                    bipolar=spec.bipolar,
+                    burnout=spec.burnout,
+                    ref_buf_p=spec.ref_buf,
+                    ref_buf_m=spec.ref_buf,
+                    ain_buf_p=spec.ain_buf,
+                    ain_buf_m=spec.ain_buf,
+                    ref_sel=spec.ref_sel,
+                    pga=spec.gain.bit_length() - 1,
+                )
+                driver.set_setup_filter(
+                    setup,
+                    filter_type=spec.filter_type,
+                    rej60=spec.rej60,
+                    post_filter=spec.post_filter,
+                    single_cycle=spec.single_cycle,
+                    output_data_rate=spec.fs,
+                )
+            for (channel, spec) in enumerate(self.specs):
+                driver.set_channel(
+                    channel,
+                    enable=True,
+                    setup=self.channel_setups[channel],
+                    ainp=spec.ainp,
+                    ainm=spec.ainm,
+                )
+            for channel in range(len(self.specs), self.MAX_CHANNELS):
+                # The power on value.  Unchanged registers are skipped.
+                driver.set_channel(channel, False, 0, 0, 1)
+            driver.set_adc_control(
+                data_status=data_status, power_mode=power_mode
+            )
+
+    def plan(self):
+        """ Returns the expected rates of the scan as configured, see
+        `ad7124.ad7124planner.AD7124Plan`.
+        """
+        return plan_driver(self._driver)
+
+    def demux(self, records):
+        """ Splits samples by channel.
+        Args:
+            records: An array of SAMPLE_DTYPE records, e.g. from
+                `AD7124Acquisition.drain()`.
+        Returns:
+            A list with an array of records for each spec, in time order.
+        """
+        channels = records["channel"]
+        order = np.argsort(channels, kind="stable")
+        edges = np.searchsorted(
+            channels[order], np.arange(len(self.specs) + 1)
+        )
+        return [
+            records[order[edges[index] : edges[index + 1]]]
+            for index in range(len(self.specs))
+        ]
+
+    def voltages(self, records):
+        """ Splits samples by channel and converts them to volts.
+        Args:
+            records: An array of SAMPLE_DTYPE records.
+        Returns:
+            A list with an array of voltages for each spec.
+        """
+        return [
+            ad7124convert.to_voltage(
+                channel_records["code"],
+                self._gain,
+                self._vref,
+                self._bipolar,
+                self._scale,
+                channel_records["channel"],
+            )
+            for channel_records in self.demux(records)
+        ]
+
+    def read(self, count):
+        """ Reads samples and splits them by channel.
+        Args:
+            count: The total number of samples to read.
+        Returns:
+            A list with an array of SAMPLE_DTYPE records for each spec.
+            Reads that time out are not included.
+        """
+        records = np.zeros(count, dtype=SAMPLE_DTYPE)
+        read = self._driver.read_data_timed
+        index = 0
+        for _ in range(count):
+            (channel_number, int_value, timestamp) = read()
+            if channel_number >= 0:
+                records[index] = (timestamp, channel_number, int_value)
+                index += 1
+        return self.demux(records[:index])
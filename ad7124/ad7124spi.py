@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 """ Hides the SPI calls from the driver.
 
-Uses PiGPIO for SPI and GPIO access. For more details on PiGPIO see:
-<http://abyz.me.uk/rpi/pigpio/>
+The bytes are moved by a transport, see `ad7124.ad7124transport`.  By
+default, PiGPIO is used for SPI and GPIO access.  For more details on PiGPIO
+see: <http://abyz.me.uk/rpi/pigpio/>
 
-The PiGPIO daemon must be running before using this script.  Start
-using: `sudo pigpiod`
+When using PiGPIO, the PiGPIO daemon must be running before using this
+script.  Start using: `sudo pigpiod`
 """
 
-import pigpio
+from ad7124.ad7124transport import AD7124Transport
 
 
 def bytes_to_string(data):
@@ -23,42 +24,70 @@ class AD7124SPI:
     """
 
     #: The SPI bus Baud rate.  Max rate is 5MHz.
-    AD7124_SPI_BAUD_RATE = 5 * 1000 * 1000
-    # AD7124_SPI_BAUD_RATE = 32 * 1000 # for debugging only.
+    AD7124_SPI_BAUD_RATE = AD7124Transport.AD7124_SPI_BAUD_RATE
     #: The SPI mode.  The AD7124 uses mode 3.
-    AD7124_SPI_MODE = 0b00  # Mode 3
+    AD7124_SPI_MODE = AD7124Transport.AD7124_SPI_MODE
 
-    def __init__(self, position):
+    def __init__(self, position, transport=None):
         """ Initialises the AD7124.
         If the pigpio call fails, error messages are shown on the
         terminal.
         Args:
             position: The Pi2 click shield position number, 1 or 2.
+            transport: The `AD7124Transport` to use.  If None, a
+                `PigpioTransport` is created for the position.
         Raises:
             ValueError: If position is out of range.
         """
         # print("__init__")
-        self._pi = pigpio.pi()
-        # The Pi2 click shield only supports main bus, bit 8 = 0.
-        spi_flags = 0
-        # Set to mode 3
-        spi_flags |= self.AD7124_SPI_MODE
-        # print("init: flags", spi_flags)
-        # Set SPI chip select
-        spi_channel = 0
-        if position == 1 or position == 2:
-            spi_channel = position - 1
-        else:
-            raise ValueError("ERROR: position must be 1 or 2")
-        # print("init: channel", spi_channel)
-        # Open SPI device
-        self._spi_handle = self._pi.spi_open(
-            spi_channel, self.AD7124_SPI_BAUD_RATE, spi_flags
-        )
+        self._transport = None
+        # Check the position before opening anything.
+        AD7124Transport.spi_channel(position)
+        if transport is None:
+            # Only import pigpio when it is needed.
+            from ad7124.ad7124pigpio import PigpioTransport
+
+            transport = PigpioTransport(position)
+        self._transport = transport
 
     def __del__(self):
         """ Tidy up before being destroyed. """
-        self._pi.stop()
+        if self._transport is not None:
+            self._transport.close()
+
+    @property
+    def transport(self):
+        """ The transport used to move the bytes. """
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        """ Replaces the transport, e.g. with a wrapper around it. """
+        self._transport = transport
+
+    @property
+    def ready_edge(self):
+        """ True if the transport can wait for the DOUT/RDY falling edge. """
+        return self._transport.ready_edge
+
+    def wait_ready(self, timeout):
+        """ Waits until the AD7124 signals that a conversion is ready.
+        Only available when `ready_edge` is True.
+        Args:
+            timeout: The maximum time to wait in seconds.
+        Returns:
+            True if ready, False if timed out.
+        """
+        return self._transport.wait_ready(timeout)
+
+    def set_sync(self, level):
+        """ Drives the SYNC pin of the AD7124.
+        Args:
+            level: True for high, False for low.
+        Raises:
+            NotImplementedError: If the transport cannot drive SYNC.
+        """
+        self._transport.set_sync(level)
 
     def read_register(self, to_send):
         """ Performs a SPI read using the to_send data.
@@ -68,14 +97,24 @@ class AD7124SPI:
             Tuple containing (count of bytes read, data as bytes).
         """
         # print("read_register: to_send:", bytes_to_string(to_send))
-        (count, data) = self._pi.spi_xfer(self._spi_handle, to_send)
+        (count, data) = self._transport.xfer(to_send)
         # print("read_register: count:", count, "data:", bytes_to_string(data))
         return (count, data)
 
+    def xfer_many(self, frames):
+        """ Sends several frames in as few bus operations as possible.
+        Args:
+            frames: A list of the bytes to send for each frame.
+        Returns:
+            A list of the bytes read for each frame.
+        """
+        # print("xfer_many: frames:", len(frames))
+        return self._transport.xfer_many(frames)
+
     def write_register(self, to_send):
         """ The bytes in to_send are wrtten to the SPI bus.
         Args:
             to_send: The bytes to send.
         """
         # print("write_register:", bytes_to_string(to_send))
-        self._pi.spi_write(self._spi_handle, to_send)
+        self._transport.write(to_send)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+""" SPI transport that uses the Linux spidev driver directly.
+
+Each transfer is a single `SPI_IOC_MESSAGE` ioctl on `/dev/spidevB.C` so
+there is no daemon between the driver and the kernel.  `xfer_many()` sends
+many frames in one `SPI_IOC_MESSAGE(N)` ioctl with CS released between
+frames.  The spidev driver must be enabled, e.g. using `dtparam=spi=on` in
+`/boot/config.txt`.
+"""
+
+import ctypes
+import fcntl
+import os
+import struct
+
+from ad7124.ad7124transport import AD7124Transport
+
+# ioctl numbers from linux/spi/spidev.h
+_IOC_WRITE = 1
+SPI_IOC_MAGIC = ord("k")
+#: Size of struct spi_ioc_transfer.
+SPI_IOC_TRANSFER_SIZE = 32
+# u64 tx_buf, u64 rx_buf, u32 len, u32 speed_hz, u16 delay_usecs,
+# u8 bits_per_word, u8 cs_change, u8 tx_nbits, u8 rx_nbits,
+# u8 word_delay_usecs, u8 pad
+SPI_IOC_TRANSFER_FORMAT = "QQIIHBBBBBB"
+
+
+def _iow(number, size):
+    """ Equivalent of the _IOW() macro for the spidev magic number. """
+    return (_IOC_WRITE << 30) | (size << 16) | (SPI_IOC_MAGIC << 8) | number
+
+
+SPI_IOC_WR_MODE = _iow(1, 1)
+SPI_IOC_WR_BITS_PER_WORD = _iow(3, 1)
+SPI_IOC_WR_MAX_SPEED_HZ = _iow(4, 4)
+
+
+def spi_ioc_message(count):
+    """ Returns the SPI_IOC_MESSAGE(count) ioctl number. """
+    return _iow(0, count * SPI_IOC_TRANSFER_SIZE)
+
+
+#: Most transfers in one SPI_IOC_MESSAGE.  The ioctl size field is 14 bits.
+SPI_IOC_MAX_TRANSFERS = ((1 << 14) - 1) // SPI_IOC_TRANSFER_SIZE
+
+
+class SpidevTransport(AD7124Transport):
+    """ Sends and receives SPI data using ioctl calls on a spidev device.
+    The system calls are made by `_open_device()`, `_ioctl()` and
+    `_close_device()` so that tests can replace the device.
+    """
+
+    #: Largest number of bytes in one SPI_IOC_MESSAGE.  This is the default
+    #: size of the spidev buffer, see the spidev bufsiz module parameter.
+    MAX_TRANSFER_SIZE = 4096
+    #: Largest number of frames in one SPI_IOC_MESSAGE.
+    MAX_FRAMES = SPI_IOC_MAX_TRANSFERS
+
+    def __init__(self, position, bus=0, baud_rate=None):
+        """ Opens and configures the spidev device.
+        Args:
+            position: The Pi2 click shield position number, 1 or 2.
+            bus: The SPI bus number.  The Pi2 click shield uses bus 0.
+            baud_rate: The SPI clock rate.  Defaults to
+                AD7124_SPI_BAUD_RATE.
+        Raises:
+            ValueError: If position is out of range.
+            OSError: If the device cannot be opened or configured.
+        """
+        self._fd = None
+        spi_channel = self.spi_channel(position)
+        if baud_rate is None:
+            baud_rate = self.AD7124_SPI_BAUD_RATE
+        self._baud_rate = baud_rate
+        path = "/dev/spidev{}.{}".format(bus, spi_channel)
+        self._fd = self._open_device(path)
+        self._ioctl(SPI_IOC_WR_MODE, struct.pack("B", self.AD7124_SPI_MODE))
+        self._ioctl(SPI_IOC_WR_BITS_PER_WORD, struct.pack("B", 8))
+        self._ioctl(SPI_IOC_WR_MAX_SPEED_HZ, struct.pack("I", baud_rate))
+
+    def _open_device(self, path):
+        """ Opens the spidev device and returns the file descriptor. """
+        return os.open(path, os.O_RDWR)
+
+    def _ioctl(self, request, arg):
+        """ Performs an ioctl call on the spidev device. """
+        return fcntl.ioctl(self._fd, request, arg)
+
+    def _close_device(self, fd):
+        """ Closes the spidev device. """
+        os.close(fd)
+
+    def _message(self, frames):
+        """ Sends the frames using one SPI_IOC_MESSAGE ioctl call.
+        CS is released between frames and at the end.
+        Args:
+            frames: A list of the bytes to send for each frame.
+        Returns:
+            A list of the bytes read for each frame.
+        """
+        # The buffers must exist until the ioctl call returns.
+        tx_bufs = []
+        rx_bufs = []
+        transfers = []
+        for (index, frame) in enumerate(frames):
+            length = len(frame)
+            tx_buf = ctypes.create_string_buffer(bytes(frame), length)
+            rx_buf = ctypes.create_string_buffer(length)
+            tx_bufs.append(tx_buf)
+            rx_bufs.append(rx_buf)
+            # cs_change on the last transfer would keep CS low afterwards.
+            cs_change = 1 if index < len(frames) - 1 else 0
+            transfers.append(
+                struct.pack(
+                    SPI_IOC_TRANSFER_FORMAT,
+                    ctypes.addressof(tx_buf),
+                    ctypes.addressof(rx_buf),
+                    length,
+                    self._baud_rate,
+                    0,  # delay_usecs
+                    8,  # bits_per_word
+                    cs_change,
+                    0,  # tx_nbits
+                    0,  # rx_nbits
+                    0,  # word_delay_usecs
+                    0,  # pad
+                )
+            )
+        # fcntl.ioctl() refuses immutable arguments longer than 1024 bytes,
+        # 32 transfers, but passes a mutable buffer of any size.
+        message = bytearray(b"".join(transfers))
+        self._ioctl(spi_ioc_message(len(frames)), message)
+        return [bytearray(rx_buf.raw) for rx_buf in rx_bufs]
+
+    def xfer(self, to_send):
+        """ Performs a full duplex transfer using one ioctl call.
+        Args:
+            to_send: The bytes to send.
+        Returns:
+            Tuple containing (count of bytes read, data as bytes).
+        """
+        data = self._message([to_send])[0]
+        return (len(data), data)
+
+    def xfer_many(self, frames):
+        """ Sends several frames using as few ioctl calls as possible.
+        Each frame is a separate transfer in the message so CS is released
+        between frames.
+        Args:
+            frames: A list of the bytes to send for each frame.
+        Returns:
+            A list of the bytes read for each frame.
+        """
+        results = []
+        for (start, end) in self.split_frames(frames):
+            results += self._message(frames[start:end])
+        return results
+
+    def close(self):
+        """ Closes the spidev device. """
+        if self._fd is not None:
+            self._close_device(self._fd)
+            self._fd = None
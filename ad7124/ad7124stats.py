@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+""" Timing statistics for the acquisition path.
+
+`AD7124Histogram` is a log-linear histogram, in the style of HdrHistogram,
+that records values over a wide range with a fixed relative precision and
+a fixed amount of memory.  `AD7124Stats` keeps histograms of the interval
+between samples, the read latency and the number of status polls for each
+channel.  Enable it by setting `AD7124Driver.stats`.
+"""
+
+import copy
+import threading
+import time
+
+import numpy as np
+
+try:
+    monotonic_ns = time.monotonic_ns
+except AttributeError:
+    # Python 3.6
+
+    def monotonic_ns():
+        return int(time.monotonic() * 1e9)
+
+
+class AD7124Histogram:
+    """ Counts values in buckets whose width grows with the value.
+    Values below 2**sub_bucket_bits are counted exactly.  Larger values are
+    counted with a relative error of less than 1 / 2**(sub_bucket_bits - 1).
+    """
+
+    def __init__(self, max_value=60 * 10 ** 9, sub_bucket_bits=7):
+        """ Allocates the buckets.
+        Args:
+            max_value: The largest value that can be recorded.  Larger values
+                are counted as max_value.  The default is 60 seconds in
+                nanoseconds.
+            sub_bucket_bits: Sets the precision.  7 gives better than 2%.
+        """
+        self._sub_bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self._max_value = max_value
+        # A list is faster than an array for single increments.
+        self._counts = [0] * (self._index(max_value) + 1)
+        self.reset()
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self._sub_bits)
+        return shift * self._half + (value >> shift)
+
+    def _value(self, index):
+        """ Returns the lowest value counted in the bucket. """
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return (index - shift * self._half) << shift
+
+    def reset(self):
+        """ Clears all of the counts. """
+        self._counts = [0] * len(self._counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """ Counts a value.
+        Args:
+            value: A non-negative integer, e.g. a time in nanoseconds.
+        """
+        value = min(max(int(value), 0), self._max_value)
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def copy(self):
+        """ Returns a copy that does not change when values are recorded. """
+        result = copy.copy(self)
+        result._counts = list(self._counts)
+        return result
+
+    @property
+    def mean(self):
+        """ The mean of the values recorded, or None if there are none. """
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """ Returns the value below which the given percentage of the
+        recorded values fall.
+        Args:
+            percent: 0 to 100.
+        Returns:
+            The value, accurate to the bucket precision, or None if no values
+            have been recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(np.ceil(self.count * percent / 100.0)))
+        index = int(np.searchsorted(np.cumsum(self._counts), rank))
+        return min(max(self._value(index), self.min), self.max)
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        """ Returns a dict of count, min, mean, max and the percentiles.
+        The percentile keys are e.g. "p50" and "p99.9".
+        """
+        result = {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.mean,
+            "max": self.max,
+        }
+        for percent in percentiles:
+            result["p{:g}".format(percent)] = self.percentile(percent)
+        return result
+
+
+class AD7124Stats:
+    """ Histograms of the acquisition timing for each channel.
+    * interval: Time between successive samples of the channel in ns.
+    * latency: Time spent in the read call that returned the sample in ns.
+    * polls: Number of status polls needed for the sample.
+    The values can be read at any time, e.g. while an acquisition thread
+    is recording them.
+    """
+
+    #: The histograms kept for each channel.
+    NAMES = ("interval", "latency", "polls")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._last_timestamp = {}
+
+    def reset(self):
+        """ Forgets all recorded samples. """
+        with self._lock:
+            self._channels = {}
+            self._last_timestamp = {}
+
+    def record(self, channel, timestamp, latency, polls):
+        """ Records a sample.
+        Args:
+            channel: The channel number.
+            timestamp: When the sample was read, from monotonic_ns().
+            latency: The time taken to read the sample in ns.
+            polls: The number of status polls needed.
+        """
+        with self._lock:
+            histograms = self._channels.get(channel)
+            if histograms is None:
+                histograms = {name: AD7124Histogram() for name in self.NAMES}
+                self._channels[channel] = histograms
+            last_timestamp = self._last_timestamp.get(channel)
+            if last_timestamp is not None:
+                histograms["interval"].record(timestamp - last_timestamp)
+            self._last_timestamp[channel] = timestamp
+            histograms["latency"].record(latency)
+            histograms["polls"].record(polls)
+
+    def histogram(self, channel, name):
+        """ Returns a copy of one of the histograms of a channel.  The copy
+        is made under the lock so it is consistent even while samples are
+        being recorded.
+        Args:
+            channel: The channel number.
+            name: One of NAMES.
+        Raises:
+            KeyError: If nothing has been recorded for the channel.
+        """
+        with self._lock:
+            return self._channels[channel][name].copy()
+
+    def channels(self):
+        """ Returns the channel numbers that have samples, in order. """
+        with self._lock:
+            return sorted(self._channels)
+
+    def summary(self):
+        """ Returns {channel: {name: histogram summary}} for all channels.
+        See `AD7124Histogram.summary()`.
+        """
+        with self._lock:
+            return {
+                channel: {
+                    name: histogram.summary()
+                    for (name, histogram) in histograms.items()
+                }
+                for (channel, histograms) in sorted(self._channels.items())
+            }
+
+    def report(self):
+        """ Returns the summary as lines of text.  Times are in
+        microseconds.
+        """
+        lines = []
+        for (channel, histograms) in self.summary().items():
+            count = histograms["latency"]["count"]
+            lines.append("Channel {}: {} samples".format(channel, count))
+            for name in self.NAMES:
+                values = histograms[name]
+                scale = 1.0 if name == "polls" else 1e-3
+                unit = "" if name == "polls" else " us"
+                text = ", ".join(
+                    "{} {:.1f}".format(key, value * scale)
+                    for (key, value) in values.items()
+                    if key != "count" and value is not None
+                )
+                lines.append("  {}{}: {}".format(name, unit, text))
+        return lines
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+""" Conversion timing of the AD7124.
+
+The formulas are from the "Digital Filter" section of the datasheet.  All
+times are in seconds and all rates in samples per second.  The filter
+settings are the fields of the filter register, see
+`AD7124Driver.set_setup_filter()`, and the power mode is the field of the
+ADC control register.
+"""
+
+#: Master clock frequency in Hz for each power mode.  Modes 2 and 3 are
+#: both full power.
+MASTER_CLOCK = {0: 76800.0, 1: 153600.0, 2: 614400.0, 3: 614400.0}
+
+#: Filter types, bits 23:21 of the filter register.
+SINC4 = 0
+SINC3 = 2
+FAST_SINC4 = 4
+FAST_SINC3 = 5
+POST_FILTER = 7
+
+#: Output data rate of each post filter setting, bits 19:17.
+POST_FILTER_RATES = {2: 27.27, 3: 25.0, 5: 20.0, 6: 16.67}
+
+#: Dead time, in master clock cycles, added to the settling time.  It is
+#: shorter when FS is 1 and when the sequencer moves to the next channel.
+DEAD_TIME = 95
+DEAD_TIME_FS1 = 61
+DEAD_TIME_SEQUENCER = 30
+
+
+def decode_filter(value):
+    """ Splits a filter register value into its fields.
+    Args:
+        value: The 24 bit filter register value.
+    Returns:
+        A dict of filter_type, rej60, post_filter, single_cycle and fs.
+        An FS of 0 is not allowed by the AD7124 and is returned as 1.
+    """
+    return {
+        "filter_type": (value >> 21) & 0x07,
+        "rej60": bool(value & 0x100000),
+        "post_filter": (value >> 17) & 0x07,
+        "single_cycle": bool(value & 0x010000),
+        "fs": max(1, value & 0x7FF),
+    }
+
+
+def master_clock(power_mode):
+    """ Returns the master clock frequency in Hz.
+    Args:
+        power_mode: 0 low, 1 mid, 2 or 3 full power.
+    Raises:
+        ValueError: If power_mode is out of range.
+    """
+    try:
+        return MASTER_CLOCK[power_mode]
+    except KeyError:
+        raise ValueError("ERROR: power_mode must be 0 to 3") from None
+
+
+def _cycles(filter_type, fs, power_mode):
+    """ Returns the master clock cycles for one fully settled conversion,
+    not including the dead time.
+    """
+    if filter_type == SINC4:
+        return 4 * 32 * fs
+    if filter_type == SINC3:
+        return 3 * 32 * fs
+    if filter_type in (FAST_SINC4, FAST_SINC3):
+        # The sinc filter is followed by an averaging block.
+        average = 8 if power_mode == 0 else 16
+        order = 4 if filter_type == FAST_SINC4 else 3
+        return (order + average - 1) * 32 * fs
+    raise ValueError("ERROR: unknown filter type " + str(filter_type))
+
+
+def output_data_rate(
+    filter_type, fs, power_mode, post_filter=6, single_cycle=False
+):
+    """ Returns the output data rate when one channel is converted
+    continuously.
+    Args:
+        filter_type: The filter type, e.g. SINC4.
+        fs: The FS value, 1 to 2047.
+        power_mode: 0 low, 1 mid, 2 or 3 full power.
+        post_filter: The post filter, used when filter_type is POST_FILTER.
+        single_cycle: True if only settled conversions are output.
+    Returns:
+        The rate in samples per second.
+    Raises:
+        ValueError: If a setting is not valid.
+    """
+    f_clk = master_clock(power_mode)
+    if filter_type == POST_FILTER:
+        try:
+            return POST_FILTER_RATES[post_filter]
+        except KeyError:
+            raise ValueError(
+                "ERROR: unknown post filter " + str(post_filter)
+            ) from None
+    if filter_type in (SINC4, SINC3) and not single_cycle:
+        # Every conversion is output once the filter has settled.
+        return f_clk / (32 * fs)
+    return f_clk / _cycles(filter_type, fs, power_mode)
+
+
+def settling_time(
+    filter_type, fs, power_mode, post_filter=6, sequencer=False
+):
+    """ Returns the time from starting to convert a channel to the first
+    settled result, e.g. after a channel change or in single conversion
+    mode.
+    Args:
+        filter_type: The filter type, e.g. SINC4.
+        fs: The FS value, 1 to 2047.
+        power_mode: 0 low, 1 mid, 2 or 3 full power.
+        post_filter: The post filter, used when filter_type is POST_FILTER.
+        sequencer: True if the time is for the sequencer moving from one
+            enabled channel to the next.
+    Returns:
+        The time in seconds.
+    Raises:
+        ValueError: If a setting is not valid.
+    """
+    f_clk = master_clock(power_mode)
+    if sequencer:
+        dead_time = DEAD_TIME_SEQUENCER
+    elif fs == 1:
+        dead_time = DEAD_TIME_FS1
+    else:
+        dead_time = DEAD_TIME
+    if filter_type == POST_FILTER:
+        rate = output_data_rate(filter_type, fs, power_mode, post_filter)
+        return 1.0 / rate + dead_time / f_clk
+    return (_cycles(filter_type, fs, power_mode) + dead_time) / f_clk
+
+
+def conversion_period(
+    filter_type,
+    fs,
+    power_mode,
+    post_filter=6,
+    single_cycle=False,
+    channels=1,
+):
+    """ Returns the time between conversions once conversions have
+    started.
+    With more than one channel enabled, every conversion is a settled
+    conversion of the next channel so the period is the settling time.
+    Args:
+        filter_type: The filter type, e.g. SINC4.
+        fs: The FS value, 1 to 2047.
+        power_mode: 0 low, 1 mid, 2 or 3 full power.
+        post_filter: The post filter, used when filter_type is POST_FILTER.
+        single_cycle: True if only settled conversions are output.
+        channels: The number of enabled channels.
+    Returns:
+        The time in seconds.
+    """
+    if channels > 1:
+        return settling_time(
+            filter_type, fs, power_mode, post_filter, sequencer=True
+        )
+    return 1.0 / output_data_rate(
+        filter_type, fs, power_mode, post_filter, single_cycle
+    )
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+""" The interface that every SPI transport used by AD7124SPI provides.
+
+A transport moves bytes to and from the AD7124.  The following transports
+are provided:
+
+* `ad7124.ad7124pigpio.PigpioTransport` uses the PiGPIO daemon.
+* `ad7124.ad7124spidev.SpidevTransport` uses the Linux spidev driver.
+* `ad7124.ad7124memory.MemoryTransport` emulates the AD7124 register map
+  in memory so that the driver can be used without any hardware.
+* `ad7124.ad7124emulator.AD7124Emulator` adds realistic conversion timing
+  to the in-memory AD7124.
+"""
+
+
+class AD7124Transport:
+    """ Base class for all transports.
+    Sub-classes must implement `xfer()`.  The other functions have sensible
+    defaults.
+    """
+
+    #: The SPI bus Baud rate.  Max rate is 5MHz.
+    AD7124_SPI_BAUD_RATE = 5 * 1000 * 1000
+    #: The SPI mode.  The AD7124 uses mode 3.
+    AD7124_SPI_MODE = 0b00  # Mode 3
+    #: True if `wait_ready()` can be used.
+    ready_edge = False
+    #: Largest number of bytes that `xfer_many()` sends in one transfer.
+    MAX_TRANSFER_SIZE = 4096
+    #: Largest number of frames in one transfer or None if there is no
+    #: limit.
+    MAX_FRAMES = None
+
+    @staticmethod
+    def spi_channel(position):
+        """ Returns the SPI chip select used for the given position.
+        Args:
+            position: The Pi2 click shield position number, 1 or 2.
+        Returns:
+            The SPI channel number, 0 or 1.
+        Raises:
+            ValueError: If position is out of range.
+        """
+        if position == 1 or position == 2:
+            return position - 1
+        raise ValueError("ERROR: position must be 1 or 2")
+
+    def xfer(self, to_send):
+        """ Writes to_send to the SPI bus and reads the same number of bytes.
+        Args:
+            to_send: The bytes to send.
+        Returns:
+            Tuple containing (count of bytes read, data as bytes).
+        """
+        raise NotImplementedError
+
+    def write(self, to_send):
+        """ Writes to_send to the SPI bus.  The bytes read are discarded.
+        Args:
+            to_send: The bytes to send.
+        """
+        self.xfer(to_send)
+
+    def xfer_many(self, frames):
+        """ Sends several frames and returns the bytes read for each one.
+        The AD7124 expects a new command as soon as the previous one is
+        complete so the frames are joined together and sent in as few
+        transfers as possible.  Sub-classes can override this if the bus
+        can do better.
+        Args:
+            frames: A list of the bytes to send for each frame.
+        Returns:
+            A list of the bytes read for each frame.
+        """
+        results = []
+        for (start, end) in self.split_frames(frames):
+            to_send = b"".join(bytes(frame) for frame in frames[start:end])
+            (_, data) = self.xfer(to_send)
+            offset = 0
+            for frame in frames[start:end]:
+                results.append(data[offset : offset + len(frame)])
+                offset += len(frame)
+        return results
+
+    def split_frames(self, frames):
+        """ Works out which frames `xfer_many()` sends in each transfer.
+        As many frames as fit in MAX_TRANSFER_SIZE bytes, and MAX_FRAMES
+        frames if set, are put in each transfer.
+        Args:
+            frames: A list of the bytes to send for each frame.
+        Returns:
+            A list of (start, end) frame indexes, one for each transfer.
+        """
+        splits = []
+        start = 0
+        while start < len(frames):
+            end = start + 1
+            size = len(frames[start])
+            while end < len(frames) and (
+                self.MAX_FRAMES is None or end - start < self.MAX_FRAMES
+            ):
+                size += len(frames[end])
+                if size > self.MAX_TRANSFER_SIZE:
+                    break
+                end += 1
+            splits.append((start, end))
+            start = end
+        return splits
+
+    def wait_ready(self, timeout):
+        """ Waits for DOUT/RDY to go low, i.e. for a conversion to be ready.
+        Args:
+            timeout: The maximum time to wait in seconds.
+        Returns:
+            True if ready, False if timed out.
+        """
+        raise NotImplementedError
+
+    def set_sync(self, level):
+        """ Drives the SYNC pin of the AD7124.
+        While SYNC is low the digital filter and the sequencer are held in
+        reset.  Conversions start on the rising edge.
+        Args:
+            level: True for high, False for low.
+        Raises:
+            NotImplementedError: If the transport cannot drive SYNC.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """ Releases any resources held by the transport. """
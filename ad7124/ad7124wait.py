@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+""" Strategies for waiting for the next conversion.
+
+Without a strategy, `AD7124Driver.read_data_wait()` polls the AD7124 as
+fast as it can until a conversion is ready.  That gives the lowest latency
+but uses a whole CPU core even at low output data rates.
+
+`AD7124WaitStrategy` works out the expected time between samples from the
+channel and filter registers, see `ad7124.ad7124planner`.  It sleeps for
+most of that time after each sample and then polls near the deadline.  The
+policy sets how early it wakes and how long it sleeps between polls:
+
+* latency: Wakes early and then polls with very short sleeps.
+* balanced: Wakes a little early and sleeps briefly between polls.
+* cpu: Wakes at the deadline and sleeps longer between polls.
+"""
+
+import time
+
+from ad7124.ad7124planner import plan_driver
+
+
+class AD7124WaitStrategy:
+    """ Sleeps until a conversion is expected.
+    Set using `AD7124Driver.set_wait_strategy()`.
+    """
+
+    #: For each policy, (guard, poll) as fractions of the sample period.
+    #: The strategy wakes guard before the expected sample and sleeps
+    #: poll between unsuccessful polls.
+    POLICIES = {
+        "latency": (0.25, 0.002),
+        "balanced": (0.1, 0.02),
+        "cpu": (0.0, 0.1),
+    }
+
+    def __init__(self, policy="balanced", clock=None):
+        """ Creates a strategy that uses the given policy.
+        Args:
+            policy: One of the keys of POLICIES.
+            clock: An object with time() and sleep() methods, e.g. an
+                `ad7124.ad7124emulator.SimulatedClock`.  If None, the real
+                monotonic clock is used.
+        Raises:
+            ValueError: If the policy is not known.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError("ERROR: unknown wait policy " + str(policy))
+        self.policy = policy
+        (self._guard, self._poll) = self.POLICIES[policy]
+        if clock is None:
+            self._time = time.monotonic
+            self._sleep = time.sleep
+        else:
+            self._time = clock.time
+            self._sleep = clock.sleep
+        self._driver = None
+        self._period = None
+        self._last = None
+
+    def attach(self, driver):
+        """ Called by the driver when the strategy is set. """
+        self._driver = driver
+        self.invalidate()
+
+    def invalidate(self):
+        """ Forgets the sample period.  Called by the driver when a register
+        is written because the channels or filters may have changed.
+        """
+        self._period = None
+        self._last = None
+
+    @property
+    def period(self):
+        """ The expected time between samples in seconds.  0 if no channels
+        are enabled.
+        """
+        if self._period is None:
+            try:
+                self._period = 1.0 / plan_driver(self._driver).total_rate
+            except ValueError:
+                # No channels enabled or an unknown filter.
+                self._period = 0.0
+        return self._period
+
+    def before_read(self):
+        """ Sleeps until shortly before the next sample is expected. """
+        if self._last is None:
+            return
+        wake = self._last + self.period * (1.0 - self._guard)
+        delay = wake - self._time()
+        if delay > 0:
+            self._sleep(delay)
+
+    def between_polls(self):
+        """ Sleeps after a poll that found no new data. """
+        if self._poll:
+            self._sleep(self.period * self._poll)
+
+    def after_sample(self):
+        """ Records the time that a sample was read. """
+        self._last = self._time()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+""" Benchmarks for the driver and voltmeter hot paths.
+The AD7124 is replaced by the in-memory `MemoryTransport` so no hardware is
+needed and the results only measure the Python code.  The results are
+written as JSON so that runs before and after a change can be compared.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import timeit
+from optparse import OptionParser
+
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+from voltmeter import Voltmeter
+
+
+def _driver():
+    """ Returns a driver set up as the voltmeter sets it up. """
+    transport = MemoryTransport()
+    driver = AD7124Driver(1, transport)
+    transport.set_code(1, 0x812345)
+    transport.set_code(2, 0x456789)
+    driver.set_channel(0, False, 0, 0, 0)
+    driver.set_channel(1, True, 1, 2, 3)
+    driver.set_channel(2, True, 2, 4, 5)
+    driver.set_adc_control(data_status=True, power_mode=2)
+    return driver
+
+
+def _result(name, ops, seconds):
+    return {
+        "name": name,
+        "ops": ops,
+        "seconds": seconds,
+        "us_per_op": seconds / ops * 1e6,
+        "ops_per_second": ops / seconds,
+    }
+
+
+def bench_call(name, function, number, repeat):
+    """ Times a function that takes no arguments.
+    Args:
+        name: The name of the result.
+        function: The function to call.
+        number: The number of calls in each timing.
+        repeat: The number of timings.  The fastest is used.
+    Returns:
+        A dict of the results.
+    """
+    seconds = min(timeit.Timer(function).repeat(repeat, number))
+    return _result(name, number, seconds)
+
+
+def bench_voltmeter(name, args, readings, repeat):
+    """ Times the voltmeter main loop.
+    Args:
+        name: The name of the result.
+        args: The voltmeter command line arguments.
+        readings: The number of readings in each timing.
+        repeat: The number of timings.  The fastest is used.
+    Returns:
+        A dict of the results.
+    """
+    best = None
+    for _ in range(repeat):
+        voltmeter = Voltmeter(MemoryTransport())
+        voltmeter.parse_options(args)
+        # The voltmeter prints to stdout, including the readings in console
+        # mode.
+        with open(os.devnull, "w") as null:
+            with contextlib.redirect_stdout(null):
+                start = timeit.default_timer()
+                voltmeter.run(max_readings=readings)
+                seconds = timeit.default_timer() - start
+        result = _result(name, voltmeter._readings, seconds)
+        result["overruns"] = voltmeter._acquisition.overruns
+        if best is None or seconds < best["seconds"]:
+            best = result
+    best["samples_per_second"] = best.pop("ops_per_second")
+    return best
+
+
+def run_benchmarks(number=100000, readings=100000, repeat=3):
+    """ Runs all of the benchmarks.
+    Args:
+        number: The number of calls to time for the driver functions.
+        readings: The number of readings to time for the voltmeter.
+        repeat: The number of timings of each.  The fastest is used.
+    Returns:
+        A list of result dicts.
+    """
+    driver = _driver()
+    data = bytes([0xFF, 0x81, 0x23, 0x45])
+    results = [
+        bench_call(
+            "build_command",
+            lambda: driver._build_command(AD7124RegNames.DATA_REG, True),
+            number,
+            repeat,
+        ),
+        bench_call(
+            "read_register",
+            lambda: driver._read_register(AD7124RegNames.DATA_REG, True),
+            number,
+            repeat,
+        ),
+        bench_call(
+            "data_to_int", lambda: driver._data_to_int(data), number, repeat
+        ),
+        bench_call("read_data_wait", driver.read_data_wait, number, repeat),
+        bench_call(
+            "to_voltage",
+            lambda: driver.to_voltage(0x812345, 1, 2.5, True, 3.0),
+            number,
+            repeat,
+        ),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "benchmark")
+        for (name, args) in (
+            ("voltmeter_console", []),
+            ("voltmeter_csv", ["-f", "csv", "-o", filename]),
+            ("voltmeter_binary", ["-f", "binary", "-o", filename]),
+        ):
+            # The in-memory AD7124 is always ready so do not wait for the
+            # output data rate.
+            args = args + ["-w", "spin", "1", "2"]
+            results.append(bench_voltmeter(name, args, readings, repeat))
+    return results
+
+
+def run():
+    usage = "usage: %prog [options]\n"
+    usage += "Benchmarks the driver and voltmeter without any hardware."
+    parser = OptionParser(usage)
+    parser.set_defaults(number=100000, readings=100000, repeat=3)
+    parser.add_option(
+        "-n",
+        "--number",
+        dest="number",
+        type="int",
+        help="Calls to time for each driver function.  Default is %default.",
+    )
+    parser.add_option(
+        "-r",
+        "--readings",
+        dest="readings",
+        type="int",
+        help="Readings to time for each voltmeter loop.  Default is "
+        "%default.",
+    )
+    parser.add_option(
+        "--repeat",
+        dest="repeat",
+        type="int",
+        help="Times to run each benchmark.  Default is %default.",
+    )
+    parser.add_option(
+        "-o",
+        "--file",
+        dest="filename",
+        help="Write the JSON results to FILE instead of stdout.",
+        metavar="FILE",
+    )
+    (options, _) = parser.parse_args()
+    results = {
+        "python": sys.version.split()[0],
+        "results": run_benchmarks(
+            options.number, options.readings, options.repeat
+        ),
+    }
+    text = json.dumps(results, indent=2)
+    if options.filename:
+        with open(options.filename, "w") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    run()
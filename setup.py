@@ -15,6 +15,7 @@ setup(name='ad7124',
       python_requires='>= 3.6',
       install_requires=[
           'pigpio',
+          'numpy',
           'pdoc3',
       ],
       zip_safe=False)
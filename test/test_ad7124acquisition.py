@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+""" Unit tests for the background acquisition engine.
+These tests do not need any hardware.
+"""
+import time
+import unittest
+
+from ad7124.ad7124acquisition import AD7124Acquisition, AD7124RingBuffer
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class TestAD7124RingBuffer(unittest.TestCase):
+    """ Tests the ring buffer on its own. """
+
+    def test_drain(self):
+        """ Records come out in the order they went in. """
+        buffer = AD7124RingBuffer(4)
+        for index in range(3):
+            self.assertTrue(buffer.push(index, 1, 0x100 + index))
+        self.assertEqual(3, len(buffer))
+        records = buffer.drain(2)
+        self.assertEqual([0x100, 0x101], records["code"].tolist())
+        records = buffer.drain()
+        self.assertEqual([2], records["timestamp"].tolist())
+        self.assertEqual(0, len(buffer.drain()))
+
+    def test_wrap(self):
+        """ Records that wrap around the end of the storage are joined. """
+        buffer = AD7124RingBuffer(4)
+        for index in range(3):
+            buffer.push(index, 0, index)
+        buffer.drain(2)
+        for index in range(3, 6):
+            buffer.push(index, 0, index)
+        records = buffer.drain()
+        self.assertEqual([2, 3, 4, 5], records["code"].tolist())
+
+    def test_overrun(self):
+        """ New records are dropped when the buffer is full. """
+        buffer = AD7124RingBuffer(2)
+        buffer.push(0, 0, 0)
+        buffer.push(1, 0, 1)
+        self.assertFalse(buffer.push(2, 0, 2))
+        self.assertEqual(1, buffer.overruns)
+        self.assertEqual([0, 1], buffer.drain()["code"].tolist())
+
+    def test_drain_timeout(self):
+        """ An empty buffer waits for the timeout. """
+        buffer = AD7124RingBuffer(2)
+        start = time.monotonic()
+        self.assertEqual(0, len(buffer.drain(timeout=0.05)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+
+class TestAD7124Acquisition(unittest.TestCase):
+    """ Tests the reader thread using the in-memory AD7124. """
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.ad7124 = AD7124Driver(1, self.transport)
+        self.ad7124.set_channel(0, False, 0, 0, 0)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.ad7124.set_channel(2, True, 0, 4, 5)
+        self.transport.set_code(1, 0x111111)
+        self.transport.set_code(2, 0x222222)
+
+    def _acquire(self, acquisition, count):
+        records = []
+        acquisition.start()
+        try:
+            while sum(len(batch) for batch in records) < count:
+                records.append(acquisition.drain(timeout=1.0))
+        finally:
+            acquisition.stop()
+        return records
+
+    def test_acquisition(self):
+        """ Samples from both channels are stored with timestamps. """
+        self.ad7124.set_adc_control(data_status=True)
+        acquisition = AD7124Acquisition(self.ad7124, capacity=1024)
+        self._acquire(acquisition, 10)
+        self.assertFalse(acquisition.running)
+        self.assertGreaterEqual(acquisition.samples, 10)
+        records = acquisition.drain()
+        self.assertGreater(len(records), 0)
+        for record in records:
+            expected = {1: 0x111111, 2: 0x222222}[int(record["channel"])]
+            self.assertEqual(expected, record["code"])
+        self.assertTrue(
+            (records["timestamp"][1:] >= records["timestamp"][:-1]).all()
+        )
+
+    def test_continuous(self):
+        """ Continuous read mode is started and stopped. """
+        acquisition = AD7124Acquisition(
+            self.ad7124, capacity=1024, continuous=True
+        )
+        records = self._acquire(acquisition, 10)
+        self.assertEqual(0x111111, records[0]["code"][0])
+        adc_control = self.transport.register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(0, adc_control & 0x0800)
+        self.assertEqual(0x14, self.ad7124.read_id())
+
+    def test_overrun(self):
+        """ A consumer that does not keep up causes overruns. """
+        acquisition = AD7124Acquisition(self.ad7124, capacity=8)
+        acquisition.start()
+        end_time = time.monotonic() + 1.0
+        while acquisition.overruns == 0 and time.monotonic() < end_time:
+            time.sleep(0.01)
+        acquisition.stop()
+        self.assertGreater(acquisition.overruns, 0)
+        self.assertEqual(8, len(acquisition.drain()))
+
+    def test_exception(self):
+        """ An error in the reader thread is raised by drain(). """
+
+        def fail():
+            raise OSError("bus error")
+
+        self.ad7124.read_data_wait = fail
+        acquisition = AD7124Acquisition(self.ad7124)
+        acquisition.start()
+        acquisition._thread.join(1.0)
+        self.assertFalse(acquisition.running)
+        with self.assertRaises(OSError):
+            acquisition.drain()
+        acquisition.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
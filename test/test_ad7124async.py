@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+""" Unit tests for the asyncio interface.
+These tests do not need any hardware.
+"""
+
+import asyncio
+import unittest
+
+from ad7124.ad7124async import AD7124AsyncDriver
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+from ad7124.ad7124stats import AD7124Stats
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAD7124Async(unittest.TestCase):
+    """ Tests the async driver using the in-memory AD7124. """
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.adc = AD7124AsyncDriver(AD7124Driver(1, self.transport))
+        self.transport.set_code(1, 0x111111)
+        self.transport.set_code(2, 0x222222)
+
+    def tearDown(self):
+        self.adc.close()
+
+    async def _setup_channels(self):
+        await self.adc.set_channel(0, False, 0, 0, 0)
+        await self.adc.set_channel(1, True, 0, 2, 3)
+        await self.adc.set_channel(2, True, 0, 4, 5)
+        await self.adc.set_adc_control(data_status=True)
+
+    def test_configuration(self):
+        """ Configuration calls reach the device. """
+
+        async def configure():
+            await self._setup_channels()
+            return await self.adc.read_id()
+
+        self.assertEqual(0x14, run(configure()))
+        value = self.transport.register(AD7124RegNames.CH1_MAP_REG)
+        self.assertEqual(0x8043, value)
+
+    def test_stream(self):
+        """ Batches only contain the requested channels. """
+
+        async def collect():
+            await self._setup_channels()
+            batches = []
+            async for batch in self.adc.stream(channels=[2], batch_size=8):
+                batches.append(batch)
+                if len(batches) == 3:
+                    break
+            return batches
+
+        batches = run(collect())
+        for batch in batches:
+            self.assertEqual(8, len(batch))
+            self.assertEqual([2] * 8, batch["channel"].tolist())
+            self.assertEqual([0x222222] * 8, batch["code"].tolist())
+
+    def test_continuous_read(self):
+        """ Streams in continuous read mode and records the stats. """
+        driver = self.adc.driver
+        driver.stats = AD7124Stats()
+
+        async def collect():
+            await self._setup_channels()
+            await self.adc.run(driver.start_continuous_read)
+            async for batch in self.adc.stream(batch_size=8):
+                break
+            await self.adc.run(driver.stop_continuous_read)
+            return batch
+
+        batch = run(collect())
+        self.assertEqual(8, len(batch))
+        self.assertEqual({0x111111, 0x222222}, set(batch["code"].tolist()))
+        self.assertTrue((batch["timestamp"] > 0).all())
+        self.assertEqual([1, 2], driver.stats.channels())
+
+    def test_control_while_streaming(self):
+        """ Configuration calls are run between batches. """
+
+        async def collect():
+            await self._setup_channels()
+            codes = []
+            async for batch in self.adc.stream(batch_size=4):
+                codes.extend(batch["code"].tolist())
+                if len(codes) == 8:
+                    await self.adc.enable_channel(1, False)
+                if len(codes) >= 24:
+                    break
+            return codes
+
+        codes = run(collect())
+        self.assertIn(0x111111, codes[:8])
+        # The batch read ahead may still contain channel 1.
+        self.assertEqual({0x222222}, set(codes[16:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
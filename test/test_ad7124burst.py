@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+""" Unit tests for the SYNC triggered bursts.
+The emulator and a simulated clock are used so the timing is exact.  These
+tests do not need any hardware.
+"""
+import unittest
+from unittest import mock
+
+from ad7124 import ad7124pigpio, ad7124timing
+from ad7124.ad7124burst import AD7124Burst, run_bursts
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124emulator import AD7124Emulator, SimulatedClock
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class TestAD7124Burst(unittest.TestCase):
+    """ Bursts from the emulator. """
+
+    def setUp(self):
+        self.clock = SimulatedClock()
+        self.emulator = AD7124Emulator(clock=self.clock, seed=1)
+        self.ad7124 = AD7124Driver(1, self.emulator)
+        # Sinc4, FS = 384, full power: 50 SPS.
+        self.ad7124.set_setup_filter(0, filter_type=0, output_data_rate=384)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.emulator.set_code(1, 0x123456)
+        self.emulator.set_code(2, 0x654321)
+        self.ad7124.set_adc_control(data_status=True, power_mode=2)
+
+    def _mode(self):
+        adc_control = self.emulator.register(AD7124RegNames.ADC_CTRL_REG)
+        return (adc_control >> 2) & 0x0F
+
+    def test_continuous(self):
+        """ Nothing is converted until the trigger, then the first sample
+        takes the settling time and the rest the output data rate.
+        """
+        burst = AD7124Burst(self.ad7124)
+        burst.arm()
+        self.clock.sleep(1.0)
+        (ready, _, _, _) = self.ad7124.read_status()
+        self.assertFalse(ready)
+        burst.trigger()
+        self.assertIsNotNone(burst.trigger_time)
+        start = self.clock.time()
+        records = burst.read(5)
+        self.assertEqual([1] * 5, records["channel"].tolist())
+        self.assertEqual([0x123456] * 5, records["code"].tolist())
+        settle = ad7124timing.settling_time(ad7124timing.SINC4, 384, 2)
+        elapsed = self.clock.time() - start
+        self.assertAlmostEqual(settle + 4 * 0.02, elapsed, delta=1e-3)
+        self.assertEqual(4, self._mode())
+        self.assertTrue(self.emulator.sync)
+
+    def test_single(self):
+        """ Each enabled channel is converted once for every start. """
+        self.ad7124.set_channel(2, True, 0, 4, 5)
+        burst = AD7124Burst(self.ad7124, single=True)
+        start = self.clock.time()
+        records = burst.run(6)
+        self.assertEqual([1, 2] * 3, records["channel"].tolist())
+        self.assertEqual([0x123456, 0x654321] * 3, records["code"].tolist())
+        settle = ad7124timing.settling_time(
+            ad7124timing.SINC4, 384, 2, sequencer=True
+        )
+        self.assertGreaterEqual(self.clock.time() - start, 6 * settle)
+        self.assertEqual(4, self._mode())
+
+    def test_continuous_read(self):
+        """ A burst cannot be armed in continuous read mode. """
+        self.ad7124.set_adc_control(cont_read=True)
+        with self.assertRaises(ValueError):
+            AD7124Burst(self.ad7124).arm()
+
+
+class TestRunBursts(unittest.TestCase):
+    """ Bursts from two in-memory AD7124s. """
+
+    def test_both_boards(self):
+        """ Each board is armed, triggered once and read. """
+        drivers = []
+        for position in (1, 2):
+            transport = MemoryTransport(position)
+            transport.set_code(0, 0x100000 * position)
+            driver = AD7124Driver(position, transport)
+            driver.set_channel(0, True, 0, 0, 1)
+            driver.set_adc_control(data_status=True)
+            drivers.append(driver)
+        bursts = [AD7124Burst(driver) for driver in drivers]
+        results = run_bursts(bursts, 10)
+        for (index, records) in enumerate(results):
+            self.assertEqual(
+                [0x100000 * (index + 1)] * 10, records["code"].tolist()
+            )
+            self.assertEqual(1, drivers[index]._spi.transport.sync_edges)
+
+
+class TestSetSyncMany(unittest.TestCase):
+    """ Drives the SYNC pins of both positions. """
+
+    def test_one_write(self):
+        """ Both SYNC GPIOs are changed by one bank write. """
+        with mock.patch("pigpio.pi"):
+            transports = [
+                ad7124pigpio.PigpioTransport(position) for position in (1, 2)
+            ]
+            pi = transports[0].pi
+            ad7124pigpio.set_sync_many(transports, False)
+            pi.clear_bank_1.assert_called_once_with((1 << 5) | (1 << 19))
+            ad7124pigpio.set_sync_many(transports, True)
+            pi.set_bank_1.assert_called_once_with((1 << 5) | (1 << 19))
+            for transport in transports:
+                transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
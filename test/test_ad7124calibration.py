@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+""" Unit tests for the calibration and the calibration cache.
+The in-memory AD7124 completes calibrations instantly so these tests do
+not need any hardware.
+"""
+import os
+import tempfile
+import unittest
+
+from ad7124.ad7124calibration import AD7124CalibrationCache, AD7124Calibrator
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124emulator import AD7124Emulator, SimulatedClock
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class PowerModeTransport(MemoryTransport):
+    """ Records the power mode of each calibration. """
+
+    def __init__(self):
+        #: A list of (mode, power mode).
+        self.power_modes = []
+        super().__init__()
+
+    def _calibrate(self, mode):
+        adc_control = self._values[AD7124RegNames.ADC_CTRL_REG.value]
+        self.power_modes.append((mode, (adc_control >> 6) & 0x03))
+        super()._calibrate(mode)
+
+
+class TestAD7124Calibrator(unittest.TestCase):
+    """ Calibrates the in-memory AD7124. """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "cal.json")
+        self.transport = PowerModeTransport()
+        self.transport.calibration_offset = 0x800123
+        self.transport.calibration_gain = 0x512345
+        self.ad7124 = AD7124Driver(1, self.transport)
+        # Setup 0 gain 1, setup 1 gain 8.
+        self.ad7124.set_setup_config(0, bipolar=True, pga=0)
+        self.ad7124.set_setup_config(1, bipolar=True, pga=3)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.ad7124.set_channel(2, True, 1, 4, 5)
+        self.ad7124.set_adc_control(data_status=True, power_mode=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def calibrator(self):
+        cache = AD7124CalibrationCache(self.filename)
+        return AD7124Calibrator(self.ad7124, cache)
+
+    def test_calibrate(self):
+        """ Gain 1 only has a zero-scale calibration. """
+        calibrator = self.calibrator()
+        self.assertEqual("position1-id14", calibrator.board)
+        self.assertEqual([0, 1], calibrator.used_setups())
+        before = self.transport.register(AD7124RegNames.ADC_CTRL_REG)
+        results = calibrator.calibrate(temperature=25.0)
+        self.assertEqual((0x800123, 0x500000), results[0])
+        self.assertEqual((0x800123, 0x512345), results[1])
+        self.assertEqual(3, self.transport.calibrations)
+        # The cached values are correct.
+        self.assertEqual(
+            0x512345, self.ad7124.cached_register(AD7124RegNames.GAIN1_REG)
+        )
+        # The channels are restored.
+        for (register_enum, value) in (
+            (AD7124RegNames.CH1_MAP_REG, 0x8043),
+            (AD7124RegNames.CH2_MAP_REG, 0x9085),
+        ):
+            self.assertEqual(value, self.transport.register(register_enum))
+        # The ADC control register is restored.
+        adc_control = self.transport.register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(0, (adc_control >> 2) & 0x0F)
+        self.assertEqual(2, self.ad7124.power_mode)
+        self.assertEqual(before, adc_control)
+
+    def test_full_scale_power_mode(self):
+        """ The internal full-scale calibration is made in mid power. """
+        self.calibrator().calibrate()
+        self.assertEqual(
+            [(5, 2), (6, 1), (5, 2)], self.transport.power_modes
+        )
+
+    def test_load(self):
+        """ Stored values are used at a similar temperature. """
+        self.calibrator().calibrate(temperature=25.0)
+        self.ad7124.reset()
+        self.ad7124.set_setup_config(0, bipolar=True, pga=0)
+        self.ad7124.set_setup_config(1, bipolar=True, pga=3)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.ad7124.set_channel(2, True, 1, 4, 5)
+        self.ad7124.set_adc_control(data_status=True, power_mode=2)
+        calibrator = self.calibrator()
+        self.assertEqual([0, 1], calibrator.load(temperature=40.0))
+        self.assertEqual([], calibrator.load_or_calibrate(temperature=27.0))
+        self.assertEqual(3, self.transport.calibrations)
+        self.assertEqual(
+            0x512345, self.transport.register(AD7124RegNames.GAIN1_REG)
+        )
+        self.assertEqual(
+            0x800123, self.transport.register(AD7124RegNames.OFFS0_REG)
+        )
+
+    def test_config_changed(self):
+        """ A changed setup is calibrated again. """
+        calibrator = self.calibrator()
+        calibrator.calibrate(temperature=25.0)
+        self.ad7124.set_setup_config(1, bipolar=True, pga=4)
+        self.assertEqual([1], calibrator.load_or_calibrate(temperature=25.0))
+        self.assertEqual(5, self.transport.calibrations)
+
+
+class TestCalibrateEmulator(unittest.TestCase):
+    """ Calibrates the emulator, which converts in real time. """
+
+    def test_read_after_calibrate(self):
+        """ Conversions continue after calibrating. """
+        clock = SimulatedClock()
+        emulator = AD7124Emulator(clock=clock, seed=1)
+        ad7124 = AD7124Driver(1, emulator)
+        ad7124.set_setup_config(0, bipolar=True, pga=3)
+        ad7124.set_setup_filter(0, filter_type=0, output_data_rate=384)
+        ad7124.set_channel(1, True, 0, 2, 3)
+        emulator.set_code(1, 0x123456)
+        ad7124.set_adc_control(data_status=True, power_mode=2)
+        self.assertEqual((1, 0x123456), ad7124.read_data_wait())
+        AD7124Calibrator(ad7124).calibrate()
+        self.assertEqual(2, emulator.calibrations)
+        self.assertEqual((1, 0x123456), ad7124.read_data_wait())
+
+
+class TestAD7124CalibrationCache(unittest.TestCase):
+    """ Tests the JSON file. """
+
+    def test_store_find(self):
+        """ The closest temperature is found and the file is reloaded. """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "cal.json")
+            cache = AD7124CalibrationCache(filename)
+            cache.store("a", 0, 0x0860, 2, 20.0, 0x800001, 0x500001)
+            cache.store("a", 0, 0x0860, 2, 30.0, 0x800002, 0x500002)
+            cache.store("a", 0, 0x0860, 2, 30.0, 0x800003, 0x500003)
+            cache = AD7124CalibrationCache(filename)
+            self.assertEqual(2, len(cache.entries))
+            self.assertEqual(
+                0x800003, cache.find("a", 0, 0x0860, 2, 28.0)["offset"]
+            )
+            self.assertEqual(
+                0x800001, cache.find("a", 0, 0x0860, 2, 24.0)["offset"]
+            )
+            self.assertIsNone(cache.find("a", 0, 0x0860, 2, 40.0))
+            self.assertIsNone(cache.find("b", 0, 0x0860, 2, 20.0))
+            self.assertIsNone(cache.find("a", 0, 0x0860, 2))
+
+    def test_not_calibration(self):
+        """ Other JSON files are rejected. """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "other.json")
+            with open(filename, "w") as other_file:
+                other_file.write("[1, 2]\n")
+            with self.assertRaises(ValueError):
+                AD7124CalibrationCache(filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
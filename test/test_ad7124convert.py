@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Unit tests for the vectorised conversion functions.
+These tests do not need any hardware.
+"""
+import unittest
+
+import numpy as np
+
+from ad7124 import ad7124convert
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+
+
+class TestAD7124Convert(unittest.TestCase):
+    """ Tests the conversion of arrays of values. """
+
+    def setUp(self):
+        """ The scalar functions are used to check the results. """
+        self.ad7124 = AD7124Driver(1, MemoryTransport())
+
+    def test_unpack_codes(self):
+        """ Packed 24 bit values are unpacked.  Partial values are ignored.
+        """
+        buffer = b"\x12\x34\x56\xff\xff\xff\x00\x00"
+        codes = ad7124convert.unpack_codes(buffer)
+        self.assertEqual([0x123456, 0xFFFFFF], codes.tolist())
+        buffer = b"\x12\x34\x56\x01\x80\x00\x00\x02"
+        (codes, status) = ad7124convert.unpack_codes(buffer, True)
+        self.assertEqual([0x123456, 0x800000], codes.tolist())
+        self.assertEqual([0x01, 0x02], status.tolist())
+
+    def test_to_voltage(self):
+        """ Same test values as the scalar function. """
+        codes = np.array([0, 0x800000, 0xFFFFFF])
+        result = ad7124convert.to_voltage(codes, 1, 2.5, False, 1.0)
+        np.testing.assert_allclose([0.0, 1.25, 2.5], result, atol=1e-5)
+        result = ad7124convert.to_voltage(codes, 1, 1.25, True, 1.0)
+        np.testing.assert_allclose([-1.25, 0.0, 1.25], result, atol=1e-5)
+        result = ad7124convert.to_voltage(codes, 16, 1.25, True, 10.0)
+        expected = [-12.5 / 16, 0.0, 12.5 / 16]
+        np.testing.assert_allclose(expected, result, atol=1e-5)
+
+    def test_matches_scalar(self):
+        """ The array and scalar functions give the same results. """
+        codes = np.random.default_rng(1).integers(0, 0x1000000, 1000)
+        for bipolar in (False, True):
+            result = self.ad7124.to_voltage_array(codes, 2, 2.5, bipolar, 3.0)
+            expected = [
+                self.ad7124.to_voltage(int(code), 2, 2.5, bipolar, 3.0)
+                for code in codes
+            ]
+            np.testing.assert_allclose(expected, result)
+        result = self.ad7124.to_temperature_array(codes)
+        expected = [self.ad7124.to_temperature(int(code)) for code in codes]
+        np.testing.assert_allclose(expected, result)
+
+    def test_per_channel(self):
+        """ Parameters can be given for each channel. """
+        buffer = b"\x00\x00\x00\xff\xff\xff\xff\xff\xff"
+        channels = [1, 2, 1]
+        # Channel 1 is unipolar, channel 2 is bipolar and scaled by 4.
+        bipolar = [False, False, True]
+        scale = [1.0, 1.0, 4.0]
+        result = ad7124convert.to_voltage(
+            buffer, 1, 2.5, bipolar, scale, channels=channels
+        )
+        np.testing.assert_allclose([0.0, 10.0, 2.5], result, atol=1e-5)
+        result = ad7124convert.to_voltage(
+            buffer, 1, 2.5, [True, True, False], 1.0
+        )
+        np.testing.assert_allclose([-2.5, 2.5, 2.5], result, atol=1e-5)
+
+    def test_to_temperature(self):
+        """ Half scale is -272.5C. """
+        result = ad7124convert.to_temperature(b"\x80\x00\x00")
+        np.testing.assert_allclose([-272.5], result)
+
+
+if __name__ == "__main__":
+    unittest.main()
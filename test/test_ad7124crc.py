@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+""" Unit tests for the CRC protected transfers.
+The in-memory AD7124 is used so these tests do not need any hardware.
+"""
+import unittest
+
+from ad7124.ad7124crc import CRC8_TABLE, append_crc, check_crc, crc8
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+
+
+def bitwise_crc8(data):
+    """ The bit at a time version from the C driver. """
+    crc = 0
+    for byte_value in data:
+        for bit in range(7, -1, -1):
+            if ((crc & 0x80) != 0) != ((byte_value >> bit) & 1 != 0):
+                crc = ((crc << 1) ^ 0x07) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+    return crc
+
+
+class NoisyTransport(MemoryTransport):
+    """ Corrupts the next transfers. """
+
+    def __init__(self):
+        #: Number of transfers to corrupt the data read by.
+        self.corrupt_reads = 0
+        #: Number of transfers to corrupt the data sent by.
+        self.corrupt_writes = 0
+        super().__init__()
+
+    def xfer(self, to_send):
+        to_send = bytearray(to_send)
+        if self.corrupt_writes and len(to_send) > 2:
+            self.corrupt_writes -= 1
+            to_send[1] ^= 0x01
+        (count, result) = super().xfer(to_send)
+        if self.corrupt_reads:
+            self.corrupt_reads -= 1
+            result = bytearray(result)
+            result[-2] ^= 0x10
+        return (count, result)
+
+
+class TestCRC8(unittest.TestCase):
+    """ Tests the checksum functions. """
+
+    def test_table(self):
+        """ The table gives the same results as the C driver. """
+        self.assertEqual(256, len(CRC8_TABLE))
+        for data in (b"\x00", b"\x42\x12\x34\x56", bytes(range(40, 48))):
+            self.assertEqual(bitwise_crc8(data), crc8(data))
+        self.assertEqual(0xCB, crc8(b"\x42\x12\x34\x56"))
+
+    def test_check(self):
+        """ A frame with its checksum appended checks correctly. """
+        frame = append_crc(b"\x42\x12\x34\x56")
+        self.assertTrue(check_crc(0x42, frame[1:]))
+        self.assertFalse(check_crc(0x42, b"\x12\x34\x57" + frame[-1:]))
+
+
+class TestDriverCRC(unittest.TestCase):
+    """ Tests the driver with checksums enabled. """
+
+    def setUp(self):
+        self.transport = NoisyTransport()
+        self.transport.set_code(1, 0x123456)
+        self.ad7124 = AD7124Driver(1, self.transport)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.ad7124.set_adc_control(data_status=True)
+        self.ad7124.enable_crc()
+        self.metrics = self.ad7124.enable_metrics()
+
+    def test_enable(self):
+        """ The error enable bit is set and registers can be read. """
+        self.assertTrue(self.ad7124.crc)
+        erren = self.transport.register(AD7124RegNames.ERREN_REG)
+        self.assertTrue(erren & 0x04)
+        self.assertEqual(0x14, self.ad7124.read_id())
+        self.assertEqual((1, 0x123456), self.ad7124.read_data_wait())
+        self.ad7124.disable_crc()
+        self.assertFalse(self.ad7124.crc)
+        self.assertEqual(0x14, self.ad7124.read_id())
+        self.assertEqual(0, self.metrics.crc_errors)
+
+    def test_reset(self):
+        """ The reset disables checksums. """
+        self.ad7124.reset()
+        self.assertFalse(self.ad7124.crc)
+        self.assertEqual(0x14, self.ad7124.read_id())
+
+    def test_read_retry(self):
+        """ A read with a bad checksum is sent again. """
+        self.transport.corrupt_reads = 2
+        self.assertEqual(0x14, self.ad7124.read_id())
+        self.assertEqual(2, self.metrics.crc_errors)
+
+    def test_read_fails(self):
+        """ The read gives up after crc_retries attempts. """
+        self.transport.corrupt_reads = 10
+        with self.assertRaises(OSError):
+            self.ad7124.read_id()
+
+    def test_write_retry(self):
+        """ A write that was ignored is sent again. """
+        self.transport.corrupt_writes = 1
+        self.ad7124.set_channel(2, True, 1, 4, 5)
+        self.assertEqual(
+            0x9085, self.transport.register(AD7124RegNames.CH2_MAP_REG)
+        )
+        self.assertEqual(0, self.transport.register(AD7124RegNames.ERR_REG))
+
+    def test_batch_retry(self):
+        """ Only the register that was not written is written again. """
+        with self.ad7124.batch():
+            self.ad7124.set_channel(2, True, 1, 4, 5)
+            self.ad7124.set_channel(3, True, 1, 6, 7)
+            # The frames are joined into one transfer so the first frame
+            # is the one corrupted.
+            self.transport.corrupt_writes = 1
+        self.assertEqual(
+            0x9085, self.transport.register(AD7124RegNames.CH2_MAP_REG)
+        )
+        self.assertEqual(
+            0x90C7, self.transport.register(AD7124RegNames.CH3_MAP_REG)
+        )
+
+    def test_start_continuous_read(self):
+        """ The write that starts continuous read mode is not followed by a
+        read of the error register.  The in-memory AD7124 streams
+        conversions from the end of that write, as the real one does.
+        """
+        self.ad7124.start_continuous_read()
+        self.assertEqual((1, 0x123456), self.ad7124.read_continuous())
+        self.ad7124.stop_continuous_read()
+        self.ad7124.set_adc_control(cont_read=True, data_status=True)
+        self.assertEqual((1, 0x123456), self.ad7124.read_continuous())
+        self.ad7124.stop_continuous_read()
+        self.assertEqual(0, self.metrics.crc_errors)
+
+    def test_continuous_read(self):
+        """ Conversions with a bad checksum are dropped. """
+        self.ad7124.start_continuous_read()
+        self.assertEqual((1, 0x123456), self.ad7124.read_continuous())
+        self.transport.corrupt_reads = 1
+        self.assertEqual((1, 0x123456), self.ad7124.read_continuous())
+        self.assertEqual(1, self.metrics.crc_errors)
+        conversions = self.ad7124.read_continuous_many(5)
+        self.assertEqual([(1, 0x123456)] * 5, conversions)
+        self.ad7124.stop_continuous_read()
+        self.assertEqual(0x14, self.ad7124.read_id())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@
 import time
 import unittest
 from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
 from ad7124.ad7124registers import AD7124RegNames
 
 
@@ -410,5 +411,290 @@ class TestAD7214Driver(unittest.TestCase):
         self.assertAlmostEqual(expected, value, 5)
 
 
+class TestAD7124DriverContinuousRead(unittest.TestCase):
+    """ Tests continuous read mode using the in-memory transport. """
+
+    def setUp(self):
+        """ Enable channels 1 and 2 with different values. """
+        self._transport = MemoryTransport()
+        self.ad7124 = AD7124Driver(1, self._transport)
+        self._transport.set_code(1, 0x111111)
+        self._transport.set_code(2, 0x222222)
+        self.ad7124.set_channel(1, enable=True, setup=0, ainp=2, ainm=3)
+        self.ad7124.set_channel(2, enable=True, setup=0, ainp=4, ainm=5)
+        self.ad7124.set_adc_control(ref_en=True, power_mode=2)
+
+    def test_read_continuous(self):
+        """ Conversions are read without command bytes and are tagged with
+        the channel number from the status byte.
+        """
+        self.ad7124.start_continuous_read()
+        value = self._transport.register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(0x0D80, value)
+        samples = [self.ad7124.read_continuous() for _ in range(4)]
+        expected = [(1, 0x111111), (2, 0x222222)] * 2
+        self.assertEqual(expected, samples)
+
+    def test_read_continuous_no_status(self):
+        """ Without the status byte, the channel is unknown. """
+        self.ad7124.start_continuous_read(data_status=False)
+        self.assertEqual((-1, 0x111111), self.ad7124.read_continuous())
+
+    def test_read_continuous_many(self):
+        """ Several conversions are read in one call. """
+        self.ad7124.start_continuous_read()
+        samples = self.ad7124.read_continuous_many(3)
+        expected = [(1, 0x111111), (2, 0x222222), (1, 0x111111)]
+        self.assertEqual(expected, samples)
+        self.ad7124.stop_continuous_read()
+        self.ad7124.start_continuous_read(data_status=False)
+        with self.assertRaises(ValueError):
+            self.ad7124.read_continuous_many(3)
+
+    def test_stop_continuous_read(self):
+        """ Registers can be read again after the exit sequence. """
+        self.ad7124.start_continuous_read()
+        self.ad7124.read_continuous()
+        self.ad7124.stop_continuous_read()
+        value = self.ad7124.read_register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(0x0580, value)
+        self.assertEqual(0x14, self.ad7124.read_id())
+
+
+class CountingTransport(MemoryTransport):
+    """ Counts the number of SPI transfers. """
+
+    def __init__(self):
+        super().__init__()
+        self.transfers = 0
+
+    def xfer(self, to_send):
+        self.transfers += 1
+        return super().xfer(to_send)
+
+
+class TestAD7124DriverDataStatus(unittest.TestCase):
+    """ Tests reading data and status together using the in-memory
+    transport.
+    """
+
+    def setUp(self):
+        """ Enable channels 1 and 2 with different values. """
+        self._transport = CountingTransport()
+        self.ad7124 = AD7124Driver(1, self._transport)
+        self._transport.set_code(1, 0x111111)
+        self._transport.set_code(2, 0x222222)
+        self.ad7124.set_channel(1, enable=True, setup=0, ainp=2, ainm=3)
+        self.ad7124.set_channel(2, enable=True, setup=0, ainp=4, ainm=5)
+
+    def test_read_status_channel(self):
+        """ The active channel is taken from the status register. """
+        (_, _, _, active_channel) = self.ad7124.read_status()
+        self.assertEqual(1, active_channel)
+
+    def test_read_data_wait(self):
+        """ Each sample is one transfer and is tagged with its channel. """
+        self.ad7124.set_adc_control(data_status=True, power_mode=2)
+        self._transport.transfers = 0
+        samples = [self.ad7124.read_data_wait() for _ in range(4)]
+        expected = [(1, 0x111111), (2, 0x222222)] * 2
+        self.assertEqual(expected, samples)
+        self.assertEqual(4, self._transport.transfers)
+
+
+class TestAD7124DriverReadyEdge(unittest.TestCase):
+    """ Tests waiting for the DOUT/RDY edge using the in-memory transport.
+    """
+
+    def test_read_data_wait(self):
+        """ The status register is not polled before the edge. """
+        transport = CountingTransport()
+        transport.ready_edge = True
+        ad7124 = AD7124Driver(1, transport)
+        transport.set_code(1, 0x111111)
+        ad7124.set_channel(1, enable=True, setup=0, ainp=2, ainm=3)
+        ad7124.set_adc_control(data_status=True, power_mode=2)
+        transport.transfers = 0
+        self.assertEqual((1, 0x111111), ad7124.read_data_wait())
+        self.assertEqual(1, transport.transfers)
+
+    def test_no_edge(self):
+        """ A missing edge is reported as a timeout. """
+        transport = MemoryTransport(ready_edge=True)
+        transport.wait_ready = lambda timeout: False
+        ad7124 = AD7124Driver(1, transport)
+        self.assertEqual((-1, 0), ad7124.read_data_wait())
+
+
+class TestAD7124DriverShadow(unittest.TestCase):
+    """ Tests the shadow copy of the registers using the in-memory
+    transport.
+    """
+
+    def setUp(self):
+        """ Create the driver and reset the transfer count. """
+        self._transport = CountingTransport()
+        self.ad7124 = AD7124Driver(1, self._transport)
+        self._transport.transfers = 0
+
+    def test_cached_register(self):
+        """ Cacheable registers are read without any transfers. """
+        value = self.ad7124.cached_register(AD7124RegNames.CH0_MAP_REG)
+        self.assertEqual(0x0001, value)
+        value = self.ad7124.cached_register(AD7124RegNames.FILT3_REG)
+        self.assertEqual(0x060180, value)
+        self.assertEqual(0, self._transport.transfers)
+        # Status is not cacheable.
+        self.ad7124.cached_register(AD7124RegNames.STATUS_REG)
+        self.assertEqual(1, self._transport.transfers)
+
+    def test_unchanged_writes_skipped(self):
+        """ Writing the same configuration twice only writes once. """
+        self.ad7124.set_setup_config(1, bipolar=False, pga=3)
+        self.assertEqual(1, self._transport.transfers)
+        self.ad7124.set_setup_config(1, bipolar=False, pga=3)
+        self.assertEqual(1, self._transport.transfers)
+        # Power on values are not written again.
+        self.ad7124.set_setup_filter(2, post_filter=3)
+        self.assertEqual(1, self._transport.transfers)
+        # The ADC control register is always written.
+        self.ad7124.set_adc_control()
+        self.ad7124.set_adc_control()
+        self.assertEqual(3, self._transport.transfers)
+
+    def test_setup_registers(self):
+        """ Each setup function writes to its own register. """
+        self.ad7124.set_setup_filter(2, output_data_rate=0x200)
+        self.ad7124.set_setup_offset(3, 0x123456)
+        self.ad7124.set_setup_gain(4, 0x654321)
+        value = self._transport.register(AD7124RegNames.FILT2_REG)
+        self.assertEqual(0x0C0200, value)
+        value = self._transport.register(AD7124RegNames.OFFS3_REG)
+        self.assertEqual(0x123456, value)
+        value = self._transport.register(AD7124RegNames.GAIN4_REG)
+        self.assertEqual(0x654321, value)
+        value = self._transport.register(AD7124RegNames.CFG2_REG)
+        self.assertEqual(0x0860, value)
+
+    def test_update_register(self):
+        """ Single fields are changed using one write. """
+        self.ad7124.set_channel(5, enable=False, setup=2, ainp=4, ainm=5)
+        self._transport.transfers = 0
+        self.ad7124.enable_channel(5, True)
+        self.assertEqual(1, self._transport.transfers)
+        value = self._transport.register(AD7124RegNames.CH5_MAP_REG)
+        self.assertEqual(0xA085, value)
+        self.ad7124.enable_channel(5, True)
+        self.assertEqual(1, self._transport.transfers)
+
+    def test_reset(self):
+        """ The shadow copy is put back to the initial values by reset. """
+        self.ad7124.set_channel(5, enable=True, setup=2, ainp=4, ainm=5)
+        self.ad7124.reset()
+        value = self.ad7124.cached_register(AD7124RegNames.CH5_MAP_REG)
+        self.assertEqual(0x0001, value)
+
+    def test_sync_cache(self):
+        """ Changes made behind the driver's back are picked up. """
+        self._transport.write(b"\x0a\x80\x10")
+        self.ad7124.sync_cache()
+        value = self.ad7124.cached_register(AD7124RegNames.CH1_MAP_REG)
+        self.assertEqual(0x8010, value)
+
+
+class TestAD7124DriverBatch(unittest.TestCase):
+    """ Tests batched register access using the in-memory transport. """
+
+    def setUp(self):
+        """ Create the driver and reset the transfer count. """
+        self._transport = CountingTransport()
+        self.ad7124 = AD7124Driver(1, self._transport)
+        self._transport.transfers = 0
+
+    def test_full_configuration(self):
+        """ All 16 channels and 8 setups are configured in one transfer. """
+        with self.ad7124.batch() as batch:
+            for setup in range(8):
+                self.ad7124.set_setup_config(setup, bipolar=False, pga=setup)
+                self.ad7124.set_setup_filter(setup, output_data_rate=setup + 1)
+            for channel in range(16):
+                self.ad7124.set_channel(
+                    channel, enable=True, setup=channel % 8, ainp=1, ainm=0
+                )
+            self.ad7124.set_adc_control(data_status=True, power_mode=2)
+            self.assertEqual(33, len(batch))
+            self.assertEqual(0, self._transport.transfers)
+        self.assertEqual(1, self._transport.transfers)
+        value = self._transport.register(AD7124RegNames.CH15_MAP_REG)
+        self.assertEqual(0xF020, value)
+        value = self._transport.register(AD7124RegNames.FILT7_REG)
+        self.assertEqual(0x0C0008, value)
+        value = self._transport.register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(0x0480, value)
+
+    def test_reads(self):
+        """ Values read are returned for each register. """
+        with self.ad7124.batch() as batch:
+            self.ad7124.set_channel(1, enable=True, setup=1, ainp=2, ainm=3)
+            batch.read_register(AD7124RegNames.ID_REG)
+            batch.read_register(AD7124RegNames.CH1_MAP_REG)
+            batch.read_register(AD7124RegNames.FILT0_REG)
+        self.assertEqual(1, self._transport.transfers)
+        self.assertEqual(0x14, batch.results[AD7124RegNames.ID_REG])
+        self.assertEqual(0x9043, batch.results[AD7124RegNames.CH1_MAP_REG])
+        self.assertEqual(0x060180, batch.results[AD7124RegNames.FILT0_REG])
+
+    def test_read_flushes(self):
+        """ A normal read in a batch sends the queued writes first. """
+        with self.ad7124.batch():
+            self.ad7124.set_channel(1, enable=True, setup=1, ainp=2, ainm=3)
+            value = self.ad7124.read_register(AD7124RegNames.CH1_MAP_REG)
+        self.assertEqual(0x9043, value)
+        self.assertEqual(2, self._transport.transfers)
+
+    def test_max_transfer_size(self):
+        """ Large batches are split into several transfers. """
+        self._transport.MAX_TRANSFER_SIZE = 8
+        with self.ad7124.batch():
+            for channel in range(4):
+                self.ad7124.set_channel(
+                    channel, enable=True, setup=0, ainp=1, ainm=0
+                )
+        self.assertEqual(2, self._transport.transfers)
+        value = self._transport.register(AD7124RegNames.CH3_MAP_REG)
+        self.assertEqual(0x8020, value)
+
+    def test_nested(self):
+        """ The outer batch is still active after a nested batch ends. """
+        register_enum = AD7124RegNames.CH3_MAP_REG
+        with self.ad7124.batch():
+            self.ad7124.set_channel(1, True, 1, 2, 3)
+            with self.ad7124.batch() as inner:
+                self.ad7124.set_channel(2, True, 1, 4, 5)
+                inner.read_register(AD7124RegNames.CH1_MAP_REG)
+            self.assertEqual(0x9043, inner.results[AD7124RegNames.CH1_MAP_REG])
+            self.ad7124.set_channel(3, True, 1, 6, 7)
+            self.assertEqual(2, self._transport.transfers)
+            self.assertEqual(0x0001, self._transport.register(register_enum))
+        self.assertEqual(3, self._transport.transfers)
+        self.assertEqual(0x90C7, self._transport.register(register_enum))
+
+    def test_exception(self):
+        """ An exception drops the queued writes and their shadow values. """
+        register_enum = AD7124RegNames.CH1_MAP_REG
+        with self.assertRaises(RuntimeError):
+            with self.ad7124.batch() as batch:
+                self.ad7124.set_channel(1, True, 1, 2, 3)
+                self.ad7124.set_channel(1, True, 2, 4, 5)
+                raise RuntimeError("stop")
+        self.assertEqual(0, len(batch))
+        self.assertEqual(0, self._transport.transfers)
+        self.assertEqual(0x0001, self._transport.register(register_enum))
+        self.assertEqual(0x0001, self.ad7124.cached_register(register_enum))
+        # The same write is not skipped as unchanged.
+        self.ad7124.set_channel(1, True, 1, 2, 3)
+        self.assertEqual(0x9043, self._transport.register(register_enum))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+""" Unit tests for the AD7124 emulator.
+A simulated clock is used so the timing is exact.  These tests do not
+need any hardware.
+"""
+import unittest
+
+from ad7124 import ad7124timing
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124emulator import AD7124Emulator, SimulatedClock, sine_wave
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class TestAD7124Emulator(unittest.TestCase):
+    """ Tests the emulator through the driver. """
+
+    def setUp(self):
+        self.clock = SimulatedClock()
+        self.emulator = AD7124Emulator(clock=self.clock, seed=1)
+        self.ad7124 = AD7124Driver(1, self.emulator)
+        # Sinc4, FS = 384, full power: 50 SPS.
+        self.ad7124.set_setup_filter(0, filter_type=0, output_data_rate=384)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.emulator.set_code(1, 0x123456)
+        self.ad7124.set_adc_control(data_status=True, power_mode=2)
+        self.start = self.clock.time()
+
+    def test_single_channel(self):
+        """ The first conversion takes the settling time, the rest are at
+        the output data rate.
+        """
+        settle = ad7124timing.settling_time(ad7124timing.SINC4, 384, 2)
+        self.assertEqual((1, 0x123456), self.ad7124.read_data_wait())
+        first = self.clock.time() - self.start
+        self.assertGreaterEqual(first, settle)
+        self.assertLess(first, settle + 1e-4)
+        self.ad7124.read_data_wait()
+        period = self.clock.time() - self.start - first
+        self.assertAlmostEqual(0.02, period, delta=1e-4)
+
+    def test_not_ready(self):
+        """ RDY stays high until a conversion completes and goes high
+        again when the data is read.
+        """
+        (ready, _, _, _) = self.ad7124.read_status()
+        self.assertFalse(ready)
+        self.clock.sleep(0.1)
+        (ready, _, _, channel) = self.ad7124.read_status()
+        self.assertTrue(ready)
+        self.assertEqual(1, channel)
+        self.ad7124.read_register(AD7124RegNames.DATA_REG)
+        (ready, _, _, _) = self.ad7124.read_status()
+        self.assertFalse(ready)
+
+    def test_sequencer(self):
+        """ Enabled channels are converted in turn, each one settling. """
+        self.ad7124.set_channel(2, True, 0, 4, 5)
+        self.emulator.set_code(2, 0x654321)
+        start = self.clock.time()
+        samples = [self.ad7124.read_data_wait() for _ in range(4)]
+        expected = [(1, 0x123456), (2, 0x654321)] * 2
+        self.assertEqual(expected, samples)
+        settle = ad7124timing.settling_time(
+            ad7124timing.SINC4, 384, 2, sequencer=True
+        )
+        self.assertAlmostEqual(4 * settle, self.clock.time() - start, 3)
+
+    def test_ready_edge(self):
+        """ wait_ready() sleeps until the next conversion. """
+        self.emulator.ready_edge = True
+        self.assertTrue(self.emulator.wait_ready(1.0))
+        self.ad7124.read_data_wait()
+        before = self.clock.time()
+        self.assertFalse(self.emulator.wait_ready(0.001))
+        self.assertAlmostEqual(0.001, self.clock.time() - before)
+        self.assertTrue(self.emulator.wait_ready(1.0))
+
+    def test_continuous_read(self):
+        """ Frames read before the next conversion have RDY set. """
+        self.ad7124.start_continuous_read()
+        samples = [self.ad7124.read_continuous() for _ in range(3)]
+        self.assertEqual([(1, 0x123456)] * 3, samples)
+        frames = self.ad7124.read_continuous_many(10)
+        self.assertLessEqual(len(frames), 1)
+        self.ad7124.stop_continuous_read()
+
+    def test_single_conversion(self):
+        """ Single conversion mode converts once and then goes idle. """
+        self.ad7124.set_adc_control(data_status=True, power_mode=2, mode=1)
+        self.assertEqual((1, 0x123456), self.ad7124.read_data_wait())
+        adc_control = self.ad7124.read_register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(AD7124Emulator.MODE_IDLE, (adc_control >> 2) & 0x0F)
+        self.clock.sleep(1.0)
+        (ready, _, _, _) = self.ad7124.read_status()
+        self.assertFalse(ready)
+
+    def test_input(self):
+        """ Input voltages are converted using the setup. """
+        self.ad7124.set_setup_config(0, bipolar=True)
+        self.emulator.set_input(1, 1.25)
+        (_, value) = self.ad7124.read_data_wait()
+        self.assertEqual(0xC00000, value)
+        self.ad7124.set_setup_config(0, bipolar=False, pga=1)
+        self.emulator.set_input(1, sine_wave(0.5, 1.0, 0.625), noise=1e-5)
+        (_, value) = self.ad7124.read_data_wait()
+        # The conversion completes after the settling time.
+        settle = ad7124timing.settling_time(ad7124timing.SINC4, 384, 2)
+        voltage = sine_wave(0.5, 1.0, 0.625)(settle)
+        expected = voltage * 2 / 2.5 * 0x1000000
+        self.assertAlmostEqual(expected, value, delta=0x400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+""" Unit tests for the in-memory transport.
+These tests do not need any hardware.
+"""
+import unittest
+
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+
+
+class TestAD7124Memory(unittest.TestCase):
+    """ Tests the MemoryTransport on its own and with the driver. """
+
+    PADDING_BYTE = 0xFF
+
+    def setUp(self):
+        """ Create a transport in its power on state. """
+        self._transport = MemoryTransport()
+
+    def test_bad_position(self):
+        """ Positions other than 1 and 2 are rejected. """
+        with self.assertRaises(ValueError):
+            MemoryTransport(3)
+
+    def test_read_id(self):
+        """ Read the ID register. Should return 0x14. """
+        (count, result) = self._transport.xfer(b"\x45\x00")
+        self.assertEqual(2, count)
+        self.assertEqual(self.PADDING_BYTE, result[0])
+        self.assertEqual(0x14, result[1])
+
+    def test_write_register(self):
+        """ Write the channel 1 register and read it back. """
+        (_, result) = self._transport.xfer(b"\x4a\x00\x00")
+        self.assertEqual(bytearray(b"\xff\x00\x01"), result)
+        self._transport.write(b"\x0a\x80\x10")
+        (_, result) = self._transport.xfer(b"\x4a\x00\x00")
+        self.assertEqual(bytearray(b"\xff\x80\x10"), result)
+
+    def test_read_only_register(self):
+        """ Writes to the ID register are ignored. """
+        self._transport.write(b"\x05\x55")
+        (_, result) = self._transport.xfer(b"\x45\x00")
+        self.assertEqual(0x14, result[1])
+
+    def test_reset(self):
+        """ 64 ones put the registers back to their power on values. """
+        self._transport.write(b"\x0a\x80\x10")
+        self._transport.write(b"\xff" * 8)
+        self.assertEqual(
+            0x0001, self._transport.register(AD7124RegNames.CH1_MAP_REG)
+        )
+
+    def test_commands_in_one_transfer(self):
+        """ Several commands can be sent in one transfer. """
+        to_send = b"\x0a\x80\x10\x4a\x00\x00\x45\x00"
+        (_, result) = self._transport.xfer(to_send)
+        expected = bytearray(b"\xff\xff\xff\xff\x80\x10\xff\x14")
+        self.assertEqual(expected, result)
+
+    def test_driver(self):
+        """ The driver works when using the memory transport. """
+        driver = AD7124Driver(1, MemoryTransport())
+        self.assertEqual(0x14, driver.read_id())
+        self.assertEqual(
+            0x0001, driver.read_register(AD7124RegNames.CH0_MAP_REG)
+        )
+        driver.set_channel(3, enable=True, setup=3, ainp=6, ainm=7)
+        value = driver.read_register(AD7124RegNames.CH3_MAP_REG)
+        self.assertEqual(0xB0C7, value)
+
+    def test_driver_read_data_wait(self):
+        """ read_data_wait returns the value set for the channel. """
+        transport = MemoryTransport()
+        driver = AD7124Driver(1, transport)
+        transport.set_code(2, 0x123456)
+        driver.set_channel(2, enable=True, setup=0, ainp=4, ainm=5)
+        (_, int_value) = driver.read_data_wait()
+        self.assertEqual(0x123456, int_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+""" Unit tests for the SPI and sample counters.
+These tests do not need any hardware.
+"""
+import unittest
+
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124metrics import AD7124Metrics, MeteredTransport
+
+
+class ErrorTransport(MemoryTransport):
+    """ Sets the ERROR_FLAG bit for the first few status reads. """
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = errors
+
+    def _status(self):
+        status = super()._status()
+        if self.errors > 0:
+            self.errors -= 1
+            status |= 0x40
+        return status
+
+
+class TestAD7124Metrics(unittest.TestCase):
+    """ Tests the counters using the in-memory transport. """
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.ad7124 = AD7124Driver(1, self.transport)
+        self.ad7124.set_channel(0, False, 0, 0, 0)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.transport.set_code(1, 0x111111)
+
+    def test_disabled(self):
+        """ The transport is only wrapped while metrics are enabled. """
+        self.assertIsNone(self.ad7124.metrics)
+        metrics = self.ad7124.enable_metrics()
+        self.assertIs(metrics, self.ad7124.metrics)
+        self.assertIsInstance(self.ad7124._spi.transport, MeteredTransport)
+        self.ad7124.disable_metrics()
+        self.assertIsNone(self.ad7124.metrics)
+        self.assertIs(self.transport, self.ad7124._spi.transport)
+
+    def test_read_data_wait(self):
+        """ Each sample with DATA_STATUS is one 5 byte transfer. """
+        self.ad7124.set_adc_control(data_status=True)
+        metrics = self.ad7124.enable_metrics()
+        for _ in range(4):
+            self.assertEqual((1, 0x111111), self.ad7124.read_data_wait())
+        snapshot = metrics.snapshot()
+        self.assertEqual(4, snapshot["transfers"])
+        self.assertEqual(20, snapshot["bytes"])
+        self.assertEqual(4, snapshot["samples"])
+        self.assertEqual(1.0, snapshot["polls_per_sample"])
+        self.assertGreater(snapshot["transport_ns"], 0)
+        self.assertGreater(snapshot["bytes_per_second"], 0)
+        metrics.reset()
+        self.assertIsNone(metrics.snapshot()["polls_per_sample"])
+
+    def test_read_continuous(self):
+        """ Continuous reads and batches of them are counted.  The batch
+        of frames is joined into one bus operation.
+        """
+        self.ad7124.start_continuous_read()
+        metrics = self.ad7124.enable_metrics()
+        self.ad7124.read_continuous()
+        self.ad7124.read_continuous_many(8)
+        snapshot = metrics.snapshot()
+        self.assertEqual(9, snapshot["samples"])
+        self.assertEqual(2, snapshot["transfers"])
+        self.assertEqual(9, snapshot["frames"])
+        self.assertEqual(36, snapshot["bytes"])
+        self.ad7124.stop_continuous_read()
+
+    def test_split_transfers(self):
+        """ Each bus operation of a split batch is counted. """
+        self.transport.MAX_TRANSFER_SIZE = 16
+        self.ad7124.start_continuous_read()
+        metrics = self.ad7124.enable_metrics()
+        self.assertEqual(8, len(self.ad7124.read_continuous_many(8)))
+        self.assertEqual(2, metrics.transfers)
+        self.assertEqual(8, metrics.frames)
+        self.ad7124.stop_continuous_read()
+
+    def test_read_continuous_no_status(self):
+        """ Without the status byte every frame is counted as a sample. """
+        self.ad7124.set_adc_control(cont_read=True)
+        metrics = self.ad7124.enable_metrics()
+        self.assertEqual((-1, 0x111111), self.ad7124.read_continuous())
+        self.assertEqual(1, metrics.samples)
+        self.assertEqual(1, metrics.polls)
+        self.assertEqual(0, metrics.timeouts)
+        self.ad7124.stop_continuous_read()
+
+    def test_errors(self):
+        """ Status reads with the error flag set are counted. """
+        transport = ErrorTransport(2)
+        ad7124 = AD7124Driver(1, transport)
+        ad7124.set_channel(0, True, 0, 0, 1)
+        ad7124.set_adc_control(data_status=True)
+        metrics = ad7124.enable_metrics(AD7124Metrics())
+        self.assertEqual(0, ad7124.read_data_wait()[0])
+        snapshot = metrics.snapshot()
+        self.assertEqual(2, snapshot["errors"])
+        self.assertEqual(3, snapshot["polls"])
+
+    def test_timeouts(self):
+        """ A missing DOUT/RDY edge is counted as a timeout. """
+        transport = MemoryTransport(ready_edge=True)
+        transport.wait_ready = lambda timeout: False
+        ad7124 = AD7124Driver(1, transport)
+        metrics = ad7124.enable_metrics()
+        self.assertEqual((-1, 0), ad7124.read_data_wait())
+        self.assertEqual(1, metrics.timeouts)
+        self.assertEqual(0, metrics.samples)
+
+
+if __name__ == "__main__":
+    unittest.main()
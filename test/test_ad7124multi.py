@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Unit tests for reading from two boards and sharing the pigpio
+connection.
+These tests do not need any hardware.
+"""
+import unittest
+from unittest import mock
+
+from ad7124 import ad7124pigpio
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124multi import AD7124MultiReader
+
+
+class TestAD7124MultiReader(unittest.TestCase):
+    """ Reads from two in-memory AD7124s. """
+
+    def setUp(self):
+        self.drivers = []
+        for position in (1, 2):
+            transport = MemoryTransport(position)
+            transport.set_code(0, 0x100000 * position)
+            driver = AD7124Driver(position, transport)
+            driver.set_adc_control(data_status=True)
+            self.drivers.append(driver)
+
+    def test_both_boards(self):
+        """ Records from each board are kept separate. """
+        reader = AD7124MultiReader(self.drivers, capacity=256)
+        reader.start()
+        counts = [0, 0]
+        try:
+            while min(counts) < 10:
+                batches = reader.drain(timeout=1.0)
+                for (index, records) in enumerate(batches):
+                    expected = [0x100000 * (index + 1)] * len(records)
+                    self.assertEqual(expected, records["code"].tolist())
+                    counts[index] += len(records)
+        finally:
+            reader.stop()
+        self.assertGreaterEqual(reader.samples, 20)
+        for acquisition in reader.acquisitions:
+            self.assertFalse(acquisition.running)
+
+
+class TestSharedConnection(unittest.TestCase):
+    """ Checks the reference counting of the pigpiod connection. """
+
+    def test_acquire_release(self):
+        """ The connection is opened once and closed by the last user. """
+        with mock.patch("pigpio.pi") as pi_class:
+            pi_1 = ad7124pigpio.acquire_pi()
+            pi_2 = ad7124pigpio.acquire_pi()
+            self.assertIs(pi_1, pi_2)
+            self.assertEqual(1, pi_class.call_count)
+            ad7124pigpio.release_pi(pi_1)
+            pi_1.stop.assert_not_called()
+            ad7124pigpio.release_pi(pi_2)
+            pi_1.stop.assert_called_once_with()
+            remote_pi = ad7124pigpio.acquire_pi("remote", 8889)
+            pi_class.assert_called_with(host="remote", port=8889)
+            ad7124pigpio.release_pi(remote_pi)
+
+    def test_transports(self):
+        """ Transports for both positions use the same connection. """
+        with mock.patch("pigpio.pi") as pi_class:
+            transport_1 = ad7124pigpio.PigpioTransport(1)
+            transport_2 = ad7124pigpio.PigpioTransport(2)
+            self.assertEqual(1, pi_class.call_count)
+            pi = pi_class.return_value
+            transport_1.close()
+            pi.stop.assert_not_called()
+            transport_2.close()
+            pi.stop.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+""" Unit tests for the filter stages.
+Each stage is checked against a simple sample at a time version.  The
+input is split into blocks of different sizes to check that the state is
+kept between blocks.  These tests do not need any hardware.
+"""
+import unittest
+
+import numpy as np
+
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+from ad7124.ad7124pipeline import (
+    FILTERED_DTYPE,
+    AD7124Average,
+    AD7124CIC,
+    AD7124Decimate,
+    AD7124ExponentialAverage,
+    AD7124Pipeline,
+)
+
+# Two interleaved channels.
+CHANNELS = (1, 3)
+
+
+def make_records(count, seed=1):
+    """ Returns count samples of each channel, interleaved. """
+    generator = np.random.RandomState(seed)
+    records = np.zeros(count * len(CHANNELS), dtype=SAMPLE_DTYPE)
+    records["timestamp"] = np.arange(len(records)) * 1000
+    records["channel"] = np.tile(CHANNELS, count)
+    records["code"] = generator.randint(0, 1 << 24, len(records))
+    return records
+
+
+def run_blocks(stage, records, sizes=(1, 7, 50, 3, 200)):
+    """ Processes records in blocks of the given sizes. """
+    outputs = []
+    start = 0
+    index = 0
+    while start < len(records):
+        end = start + sizes[index % len(sizes)]
+        outputs.append(stage.process(records[start:end]))
+        start = end
+        index += 1
+    return np.concatenate(outputs)
+
+
+class TestStages(unittest.TestCase):
+    """ Compares the stages with simple versions. """
+
+    def setUp(self):
+        self.records = make_records(1000)
+
+    def channel(self, records, channel):
+        return records[records["channel"] == channel]
+
+    def check(self, stage, expected_function):
+        result = run_blocks(stage, self.records)
+        self.assertEqual(FILTERED_DTYPE, result.dtype)
+        self.assertTrue(np.all(np.diff(result["timestamp"]) > 0))
+        for channel in CHANNELS:
+            inputs = self.channel(self.records, channel)
+            (timestamps, values) = expected_function(
+                inputs["timestamp"], inputs["code"].astype(float)
+            )
+            outputs = self.channel(result, channel)
+            np.testing.assert_array_equal(timestamps, outputs["timestamp"])
+            np.testing.assert_allclose(values, outputs["value"], rtol=1e-9)
+
+    def test_average(self):
+        """ The mean of each 10 samples. """
+
+        def expected(timestamps, values):
+            return (timestamps[9::10], values.reshape(-1, 10).mean(axis=1))
+
+        self.check(AD7124Average(10), expected)
+
+    def test_decimate(self):
+        """ Every 8th sample. """
+
+        def expected(timestamps, values):
+            return (timestamps[7::8], values[7::8])
+
+        self.check(AD7124Decimate(8), expected)
+
+    def test_exponential_average(self):
+        """ One output for each input. """
+        alpha = 0.05
+
+        def expected(timestamps, values):
+            outputs = []
+            last = values[0]
+            for value in values:
+                last = last + alpha * (value - last)
+                outputs.append(last)
+            return (timestamps, outputs)
+
+        stage = AD7124ExponentialAverage(alpha)
+        # Short chunks check the splitting of long blocks.
+        stage._chunk = 13
+        self.check(stage, expected)
+
+    def test_cic(self):
+        """ Equal to a moving sum applied order times then decimated. """
+        (n, order) = (8, 3)
+
+        def expected(timestamps, values):
+            for _ in range(order):
+                # Moving sum of n samples, starting from zeros.
+                values = np.convolve(values, np.ones(n))[: len(values)]
+            return (timestamps[n - 1 :: n], values[n - 1 :: n] / n ** order)
+
+        self.check(AD7124CIC(n, order), expected)
+
+    def test_constant(self):
+        """ A settled CIC gives the input value. """
+        records = make_records(100)
+        records["code"] = 0x800000
+        result = AD7124CIC(4).process(records)
+        np.testing.assert_array_equal(
+            [0x800000] * 20, result["value"][-20:]
+        )
+
+    def test_bad_arguments(self):
+        """ Values that would not work are rejected. """
+        for create in (
+            lambda: AD7124Average(0),
+            lambda: AD7124Decimate(0),
+            lambda: AD7124ExponentialAverage(0),
+            lambda: AD7124ExponentialAverage(1.5),
+            lambda: AD7124CIC(1 << 16, 3),
+        ):
+            with self.assertRaises(ValueError):
+                create()
+
+
+class TestAD7124Pipeline(unittest.TestCase):
+    """ Tests stages joined together. """
+
+    def test_reduce(self):
+        """ The stream is reduced by the product of the factors. """
+        records = make_records(1024)
+        pipeline = AD7124Pipeline([AD7124CIC(4), AD7124Average(8)])
+        result = run_blocks(pipeline, records)
+        self.assertEqual(len(records) // 32, len(result))
+        pipeline.reset()
+        again = pipeline.process(records)
+        np.testing.assert_allclose(result["value"], again["value"])
+
+    def test_empty(self):
+        """ An empty block gives an empty result. """
+        pipeline = AD7124Pipeline([AD7124Average(2)])
+        result = pipeline.process(np.zeros(0, dtype=SAMPLE_DTYPE))
+        self.assertEqual(0, len(result))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+""" Unit tests for the scan planner.
+These tests do not need any hardware.
+"""
+import unittest
+
+from ad7124 import ad7124timing
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124emulator import AD7124Emulator, SimulatedClock
+from ad7124.ad7124planner import choose_filter, plan_driver, plan_scan
+
+
+class TestAD7124Planner(unittest.TestCase):
+    """ Tests the planned rates. """
+
+    def test_single_channel(self):
+        """ One channel converts at the output data rate. """
+        plan = plan_scan(1, 2, fs=384)
+        self.assertAlmostEqual(50.0, plan.channel_rate)
+        self.assertAlmostEqual(50.0, plan.total_rate)
+        settle = ad7124timing.settling_time(ad7124timing.SINC4, 384, 2)
+        self.assertAlmostEqual(settle, plan.settling_time[0])
+
+    def test_sequencer(self):
+        """ Each channel switch waits for the filter to settle. """
+        plan = plan_scan([1, 2, 5], 2, ad7124timing.SINC3, fs=10)
+        settle = (3 * 32 * 10 + 30) / 614400
+        self.assertAlmostEqual(1 / (3 * settle), plan.channel_rate)
+        self.assertAlmostEqual(1 / settle, plan.total_rate)
+        self.assertAlmostEqual(2 * settle, plan.settling_time[2])
+        with self.assertRaises(ValueError):
+            plan_scan(0, 2)
+        with self.assertRaises(ValueError):
+            plan_scan(1, 2, fs=0)
+
+    def test_choose_filter(self):
+        """ The most filtering that meets the target is chosen. """
+        plan = choose_filter(50.0)
+        self.assertEqual(384, plan.filter_settings()["output_data_rate"])
+        plan = choose_filter(1000.0, channels=2)
+        self.assertGreaterEqual(plan.channel_rate, 1000.0)
+        settings = plan.filter_settings()
+        slower = plan_scan(
+            2, 2, settings["filter_type"], settings["output_data_rate"] + 1
+        )
+        self.assertLess(slower.channel_rate, 1000.0)
+        plan = choose_filter(20.0, filter_types=(ad7124timing.POST_FILTER,))
+        self.assertEqual(5, plan.filter_settings()["post_filter"])
+        with self.assertRaises(ValueError):
+            choose_filter(20000.0)
+
+    def test_plan_driver(self):
+        """ The plan of the driver matches the emulated rate. """
+        clock = SimulatedClock()
+        emulator = AD7124Emulator(clock=clock)
+        ad7124 = AD7124Driver(1, emulator)
+        plan = choose_filter(200.0, channels=[1, 2])
+        ad7124.set_setup_filter(0, **plan.filter_settings())
+        ad7124.set_channel(1, True, 0, 2, 3)
+        ad7124.set_channel(2, True, 0, 4, 5)
+        ad7124.set_adc_control(data_status=True, power_mode=2)
+        driver_plan = plan_driver(ad7124)
+        self.assertEqual([1, 2], driver_plan.channels)
+        self.assertAlmostEqual(plan.total_rate, driver_plan.total_rate)
+        start = clock.time()
+        for _ in range(20):
+            ad7124.read_data_wait()
+        rate = 20 / (clock.time() - start)
+        self.assertAlmostEqual(plan.total_rate, rate, delta=rate * 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+""" Unit tests for the binary recording format.
+These tests do not need any hardware.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+from ad7124.ad7124recording import (
+    RECORD_DTYPE,
+    AD7124Recording,
+    AD7124RecordingWriter,
+)
+
+
+class TestAD7124Recording(unittest.TestCase):
+    """ Writes recordings to a temporary directory and reads them back. """
+
+    HEADER = {
+        "channels": [
+            {
+                "channel": 1,
+                "gain": 1.0,
+                "vref": 2.5,
+                "bipolar": True,
+                "scale": 3.0,
+            },
+            {
+                "channel": 2,
+                "gain": 1.0,
+                "vref": 2.5,
+                "bipolar": False,
+                "scale": 4.0,
+            },
+        ]
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "test.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _records(self):
+        records = np.zeros(4, dtype=SAMPLE_DTYPE)
+        records["timestamp"] = [10, 20, 30, 40]
+        records["channel"] = [1, 2, 1, 2]
+        records["code"] = [0, 0x800000, 0xFFFFFE, 0x123456]
+        return records
+
+    def test_round_trip(self):
+        """ The header and all fields are read back. """
+        with AD7124RecordingWriter(
+            self.filename, self.HEADER, block_size=3
+        ) as writer:
+            writer.write_records(self._records()[:2])
+            writer.write_records(self._records()[2:])
+            writer.write(50, 1, 0xABCDEF)
+        self.assertEqual(5, writer.count)
+        recording = AD7124Recording(self.filename)
+        self.assertEqual(self.HEADER, recording.header)
+        self.assertEqual(5, len(recording))
+        self.assertEqual([10, 20, 30, 40, 50], recording.timestamps.tolist())
+        self.assertEqual([1, 2, 1, 2, 1], recording.channels.tolist())
+        expected = [0, 0x800000, 0xFFFFFE, 0x123456, 0xABCDEF]
+        self.assertEqual(expected, recording.codes.tolist())
+
+    def test_size(self):
+        """ Each sample takes 12 bytes. """
+        with AD7124RecordingWriter(self.filename, {}) as writer:
+            writer.write_records(self._records())
+        size = os.path.getsize(self.filename)
+        with AD7124RecordingWriter(self.filename, {}) as writer:
+            pass
+        empty_size = os.path.getsize(self.filename)
+        self.assertEqual(12, RECORD_DTYPE.itemsize)
+        self.assertEqual(4 * 12, size - empty_size)
+        self.assertEqual(0, len(AD7124Recording(self.filename)))
+
+    def test_voltages(self):
+        """ Each channel is converted using its header settings. """
+        with AD7124RecordingWriter(self.filename, self.HEADER) as writer:
+            writer.write_records(self._records())
+        voltages = AD7124Recording(self.filename).voltages()
+        np.testing.assert_allclose(
+            [-7.5, 5.0, 7.5, 10.0 * 0x123456 / 0xFFFFFF],
+            voltages,
+            atol=1e-5,
+        )
+
+    def test_partial_record(self):
+        """ A partial record at the end of the file is ignored. """
+        with AD7124RecordingWriter(self.filename, {}) as writer:
+            writer.write_records(self._records())
+        with open(self.filename, "ab") as recording_file:
+            recording_file.write(b"\x01\x02\x03")
+        self.assertEqual(4, len(AD7124Recording(self.filename)))
+
+    def test_not_recording(self):
+        """ Other files are rejected. """
+        with open(self.filename, "w") as text_file:
+            text_file.write("Channel,Voltage\n")
+        with self.assertRaises(ValueError):
+            AD7124Recording(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+""" Unit tests for the pigpio script acquisition.
+The script is run by a small interpreter that bit bangs an in-memory
+AD7124.  These tests do not need any hardware.
+"""
+import unittest
+
+import numpy as np
+import pigpio
+
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124planner import plan_driver
+from ad7124.ad7124registers import AD7124RegNames
+from ad7124.ad7124script import AD7124ScriptReader, build_script
+
+
+class FakePi:
+    """ The pigpio calls used by AD7124ScriptReader.
+    Scripts are run by `execute()` using the bit level AD7124 model.
+    """
+
+    SCLK = AD7124ScriptReader.SCLK_GPIO
+    MISO = AD7124ScriptReader.MISO_GPIO
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.modes = {8: pigpio.ALT0, 9: pigpio.ALT0, 10: pigpio.ALT0}
+        self.modes[11] = pigpio.ALT0
+        self.levels = {}
+        self.script = None
+        self.params = [0] * 10
+        self.status = pigpio.PI_SCRIPT_INITING
+        # Bit level AD7124 state.
+        self._frame_bits = []
+        self._in_frame = False
+        self._polls = 0
+
+    def get_mode(self, gpio):
+        return self.modes[gpio]
+
+    def set_mode(self, gpio, mode):
+        self.modes[gpio] = mode
+
+    def write(self, gpio, level):
+        if gpio == self.SCLK and level == 0 and self.levels.get(gpio):
+            # Falling edge: the AD7124 clocks out the next bit.
+            if not self._in_frame:
+                (_, frame) = self.transport.xfer(bytes(4))
+                value = int.from_bytes(frame, byteorder="big")
+                self._frame_bits = [
+                    (value >> n) & 1 for n in range(31, -1, -1)
+                ]
+                self._in_frame = True
+            self.levels[self.MISO] = self._frame_bits.pop(0)
+        elif gpio == self.SCLK and level == 1 and not self._frame_bits:
+            # Rising edge after the last bit: DOUT/RDY goes high.
+            self._in_frame = False
+        self.levels[gpio] = level
+
+    def read(self, gpio):
+        if gpio == self.MISO and not self._in_frame:
+            # DOUT/RDY: the next conversion is ready after a few polls.
+            self._polls += 1
+            if self._polls < 3:
+                return 1
+            self._polls = 0
+            return 0
+        return self.levels.get(gpio, 0)
+
+    def store_script(self, script):
+        self.script = script.decode("ascii").split()
+        self.status = pigpio.PI_SCRIPT_INITING
+        return 7
+
+    def script_status(self, script_id):
+        status = self.status
+        if status == pigpio.PI_SCRIPT_INITING:
+            self.status = pigpio.PI_SCRIPT_HALTED
+        return (status, tuple(self.params))
+
+    def run_script(self, script_id, params):
+        self.params[: len(params)] = params
+        self.status = pigpio.PI_SCRIPT_RUNNING
+        self._pc = 0
+        self._stack = []
+        self._variables = [0] * 150
+        self._a = 0
+
+    def update_script(self, script_id, params):
+        self.params[: len(params)] = params
+        # Let the script see the stop request.
+        self.execute(0)
+
+    def stop_script(self, script_id):
+        self.status = pigpio.PI_SCRIPT_HALTED
+
+    def delete_script(self, script_id):
+        self.script = None
+
+    def _value(self, operand):
+        if operand[0] == "p":
+            return self.params[int(operand[1:])]
+        if operand[0] == "v":
+            return self._variables[int(operand[1:])]
+        return int(operand)
+
+    def _store(self, operand, value):
+        value &= 0xFFFFFFFF
+        if operand[0] == "p":
+            self.params[int(operand[1:])] = value
+        else:
+            self._variables[int(operand[1:])] = value
+
+    def execute(self, conversions, max_steps=1000000):
+        """ Runs the script until it has read the given number of
+        conversions or halts.
+        """
+        script = self.script
+        tags = {}
+        for (index, token) in enumerate(script):
+            if token == "tag":
+                tags[script[index + 1]] = index + 2
+        target = self.params[1] + conversions
+        for _ in range(max_steps):
+            if self.status != pigpio.PI_SCRIPT_RUNNING:
+                return
+            if conversions and self.params[1] == target:
+                return
+            command = script[self._pc]
+            if command in ("halt",):
+                self.status = pigpio.PI_SCRIPT_HALTED
+                return
+            if command == "ret":
+                self._pc = self._stack.pop()
+                continue
+            arguments = 2 if command in ("w", "ld") else 1
+            operands = script[self._pc + 1 : self._pc + 1 + arguments]
+            self._pc += 1 + arguments
+            if command == "w":
+                self.write(int(operands[0]), int(operands[1]))
+                self._a = 0
+            elif command == "r":
+                self._a = self.read(int(operands[0]))
+            elif command == "ld":
+                self._store(operands[0], self._value(operands[1]))
+            elif command == "lda":
+                self._a = self._value(operands[0])
+            elif command == "sta":
+                self._store(operands[0], self._a)
+            elif command == "add":
+                self._a = (self._a + self._value(operands[0])) & 0xFFFFFFFF
+            elif command == "or":
+                self._a |= self._value(operands[0])
+            elif command == "dcr":
+                self._store(operands[0], self._value(operands[0]) - 1)
+            elif command == "inr":
+                self._store(operands[0], self._value(operands[0]) + 1)
+            elif command == "jmp":
+                self._pc = tags[operands[0]]
+            elif command == "jz":
+                if self._a == 0:
+                    self._pc = tags[operands[0]]
+            elif command == "jnz":
+                if self._a != 0:
+                    self._pc = tags[operands[0]]
+            elif command == "call":
+                self._stack.append(self._pc)
+                self._pc = tags[operands[0]]
+            elif command not in ("tag", "mics"):
+                raise ValueError("unknown command " + command)
+        raise RuntimeError("script did not finish")
+
+
+class ScriptTransport(MemoryTransport):
+    """ In-memory AD7124 that looks like a PigpioTransport. """
+
+    def __init__(self):
+        super().__init__()
+        self.pi = FakePi(self)
+        self.cs_gpio = 8
+
+
+class TestAD7124Script(unittest.TestCase):
+    """ Runs the acquisition script against the in-memory AD7124. """
+
+    def setUp(self):
+        self.transport = ScriptTransport()
+        self.pi = self.transport.pi
+        self.ad7124 = AD7124Driver(1, self.transport)
+        self.ad7124.set_channel(0, False, 0, 0, 0)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        self.ad7124.set_channel(2, True, 0, 4, 5)
+        self.transport.set_code(1, 0x111111)
+        self.transport.set_code(2, 0x222222)
+
+    def test_script_text(self):
+        """ The CS GPIO is used and every slot is written. """
+        script = build_script(7, 50).decode("ascii")
+        self.assertTrue(script.startswith("w 7 0 "))
+        for slot in range(AD7124ScriptReader.SLOTS):
+            self.assertIn("sta p{}".format(2 + slot), script)
+        self.assertIn("mics 50", script)
+
+    def test_read(self):
+        """ Conversions are fetched in bulk with their channels. """
+        reader = AD7124ScriptReader(self.ad7124)
+        reader.start()
+        self.assertEqual(pigpio.OUTPUT, self.pi.modes[11])
+        self.pi.execute(5)
+        records = reader.read()
+        self.assertEqual([1, 2, 1, 2, 1], records["channel"].tolist())
+        expected = [0x111111, 0x222222] * 2 + [0x111111]
+        self.assertEqual(expected, records["code"].tolist())
+        # Two channels at the default settings.
+        self.assertEqual(
+            int(round(1e9 / plan_driver(self.ad7124).total_rate)),
+            reader.sample_period_ns,
+        )
+        self.assertEqual(
+            [reader.sample_period_ns] * 4,
+            np.diff(records["timestamp"]).tolist(),
+        )
+        last = records["timestamp"][-1]
+        self.assertEqual(0, len(reader.read()))
+        self.pi.execute(4)
+        records = reader.read()
+        self.assertEqual([2, 1, 2, 1], records["channel"].tolist())
+        self.assertTrue((records["timestamp"] >= last).all())
+        self.assertEqual(0, reader.overruns)
+        reader.stop()
+        self.assertFalse(reader.running)
+        self.assertEqual(pigpio.PI_SCRIPT_HALTED, self.pi.status)
+        self.assertEqual(pigpio.ALT0, self.pi.modes[11])
+        adc_control = self.transport.register(AD7124RegNames.ADC_CTRL_REG)
+        self.assertEqual(0, adc_control & 0x0800)
+
+    def test_overrun(self):
+        """ Conversions that are overwritten are counted. """
+        reader = AD7124ScriptReader(self.ad7124)
+        reader.start()
+        self.pi.execute(10)
+        records = reader.read()
+        self.assertEqual(AD7124ScriptReader.SLOTS - 1, len(records))
+        self.assertEqual(3, reader.overruns)
+        # The newest conversion is the last record.
+        self.assertEqual(0x222222, records["code"][-1])
+        reader.stop()
+
+    def test_needs_pigpio(self):
+        """ Other transports are rejected. """
+        ad7124 = AD7124Driver(1, MemoryTransport())
+        with self.assertRaises(ValueError):
+            AD7124ScriptReader(ad7124)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+""" Unit tests for the channel scan sequencer.
+These tests do not need any hardware.
+"""
+import unittest
+
+import numpy as np
+
+from ad7124.ad7124acquisition import SAMPLE_DTYPE
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124registers import AD7124RegNames
+from ad7124.ad7124sequencer import AD7124ChannelSpec, AD7124Sequencer
+from test.test_ad7124driver import CountingTransport
+from test.test_ad7124spidev import DevNullSpidevTransport
+
+
+class TestAD7124Sequencer(unittest.TestCase):
+    """ Tests the sequencer using the in-memory transport. """
+
+    def setUp(self):
+        self.transport = CountingTransport()
+        self.ad7124 = AD7124Driver(1, self.transport)
+        # Eight sensors with two different ranges.
+        self.specs = [
+            AD7124ChannelSpec(2 * n, 2 * n + 1, gain=1 if n < 4 else 8)
+            for n in range(8)
+        ]
+        self.sequencer = AD7124Sequencer(self.ad7124, self.specs)
+
+    def test_setups(self):
+        """ Identical configurations share a setup. """
+        self.assertEqual(2, self.sequencer.setup_count)
+        self.assertEqual([0] * 4 + [1] * 4, self.sequencer.channel_setups)
+        specs = [AD7124ChannelSpec(0, 1, fs=n + 1) for n in range(9)]
+        with self.assertRaises(ValueError):
+            AD7124Sequencer(self.ad7124, specs)
+        with self.assertRaises(ValueError):
+            AD7124ChannelSpec(0, 1, gain=3)
+
+    def test_configure(self):
+        """ All registers are written in one transfer. """
+        self.transport.transfers = 0
+        self.sequencer.configure()
+        self.assertEqual(1, self.transport.transfers)
+        value = self.transport.register(AD7124RegNames.CH5_MAP_REG)
+        self.assertEqual(0x8000 | 1 << 12 | 10 << 5 | 11, value)
+        config = self.transport.register(AD7124RegNames.CFG1_REG)
+        self.assertEqual(3, config & 0x07)
+        value = self.transport.register(AD7124RegNames.CH8_MAP_REG)
+        self.assertEqual(0, value & 0x8000)
+        self.assertEqual(8, len(self.sequencer.plan().channels))
+
+    def test_configure_spidev(self):
+        """ The largest configuration, 8 setups and 16 channels, is written
+        using one SPI_IOC_MESSAGE ioctl with checksums enabled.
+        """
+        transport = DevNullSpidevTransport()
+        ad7124 = AD7124Driver(1, transport)
+        ad7124.enable_crc()
+        specs = [
+            AD7124ChannelSpec(n, 17, gain=1 << (n % 8)) for n in range(16)
+        ]
+        sequencer = AD7124Sequencer(ad7124, specs)
+        self.assertEqual(8, sequencer.setup_count)
+        transport.messages = []
+        sequencer.configure()
+        # 15 setup, 16 channel and 1 ADC control register writes and the
+        # error register read.  CFG0 keeps its power on value so it is not
+        # written.
+        self.assertEqual([33], [len(m) for m in transport.messages])
+        value = transport.device.register(AD7124RegNames.CH15_MAP_REG)
+        self.assertEqual(0x8000 | 7 << 12 | 15 << 5 | 17, value)
+        config = transport.device.register(AD7124RegNames.CFG7_REG)
+        self.assertEqual(0x0867, config)
+
+    def test_read(self):
+        """ Samples are split by channel. """
+        for n in range(8):
+            self.transport.set_code(n, 0x800000 + n)
+        self.sequencer.configure()
+        samples = self.sequencer.read(20)
+        counts = [len(channel_samples) for channel_samples in samples]
+        self.assertEqual([3] * 4 + [2] * 4, counts)
+        self.assertEqual([0x800005] * 2, samples[5]["code"].tolist())
+        timestamps = samples[0]["timestamp"]
+        self.assertTrue((np.diff(timestamps) >= 0).all())
+
+    def test_voltages(self):
+        """ Each channel is converted with its own gain. """
+        records = np.zeros(3, dtype=SAMPLE_DTYPE)
+        records["channel"] = [4, 0, 4]
+        records["code"] = 0xFFFFFF
+        voltages = self.sequencer.voltages(records)
+        self.assertEqual(1, len(voltages[0]))
+        self.assertAlmostEqual(2.5, voltages[0][0], 5)
+        self.assertAlmostEqual(2.5 / 8, voltages[4][1], 5)
+        self.assertEqual(0, len(voltages[7]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+""" Unit tests for the spidev transport.
+The spidev device is replaced by a fake file descriptor that decodes the
+ioctl calls and passes each transfer to the in-memory AD7124.  These tests
+do not need any hardware.
+"""
+import ctypes
+import errno
+import fcntl
+import os
+import struct
+import unittest
+
+from ad7124 import ad7124spidev
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124registers import AD7124RegNames
+from ad7124.ad7124spidev import SpidevTransport
+
+
+class FakeSpidevTransport(SpidevTransport):
+    """ SpidevTransport with the system calls replaced. """
+
+    FAKE_FD = 42
+
+    def __init__(self, position=1):
+        self.device = MemoryTransport(position)
+        self.path = None
+        self.closed = False
+        #: (request, arg) of the configuration ioctl calls.
+        self.settings = []
+        #: List of transfers for each SPI_IOC_MESSAGE call.  Each transfer
+        #: is a tuple of (bytes sent, cs_change).
+        self.messages = []
+        super().__init__(position)
+
+    def _open_device(self, path):
+        self.path = path
+        return self.FAKE_FD
+
+    def _close_device(self, fd):
+        self.closed = fd == self.FAKE_FD
+
+    def _ioctl(self, request, arg):
+        size = (request >> 16) & 0x3FFF
+        if request & 0xFF != 0:
+            self.settings.append((request, arg))
+            return arg
+        count = size // ad7124spidev.SPI_IOC_TRANSFER_SIZE
+        transfers = []
+        for index in range(count):
+            fields = struct.unpack_from(
+                ad7124spidev.SPI_IOC_TRANSFER_FORMAT,
+                arg,
+                index * ad7124spidev.SPI_IOC_TRANSFER_SIZE,
+            )
+            (tx_address, rx_address, length) = fields[:3]
+            cs_change = fields[6]
+            to_send = ctypes.string_at(tx_address, length)
+            (_, result) = self.device.xfer(to_send)
+            ctypes.memmove(rx_address, bytes(result), length)
+            transfers.append((to_send, cs_change))
+        self.messages.append(transfers)
+        return arg
+
+
+class DevNullSpidevTransport(FakeSpidevTransport):
+    """ Also passes each ioctl argument to fcntl.ioctl() on /dev/null so
+    that Python's checks of the argument are made.  /dev/null rejects the
+    request itself.
+    """
+
+    def _ioctl(self, request, arg):
+        fd = os.open(os.devnull, os.O_RDWR)
+        try:
+            fcntl.ioctl(fd, request, arg)
+        except OSError as err:
+            if err.errno != errno.ENOTTY:
+                raise
+        finally:
+            os.close(fd)
+        return super()._ioctl(request, arg)
+
+
+class TestAD7124Spidev(unittest.TestCase):
+    """ Tests the ioctl calls made by the spidev transport. """
+
+    def setUp(self):
+        self.transport = FakeSpidevTransport()
+
+    def test_open(self):
+        """ The device for the position is opened and configured. """
+        self.assertEqual("/dev/spidev0.0", self.transport.path)
+        requests = [request for (request, _) in self.transport.settings]
+        expected = [
+            ad7124spidev.SPI_IOC_WR_MODE,
+            ad7124spidev.SPI_IOC_WR_BITS_PER_WORD,
+            ad7124spidev.SPI_IOC_WR_MAX_SPEED_HZ,
+        ]
+        self.assertEqual(expected, requests)
+        self.assertEqual("/dev/spidev0.1", FakeSpidevTransport(2).path)
+        self.transport.close()
+        self.assertTrue(self.transport.closed)
+
+    def test_ioctl_numbers(self):
+        """ The ioctl numbers match linux/spi/spidev.h. """
+        self.assertEqual(0x40206B00, ad7124spidev.spi_ioc_message(1))
+        self.assertEqual(0x40406B00, ad7124spidev.spi_ioc_message(2))
+        self.assertEqual(0x40046B04, ad7124spidev.SPI_IOC_WR_MAX_SPEED_HZ)
+
+    def test_xfer(self):
+        """ A single transfer reads the ID register. """
+        (count, result) = self.transport.xfer(b"\x45\x00")
+        self.assertEqual(2, count)
+        self.assertEqual(0x14, result[1])
+        self.assertEqual([[(b"\x45\x00", 0)]], self.transport.messages)
+
+    def test_xfer_many(self):
+        """ All frames are sent in one ioctl with CS released between
+        them.
+        """
+        frames = [b"\x0a\x80\x10", b"\x4a\x00\x00", b"\x45\x00"]
+        results = self.transport.xfer_many(frames)
+        self.assertEqual(
+            [b"\xff\xff\xff", b"\xff\x80\x10", b"\xff\x14"], results
+        )
+        self.assertEqual(1, len(self.transport.messages))
+        cs_changes = [cs for (_, cs) in self.transport.messages[0]]
+        self.assertEqual([1, 1, 0], cs_changes)
+
+    def test_xfer_many_limits(self):
+        """ Messages are split at the spidev buffer size and the ioctl
+        size limit.
+        """
+        self.transport.xfer_many([b"\x45\x00"] * 3000)
+        counts = [len(message) for message in self.transport.messages]
+        self.assertEqual(3000, sum(counts))
+        self.assertEqual(ad7124spidev.SPI_IOC_MAX_TRANSFERS, counts[0])
+        self.transport.messages = []
+        self.transport.xfer_many([bytes(1000)] * 5)
+        counts = [len(message) for message in self.transport.messages]
+        self.assertEqual([4, 1], counts)
+
+    def test_xfer_many_fcntl(self):
+        """ Messages of more than 32 transfers, over 1024 bytes, are
+        accepted by fcntl.ioctl().
+        """
+        transport = DevNullSpidevTransport()
+        results = transport.xfer_many([b"\x45\x00"] * 100)
+        self.assertEqual([b"\xff\x14"] * 100, results)
+        self.assertEqual([100], [len(m) for m in transport.messages])
+
+    def test_driver(self):
+        """ The driver works with the spidev transport.  A batch of
+        configuration writes uses one ioctl.
+        """
+        ad7124 = AD7124Driver(1, self.transport)
+        self.assertEqual(0x14, ad7124.read_id())
+        self.transport.messages = []
+        with ad7124.batch():
+            ad7124.set_channel(1, enable=True, setup=1, ainp=2, ainm=3)
+            ad7124.set_setup_config(1, bipolar=True)
+            ad7124.set_setup_filter(1, filter_type=0, output_data_rate=1)
+        self.assertEqual(1, len(self.transport.messages))
+        value = self.transport.device.register(AD7124RegNames.CH1_MAP_REG)
+        self.assertEqual(0x9043, value)
+
+    def test_read_continuous_many(self):
+        """ Many continuous read frames use one ioctl. """
+        ad7124 = AD7124Driver(1, self.transport)
+        self.transport.device.set_code(2, 0x222222)
+        ad7124.set_channel(0, enable=False, setup=0, ainp=0, ainm=1)
+        ad7124.set_channel(2, enable=True, setup=0, ainp=4, ainm=5)
+        ad7124.start_continuous_read()
+        self.transport.messages = []
+        samples = ad7124.read_continuous_many(16)
+        self.assertEqual([(2, 0x222222)] * 16, samples)
+        self.assertEqual(1, len(self.transport.messages))
+
+
+if __name__ == "__main__":
+    unittest.main()
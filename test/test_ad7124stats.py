@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+""" Unit tests for the timing histograms.
+These tests do not need any hardware.
+"""
+import threading
+import unittest
+
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
+from ad7124.ad7124stats import AD7124Histogram, AD7124Stats
+
+
+class TestAD7124Histogram(unittest.TestCase):
+    """ Tests the log-linear histogram. """
+
+    def test_small_values(self):
+        """ Small values are counted exactly. """
+        histogram = AD7124Histogram()
+        for value in range(1, 101):
+            histogram.record(value)
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(50, histogram.percentile(50))
+        self.assertEqual(99, histogram.percentile(99))
+        self.assertEqual(100, histogram.percentile(100))
+        self.assertAlmostEqual(50.5, histogram.mean)
+
+    def test_precision(self):
+        """ Large values are within the bucket precision. """
+        histogram = AD7124Histogram()
+        for value in range(1000, 1000001, 1000):
+            histogram.record(value * 1000)
+        for percent in (10, 50, 90, 99):
+            expected = percent * 10 ** 7
+            value = histogram.percentile(percent)
+            self.assertLess(abs(value - expected) / expected, 0.02)
+        self.assertEqual(10 ** 6, histogram.min)
+        self.assertEqual(10 ** 9, histogram.max)
+
+    def test_limits(self):
+        """ Values outside the range are clamped and reset empties the
+        histogram.
+        """
+        histogram = AD7124Histogram(max_value=1000)
+        histogram.record(-5)
+        histogram.record(10 ** 6)
+        self.assertEqual(0, histogram.min)
+        self.assertEqual(1000, histogram.max)
+        histogram.reset()
+        self.assertIsNone(histogram.percentile(50))
+        self.assertIsNone(histogram.summary()["p99.9"])
+
+
+class TestAD7124Stats(unittest.TestCase):
+    """ Tests the per channel timing. """
+
+    def test_record(self):
+        """ Intervals are measured between samples of the same channel. """
+        stats = AD7124Stats()
+        for index in range(10):
+            stats.record(1, index * 1000, 200, 2)
+            stats.record(2, index * 1000 + 500, 300, 1)
+        self.assertEqual([1, 2], stats.channels())
+        interval = stats.histogram(1, "interval")
+        self.assertEqual(9, interval.count)
+        self.assertEqual(1000, interval.min)
+        self.assertEqual(1000, interval.max)
+        summary = stats.summary()
+        self.assertEqual(10, summary[2]["latency"]["count"])
+        self.assertEqual(300, summary[2]["latency"]["p50"])
+        self.assertEqual(2, summary[1]["polls"]["max"])
+        report = stats.report()
+        self.assertEqual("Channel 1: 10 samples", report[0])
+        self.assertIn("p99 1.0", report[1])
+
+    def test_lock(self):
+        """ The histograms are read under the lock that record() takes so
+        they are not read while another thread records.
+        """
+        stats = AD7124Stats()
+        stats.record(1, 0, 100, 1)
+        results = []
+
+        def reader():
+            results.append(stats.channels())
+            results.append(stats.histogram(1, "latency").count)
+
+        with stats._lock:
+            thread = threading.Thread(target=reader)
+            thread.start()
+            thread.join(0.05)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+        self.assertEqual([[1], 1], results)
+
+    def test_driver(self):
+        """ The driver records every sample it reads. """
+        transport = MemoryTransport()
+        ad7124 = AD7124Driver(1, transport)
+        ad7124.set_channel(0, False, 0, 0, 0)
+        ad7124.set_channel(3, True, 0, 6, 7)
+        ad7124.set_adc_control(data_status=True)
+        ad7124.stats = AD7124Stats()
+        timestamps = []
+        for _ in range(5):
+            (channel_number, _, timestamp) = ad7124.read_data_timed()
+            self.assertEqual(3, channel_number)
+            timestamps.append(timestamp)
+        self.assertEqual(sorted(timestamps), timestamps)
+        self.assertEqual([3], ad7124.stats.channels())
+        polls = ad7124.stats.histogram(3, "polls")
+        self.assertEqual(5, polls.count)
+        self.assertGreaterEqual(polls.min, 1)
+        ad7124.start_continuous_read()
+        ad7124.read_data_timed()
+        # The histogram returned is a copy.
+        self.assertEqual(5, polls.count)
+        self.assertEqual(6, ad7124.stats.histogram(3, "polls").count)
+        ad7124.stop_continuous_read()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" Unit tests for the conversion timing formulas.
+The expected values are from the datasheet.  These tests do not need any
+hardware.
+"""
+import unittest
+
+from ad7124 import ad7124timing
+
+
+class TestAD7124Timing(unittest.TestCase):
+    """ Tests the timing formulas. """
+
+    def test_decode_filter(self):
+        """ The filter register fields are extracted. """
+        settings = ad7124timing.decode_filter(0x060180)
+        self.assertEqual(0, settings["filter_type"])
+        self.assertEqual(3, settings["post_filter"])
+        self.assertFalse(settings["single_cycle"])
+        self.assertEqual(384, settings["fs"])
+        self.assertEqual(1, ad7124timing.decode_filter(0)["fs"])
+
+    def test_output_data_rate(self):
+        """ Sinc filters output at fCLK / (32 x FS). """
+        rate = ad7124timing.output_data_rate(ad7124timing.SINC4, 384, 2)
+        self.assertAlmostEqual(50.0, rate)
+        rate = ad7124timing.output_data_rate(ad7124timing.SINC4, 1, 2)
+        self.assertAlmostEqual(19200.0, rate)
+        rate = ad7124timing.output_data_rate(ad7124timing.SINC3, 48, 0)
+        self.assertAlmostEqual(50.0, rate)
+        rate = ad7124timing.output_data_rate(
+            ad7124timing.SINC4, 384, 2, single_cycle=True
+        )
+        self.assertAlmostEqual(12.5, rate)
+
+    def test_fast_and_post_filters(self):
+        """ The fast filters average, the post filters have fixed rates. """
+        rate = ad7124timing.output_data_rate(ad7124timing.FAST_SINC4, 1, 2)
+        self.assertAlmostEqual(614400 / (19 * 32), rate)
+        rate = ad7124timing.output_data_rate(ad7124timing.FAST_SINC3, 1, 0)
+        self.assertAlmostEqual(76800 / (10 * 32), rate)
+        rate = ad7124timing.output_data_rate(ad7124timing.POST_FILTER, 1, 2, 5)
+        self.assertEqual(20.0, rate)
+        with self.assertRaises(ValueError):
+            ad7124timing.output_data_rate(ad7124timing.POST_FILTER, 1, 2, 0)
+        with self.assertRaises(ValueError):
+            ad7124timing.output_data_rate(1, 1, 2)
+
+    def test_settling_time(self):
+        """ Settling is four (sinc4) or three (sinc3) conversions plus the
+        dead time.
+        """
+        time = ad7124timing.settling_time(ad7124timing.SINC4, 384, 2)
+        self.assertAlmostEqual((4 * 32 * 384 + 95) / 614400, time)
+        time = ad7124timing.settling_time(ad7124timing.SINC4, 1, 2)
+        self.assertAlmostEqual((128 + 61) / 614400, time)
+        time = ad7124timing.settling_time(
+            ad7124timing.SINC3, 10, 1, sequencer=True
+        )
+        self.assertAlmostEqual((3 * 32 * 10 + 30) / 153600, time)
+        with self.assertRaises(ValueError):
+            ad7124timing.settling_time(ad7124timing.SINC4, 1, 4)
+
+    def test_conversion_period(self):
+        """ The sequencer waits for each channel to settle. """
+        period = ad7124timing.conversion_period(ad7124timing.SINC4, 384, 2)
+        self.assertAlmostEqual(0.02, period)
+        period = ad7124timing.conversion_period(
+            ad7124timing.SINC4, 384, 2, channels=2
+        )
+        self.assertAlmostEqual((4 * 32 * 384 + 30) / 614400, period)
+
+
+if __name__ == "__main__":
+    unittest.main()
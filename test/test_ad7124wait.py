@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+""" Unit tests for the wait strategies.
+The emulator and a simulated clock are used so that the number of polls
+can be checked.  These tests do not need any hardware.
+"""
+import unittest
+
+from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124emulator import AD7124Emulator, SimulatedClock
+from ad7124.ad7124wait import AD7124WaitStrategy
+
+
+class TestAD7124Wait(unittest.TestCase):
+    """ Reads 50 samples per second with each policy. """
+
+    def setUp(self):
+        self.clock = SimulatedClock()
+        emulator = AD7124Emulator(clock=self.clock)
+        self.ad7124 = AD7124Driver(1, emulator)
+        # Sinc4, FS = 384, full power: 50 SPS.
+        self.ad7124.set_setup_filter(0, filter_type=0, output_data_rate=384)
+        self.ad7124.set_channel(1, True, 0, 2, 3)
+        emulator.set_code(1, 0x123456)
+        self.ad7124.set_adc_control(data_status=True, power_mode=2)
+        self.ad7124.enable_metrics()
+        # Wait for the filter to settle.
+        self.ad7124.read_data_wait()
+
+    def _read(self, count):
+        """ Returns the number of polls and the time taken. """
+        self.ad7124.metrics.reset()
+        start = self.clock.time()
+        for _ in range(count):
+            self.assertEqual(1, self.ad7124.read_data_wait()[0])
+        return (self.ad7124.metrics.polls, self.clock.time() - start)
+
+    def test_spin(self):
+        """ Without a strategy the status is polled continuously. """
+        (polls, _) = self._read(10)
+        self.assertGreater(polls, 1000)
+
+    def test_policies(self):
+        """ Each policy polls far less than spinning and keeps up with the
+        output data rate.
+        """
+        (spin_polls, _) = self._read(10)
+        for (policy, max_polls) in (
+            ("latency", spin_polls // 10),
+            ("balanced", 100),
+            ("cpu", 30),
+        ):
+            strategy = AD7124WaitStrategy(policy, clock=self.clock)
+            self.ad7124.set_wait_strategy(strategy)
+            self.assertAlmostEqual(0.02, strategy.period)
+            self.ad7124.read_data_wait()
+            (polls, elapsed) = self._read(10)
+            self.assertLess(polls, max_polls, policy)
+            self.assertAlmostEqual(0.2, elapsed, delta=0.003)
+        self.ad7124.set_wait_strategy(None)
+        (polls, _) = self._read(1)
+        self.assertGreater(polls, 100)
+
+    def test_invalidate(self):
+        """ Changing the filter changes the period. """
+        strategy = AD7124WaitStrategy("cpu", clock=self.clock)
+        self.ad7124.set_wait_strategy(strategy)
+        self.assertAlmostEqual(0.02, strategy.period)
+        self.ad7124.set_setup_filter(0, filter_type=0, output_data_rate=96)
+        self.assertAlmostEqual(0.005, strategy.period)
+        self.ad7124.set_channel(1, False, 0, 2, 3)
+        self.assertEqual(0.0, strategy.period)
+        with self.assertRaises(ValueError):
+            AD7124WaitStrategy("fast")
+
+
+if __name__ == "__main__":
+    unittest.main()
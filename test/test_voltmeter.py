@@ -3,11 +3,17 @@
 This was used to work out how to read the registers of the AD7124 correctly.
 """
 
+import contextlib
+import io
+import os
+import tempfile
 import time
 import unittest
 
 from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124memory import MemoryTransport
 from ad7124.ad7124registers import AD7124RegNames
+from voltmeter import Voltmeter, VoltmeterWriter
 
 
 class TestAD7214Voltmeter(unittest.TestCase):
@@ -173,5 +179,53 @@ class TestAD7214Voltmeter(unittest.TestCase):
         print("Readings per second: ", valid_readings / time_taken)
 
 
+class TestVoltmeterWriter(unittest.TestCase):
+    """ Tests the buffered output.  Does not need any hardware. """
+
+    def test_flush_rows(self):
+        """ Nothing is written until flush_rows rows are buffered. """
+        output = io.StringIO()
+        writer = VoltmeterWriter(output, flush_rows=3, flush_interval=60.0)
+        writer.write("1,0.5\n2,0.25\n", 2)
+        self.assertEqual("", output.getvalue())
+        writer.write("1,0.75\n", 1)
+        self.assertEqual("1,0.5\n2,0.25\n1,0.75\n", output.getvalue())
+
+    def test_flush_interval(self):
+        """ Buffered rows are written once flush_interval has passed. """
+        output = io.StringIO()
+        writer = VoltmeterWriter(output, flush_rows=100, flush_interval=0.05)
+        writer.write("1,0.5\n", 1)
+        self.assertEqual("", output.getvalue())
+        time.sleep(0.06)
+        writer.write("", 0)
+        self.assertEqual("1,0.5\n", output.getvalue())
+
+
+class TestVoltmeterMemory(unittest.TestCase):
+    """ Runs the voltmeter using the in-memory AD7124. """
+
+    def test_csv(self):
+        """ The readings of both channels are written to the CSV file. """
+        transport = MemoryTransport()
+        transport.set_code(1, 0x800000)
+        transport.set_code(2, 0x000000)
+        voltmeter = Voltmeter(transport)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "test.csv")
+            voltmeter.parse_options(
+                ["-f", "csv", "-o", filename, "-w", "spin", "1", "2"]
+            )
+            with contextlib.redirect_stdout(io.StringIO()):
+                voltmeter.run(max_readings=100)
+            with open(filename) as csv_file:
+                lines = csv_file.read().splitlines()
+        self.assertEqual("Channel,Voltage", lines[0])
+        self.assertGreaterEqual(len(lines) - 1, 100)
+        self.assertEqual(voltmeter._readings, len(lines) - 1)
+        channels = {line.split(",")[0] for line in lines[1:]}
+        self.assertEqual({"1", "2"}, channels)
+
+
 if __name__ == "__main__":
     unittest.main()
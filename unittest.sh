@@ -6,5 +6,14 @@ sudo pigpiod
 
 # Run the tests.
 python3 -m unittest -v test/test_ad7124spi.py test/test_ad7124driver.py \
-	test/test_ad7124registers.py
+	test/test_ad7124registers.py test/test_ad7124memory.py \
+	test/test_ad7124convert.py test/test_ad7124acquisition.py \
+	test/test_ad7124async.py test/test_ad7124recording.py \
+	test/test_ad7124multi.py test/test_ad7124script.py \
+	test/test_ad7124spidev.py test/test_ad7124stats.py \
+	test/test_ad7124metrics.py test/test_ad7124timing.py \
+	test/test_ad7124emulator.py test/test_ad7124planner.py \
+	test/test_ad7124sequencer.py test/test_ad7124wait.py \
+	test/test_ad7124burst.py test/test_ad7124crc.py \
+	test/test_ad7124pipeline.py test/test_ad7124calibration.py
 
@@ -4,11 +4,22 @@ This file uses the AD7124Driver class to set up and control the AD7124 device.
 """
 
 import csv
+import io
+import os
 import time
 import sys
 from optparse import OptionParser
+
+import numpy as np
+
+from ad7124 import ad7124convert
+from ad7124.ad7124acquisition import AD7124Acquisition
 from ad7124.ad7124driver import AD7124Driver
+from ad7124.ad7124planner import plan_driver
+from ad7124.ad7124recording import AD7124RecordingWriter
 from ad7124.ad7124registers import AD7124RegNames
+from ad7124.ad7124stats import AD7124Stats
+from ad7124.ad7124wait import AD7124WaitStrategy
 
 
 class VoltmeterChannel:
@@ -19,6 +30,10 @@ class VoltmeterChannel:
     # VREF is fixed by the hardware so do not change this!
     # VREF = 1.25
     VREF = 2.5
+    # Filters are set up for speed so are less accurate.
+    FILTER_TYPE = 0  # SINC4
+    POST_FILTER = 0  # No post filter.
+    OUTPUT_DATA_RATE = 0x200  # Fastest is 0x001.
 
     def __init__(self, number):
         self.number = number
@@ -27,6 +42,8 @@ class VoltmeterChannel:
         self._gain = 1.0
         self._bipolar = True
         self._scale = 1.0
+        self._adc_channel = None
+        self._adc_setup = None
 
     def setup(self, adc):
         """ Setup channel.
@@ -49,6 +66,8 @@ class VoltmeterChannel:
         else:
             print("ERROR: ONLY CHANNEL 1 AND SUPPORTED")
             exit(-1)
+        self._adc_channel = adc_channel
+        self._adc_setup = adc_setup
         # Set the registers up
         adc.set_setup_config(
             adc_setup,
@@ -60,12 +79,11 @@ class VoltmeterChannel:
             ref_sel=0,
             pga=0,
         )
-        # Filters are set up for speed so are less accurate.
         adc.set_setup_filter(
             adc_setup,
-            filter_type=0,  # SINC4
-            post_filter=0,  # No post filter.
-            output_data_rate=0x200,  # Fastest is 0x001.
+            filter_type=self.FILTER_TYPE,
+            post_filter=self.POST_FILTER,
+            output_data_rate=self.OUTPUT_DATA_RATE,
         )
         adc.set_channel(
             adc_channel,
@@ -81,6 +99,75 @@ class VoltmeterChannel:
         )
         return voltage
 
+    def header(self):
+        """ Returns the channel setup for the binary recording header. """
+        return {
+            "number": self.number,
+            "channel": self._adc_channel,
+            "setup": self._adc_setup,
+            "gain": self._gain,
+            "vref": self.VREF,
+            "bipolar": self._bipolar,
+            "scale": self._scale,
+            "filter_type": self.FILTER_TYPE,
+            "post_filter": self.POST_FILTER,
+            "output_data_rate": self.OUTPUT_DATA_RATE,
+        }
+
+
+class VoltmeterWriter:
+    """ Buffers text and writes it to a file in large blocks.
+    The buffer is written when it holds flush_rows rows or when
+    flush_interval seconds have passed since the last write.
+    """
+
+    def __init__(self, output_file, flush_rows, flush_interval, fsync=False):
+        """ Creates an empty buffer.
+        Args:
+            output_file: The open file to write to.
+            flush_rows: The number of rows to buffer.
+            flush_interval: The longest time in seconds that rows are
+                buffered for.
+            fsync: True to make the operating system write the file to disk
+                after every block.  This is slow but loses less data if the
+                power fails.
+        """
+        self._file = output_file
+        self._flush_rows = flush_rows
+        self._flush_interval = flush_interval
+        self._fsync = fsync
+        self._chunks = []
+        self._rows = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, text, rows):
+        """ Adds text to the buffer and writes the buffer if required.
+        Call with no rows to write the buffer once flush_interval has
+        passed.
+        Args:
+            text: The formatted rows.
+            rows: The number of rows in text.
+        """
+        if rows:
+            self._chunks.append(text)
+            self._rows += rows
+        if self._rows >= self._flush_rows or (
+            time.monotonic() - self._last_flush >= self._flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """ Writes the buffer to the file. """
+        self._last_flush = time.monotonic()
+        if not self._chunks:
+            return
+        self._file.write("".join(self._chunks))
+        self._chunks = []
+        self._rows = 0
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
 
 class Voltmeter:
     """ Handles user options to control the "Voltmeter".
@@ -89,23 +176,54 @@ class Voltmeter:
     """
 
     VERSION = "0.1"
+    # power_mode 2 is full power so goes fastest.
+    POWER_MODE = 2
+    # The console is flushed often so that it stays responsive.
+    CONSOLE_FLUSH_INTERVAL = 0.1
 
-    def __init__(self):
+    def __init__(self, transport=None):
+        """ Sets the default options.
+        Args:
+            transport: The `ad7124.ad7124transport.AD7124Transport` passed to
+                the driver, e.g. a MemoryTransport for benchmarks.  If None,
+                PiGPIO is used.
+        """
+        self._transport = transport
         self._stdout = True
         self._csv = False
         self._filename = ""
         self._csv_file = None
         self._csv_writer = None
+        self._csv_buffer = None
+        self._csv_output = None
+        self._console_output = None
+        self._flush_rows = 10000
+        self._flush_interval = 1.0
+        self._fsync = False
+        self._metrics = False
+        self._wait_policy = "balanced"
+        # Conversion values for each ADC channel, see _set_conversion().
+        self._gain = None
+        self._vref = None
+        self._bipolar = None
+        self._scale = None
+        self._known = None
+        self._binary = False
+        self._recording = None
         # List of VoltmeterChannel instances.
         self._vm_channels = []
         self._position = 1
         self._adc = None
+        self._acquisition = None
         # Performance stats
         self._start_time = None
         self._readings = 0
 
-    def parse_options(self):
-        """ Parse command line arguments and provide user help. """
+    def parse_options(self, args=None):
+        """ Parse command line arguments and provide user help.
+        Args:
+            args: The list of arguments.  If None, sys.argv is used.
+        """
         usage = "usage: %prog [options] [1] [2]\n"
         usage += "Reads the channels 1 and/or 2 continuously.\n"
         usage += "\tChannel 1 reads -7.5V to +7.5V. \n"
@@ -113,21 +231,19 @@ class Voltmeter:
         usage += "To stop the program, press Ctrl+c."
         version = "%prog version " + self.VERSION
         parser = OptionParser(usage, version=version)
-        parser.set_defaults(
-            filename="ad7124.csv", output="console", position=1
-        )
+        parser.set_defaults(filename=None, output="console", position=1)
         parser.add_option(
             "-o",
             "--file",
             dest="filename",
-            help="Write to FILE.",
+            help="Write to FILE.  Default is ad7124.csv or ad7124.bin.",
             metavar="FILE",
         )
         parser.add_option(
             "-f",
             "--format",
             dest="format",
-            help="format: csv, console. Default is '%default'.",
+            help="format: csv, binary, console. Default is 'console'.",
         )
         parser.add_option(
             "-p",
@@ -135,10 +251,44 @@ class Voltmeter:
             dest="1",
             help="Position of the ADC6Click: 1 or 2.  Default is '%default'.",
         )
+        parser.add_option(
+            "--flush-rows",
+            dest="flush_rows",
+            type="int",
+            help="Write the CSV file every ROWS rows.  Default is 10000.",
+            metavar="ROWS",
+        )
+        parser.add_option(
+            "--flush-interval",
+            dest="flush_interval",
+            type="float",
+            help="Write the CSV file at least every SECONDS.  Default is 1.0.",
+            metavar="SECONDS",
+        )
+        parser.add_option(
+            "--fsync",
+            action="store_true",
+            dest="fsync",
+            help="Force the CSV file to disk every time it is written.",
+        )
+        parser.add_option(
+            "-w",
+            "--wait",
+            dest="wait",
+            help="How to wait for each reading: spin, latency, balanced or "
+            "cpu.  spin polls the ADC continuously.  Default is 'balanced'.",
+        )
+        parser.add_option(
+            "-m",
+            "--metrics",
+            action="store_true",
+            dest="metrics",
+            help="Count the SPI traffic and show it when finished.",
+        )
         parser.add_option(
             "-v", "--verbose", action="store_true", dest="verbose"
         )
-        (options, requested_channels) = parser.parse_args()
+        (options, requested_channels) = parser.parse_args(args)
         # print("print options", options, "channels", requested_channels)
         num_requested_channels = len(requested_channels)
         # print("print num_requested_channels", num_requested_channels)
@@ -161,21 +311,67 @@ class Voltmeter:
             output_format = options.format.lower()
             if output_format == "csv":
                 self._csv = True
-                self._filename = options.filename
+                self._filename = options.filename or "ad7124.csv"
+                self._stdout = False
+            elif output_format == "binary":
+                self._binary = True
+                self._filename = options.filename or "ad7124.bin"
                 self._stdout = False
+        if options.flush_rows is not None:
+            if options.flush_rows < 1:
+                parser.error("flush rows must be at least 1.")
+            self._flush_rows = options.flush_rows
+        if options.flush_interval is not None:
+            self._flush_interval = options.flush_interval
+        self._fsync = bool(options.fsync)
+        self._metrics = bool(options.metrics)
+        if options.wait:
+            policy = options.wait.lower()
+            if policy != "spin" and policy not in AD7124WaitStrategy.POLICIES:
+                parser.error("wait must be spin, latency, balanced or cpu.")
+            self._wait_policy = policy
 
     def _initialise_adc(self):
         """ Initialise the ADC and configure to read the enabled
         channels.
         """
         # Initialise the driver.  Asserts if anything fails.
-        self._adc = AD7124Driver(self._position)
+        self._adc = AD7124Driver(self._position, self._transport)
+        # Record the timing of every sample for the footer.
+        self._adc.stats = AD7124Stats()
+        if self._metrics:
+            self._adc.enable_metrics()
+        if self._wait_policy != "spin":
+            self._adc.set_wait_strategy(AD7124WaitStrategy(self._wait_policy))
         # Set up the driver to read values on the selected channels.
         for vm_channel in self._vm_channels:
             vm_channel.setup(self._adc)
         # ADC control register
         # power_mode 2 is full power so goes fastest.
-        self._adc.set_adc_control(power_mode=2)
+        # data_status reads the data and channel number in one transfer.
+        self._adc.set_adc_control(data_status=True, power_mode=self.POWER_MODE)
+        self._set_conversion()
+        plan = plan_driver(self._adc)
+        print("Expected readings per second: {:.2f}".format(plan.total_rate))
+
+    def _set_conversion(self):
+        """ Stores the conversion values of every channel in arrays indexed
+        by ADC channel number so that whole batches can be converted at
+        once.
+        """
+        self._gain = np.ones(16)
+        self._vref = np.ones(16)
+        self._bipolar = np.zeros(16, dtype=bool)
+        self._scale = np.ones(16)
+        self._known = np.zeros(16, dtype=bool)
+        for vm_channel in self._vm_channels:
+            header = vm_channel.header()
+            channel = header["channel"]
+            self._gain[channel] = header["gain"]
+            self._vref[channel] = header["vref"]
+            self._bipolar[channel] = header["bipolar"]
+            self._scale[channel] = header["scale"]
+            self._known[channel] = True
 
     def _write_header(self):
         self._readings = 0
@@ -193,26 +389,88 @@ class Voltmeter:
                 print("OS error: {0}".format(err))
                 sys.exit(1)
             else:
+                # Rows are formatted into a buffer a batch at a time and
+                # written to the file in blocks.
+                self._csv_buffer = io.StringIO()
                 self._csv_writer = csv.writer(
-                    self._csv_file,
+                    self._csv_buffer,
                     delimiter=",",
                     quotechar='"',
                     quoting=csv.QUOTE_MINIMAL,
                 )
+                self._csv_output = VoltmeterWriter(
+                    self._csv_file,
+                    self._flush_rows,
+                    self._flush_interval,
+                    self._fsync,
+                )
                 header = ["Channel", "Voltage"]
                 self._csv_writer.writerow(header)
+                self._write_csv(1)
                 print("Opened CSV file:", self._filename)
-
-    def _write_value(self, channel_number, int_value):
-        self._readings += 1
         if self._stdout:
-            voltage = self._vm_channels[channel_number].to_voltage(
-                self._adc, int_value
+            self._console_output = VoltmeterWriter(
+                sys.stdout, self._flush_rows, self.CONSOLE_FLUSH_INTERVAL
             )
-            print("{}, {:2.6}".format(channel_number, voltage))
+
+    def _open_recording(self):
+        """ Opens the binary recording.  The channels must be set up first
+        so that the header describes them.
+        """
+        header = {
+            "version": self.VERSION,
+            "position": self._position,
+            "power_mode": self.POWER_MODE,
+            "start_time": self._start_time,
+            "channels": [
+                vm_channel.header() for vm_channel in self._vm_channels
+            ],
+        }
+        try:
+            self._recording = AD7124RecordingWriter(self._filename, header)
+        except OSError as err:
+            print("OS error: {0}".format(err))
+            sys.exit(1)
+        print("Opened binary file:", self._filename)
+
+    def _write_csv(self, rows):
+        """ Moves the rows formatted by the CSV writer to the output. """
+        self._csv_output.write(self._csv_buffer.getvalue(), rows)
+        self._csv_buffer.seek(0)
+        self._csv_buffer.truncate()
+
+    def _write_records(self, records):
+        """ Writes a batch of records drained from the acquisition.
+        Called with an empty batch so that buffered rows are written when
+        no data is arriving.
+        """
+        if self._binary:
+            # Raw values are written so no conversion is needed.
+            self._recording.write_records(records)
+            self._readings += len(records)
+            return
+        channels = records["channel"]
+        # Ignore any channels that were not set up.
+        known = self._known[channels]
+        if not known.all():
+            records = records[known]
+            channels = records["channel"]
+        self._readings += len(records)
+        voltages = ad7124convert.to_voltage(
+            records["code"],
+            self._gain,
+            self._vref,
+            self._bipolar,
+            self._scale,
+            channels,
+        )
+        rows = list(zip(channels.tolist(), voltages.tolist()))
+        if self._stdout:
+            text = "".join("{}, {:2.6}\n".format(*row) for row in rows)
+            self._console_output.write(text, len(rows))
         if self._csv:
-            row = [channel_number, voltage]
-            self._csv_writer.writerow(row)
+            self._csv_writer.writerows(rows)
+            self._write_csv(len(rows))
 
     def _write_footer(self):
         print("Finished.")
@@ -220,28 +478,58 @@ class Voltmeter:
         print("Time taken: ", time_taken)
         print("Readings: ", self._readings)
         print("Readings per second: ", self._readings / time_taken)
+        if self._acquisition is not None:
+            print("Overruns: ", self._acquisition.overruns)
+        if self._adc is not None:
+            for line in self._adc.stats.report():
+                print(line)
+            if self._adc.metrics is not None:
+                for (name, value) in self._adc.metrics.snapshot().items():
+                    print("{}: {}".format(name, value))
         if self._csv:
+            self._csv_output.flush()
             self._csv_file.close()
             print("CSV file closed")
+        if self._recording is not None:
+            self._recording.close()
+            print("Binary file closed")
 
-    def run(self):
+    def run(self, max_readings=None):
         """ This function continuously reads the ADC selected channels until
         the user presses ctrl+c.
+        Args:
+            max_readings: Stop after at least this many readings.  If None,
+                only ctrl+c stops.
         """
         print("Starting...")
         self._write_header()
         self._initialise_adc()
+        if self._binary:
+            self._open_recording()
+        # Samples are read by a background thread so that slow output does
+        # not cause conversions to be missed.
+        self._acquisition = AD7124Acquisition(self._adc)
+        self._acquisition.start()
         # Try block handles ctrl+c nicely.
         try:
             while True:
-                # Read next value (blocks until data read)
-                (channel_number, int_value) = self._adc.read_data_wait()
-                # print("channel, int_value:", channel_number, hex(int_value))
-                # Write value to stdout/csv file.
-                self._write_value(channel_number, int_value)
+                # Wait for the next batch of values.
+                records = self._acquisition.drain(timeout=0.1)
+                # print("records:", len(records))
+                # Write values to stdout/csv/binary file.
+                self._write_records(records)
+                if max_readings is not None and (
+                    self._readings >= max_readings
+                ):
+                    break
         except KeyboardInterrupt:
             print("\nStopping...")
         finally:
+            self._acquisition.stop()
+            # Write any values that are still buffered.
+            self._write_records(self._acquisition.buffer.drain())
+            if self._stdout:
+                self._console_output.flush()
             self._write_footer()
 
 